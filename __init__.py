@@ -1 +1,19 @@
-from .updater import run
\ No newline at end of file
+## names are imported on first use, so reading the shipped stats does not
+## import the scraping or nfelodcm stacks (see lazy.py) ##
+from .lazy import lazy_package
+
+lazy_package(__name__, {
+    'run' : ('.updater', 'run'),
+    'read_coaches' : ('.store', 'read_coaches'),
+    'read_coach_meta' : ('.store', 'read_coach_meta'),
+    'load_coaches' : ('.store', 'load_coaches'),
+    'load_coach_meta' : ('.store', 'load_coach_meta'),
+    'CoachStats' : ('.store', 'CoachStats'),
+    'CoachTree' : ('.store', 'CoachTree'),
+    'ChangeFeed' : ('.store', 'ChangeFeed'),
+    'coaches' : ('.coaches', None),
+    'stats' : ('.stats', None),
+    'store' : ('.store', None),
+    'updater' : ('.updater', None),
+    'benchmarks' : ('.benchmarks', None),
+})
\ No newline at end of file
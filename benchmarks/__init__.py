@@ -0,0 +1 @@
+from .run_benchmarks import run_benchmarks, compare
\ No newline at end of file
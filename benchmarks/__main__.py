@@ -0,0 +1,23 @@
+import argparse
+import sys
+
+from .run_benchmarks import run_benchmarks, SCALES
+
+parser = argparse.ArgumentParser(
+    description='Time the stat compiler and scraping stages on synthetic data, and package import times'
+)
+parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+parser.add_argument('--repeat', type=int, default=3)
+parser.add_argument('--only', nargs='+', default=None)
+parser.add_argument('--output', default=None, help='write results as json')
+parser.add_argument('--baseline', default=None, help='json results to compare against')
+parser.add_argument('--tolerance', type=float, default=0.25)
+args = parser.parse_args()
+
+report = run_benchmarks(
+    scales=args.scales, repeat=args.repeat, only=args.only,
+    output=args.output, baseline=args.baseline, tolerance=args.tolerance
+)
+## non zero exit so a nightly job can fail on regressions ##
+if len(report.get('regressions', [])) > 0:
+    sys.exit(1)
@@ -0,0 +1,260 @@
+## packages ##
+import pandas as pd
+import numpy
+import datetime
+import platform
+import json
+import time
+import gc
+import tracemalloc
+import pathlib
+import subprocess
+import sys
+
+from . import synthetic
+from ..stats.StatCompiler import StatCompiler
+from ..coaches.Coach import Coach
+from ..coaches.CoachTable import CoachTable
+from ..coaches.fetchers import FetchBackend
+
+SCALES = [1, 10, 100]
+## synthetic coach pages parsed per unit of scale ##
+PAGES_PER_SCALE = 10
+## entry points timed in a fresh interpreter, and the heavy or optional
+## modules to report if an entry point ends up importing them ##
+IMPORTS = [
+    ('import_package', 'import {0}'),
+    ('read_coaches', 'import {0}; {0}.read_coaches()'),
+    ('import_stat_compiler', 'from {0}.stats import StatCompiler'),
+    ('import_updater', 'from {0}.updater import run'),
+]
+HEAVY_MODULES = ['pandas', 'pyarrow', 'bs4', 'lxml', 'requests', 'selenium', 'nfelodcm']
+
+class PageBackend(FetchBackend):
+    '''
+    Serves pages from memory so only parsing is timed
+    '''
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_page_html(self, url):
+        return self.pages[url]
+
+    def requires_network(self, url):
+        return False
+
+def measure(fn, repeat=3):
+    '''
+    Best and mean wall time over repeat runs, then the peak traced memory
+    of one more run (tracing is kept out of the timed runs)
+    '''
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds' : min(times),
+        'mean_seconds' : sum(times) / len(times),
+        'peak_mb' : peak / (1024 * 1024),
+    }
+
+def compiler_cases(scale):
+    '''
+    StatCompiler stages over synthetic games, each with inputs prepared
+    outside of the timed call
+    '''
+    games = synthetic.games(scale)
+    deltas = synthetic.deltas(games)
+    ## aggregate without deltas once to get the input to the later stages ##
+    compiler = StatCompiler(
+        games=games, logos=synthetic.logos(scale),
+        coach_meta=synthetic.coach_meta(games), pre_fastr_deltas=deltas.iloc[0:0].copy()
+    )
+    raw = compiler.aggregate_games()
+    compiler.pre_fastr_deltas = deltas
+    compiled = compiler.aggregate_games()
+    def add_teams():
+        compiler.compiled_stats = compiled
+        compiler.add_teams()
+    def add_coach_meta():
+        compiler.compiled_stats = compiled
+        compiler.add_coach_meta()
+    return len(games), [
+        ('flatten_games', compiler.flatten_games),
+        ('aggregate_games', compiler.aggregate_games),
+        ('add_deltas_to_games', lambda: compiler.add_deltas_to_games(raw, deltas.copy())),
+        ('add_teams', add_teams),
+        ('add_coach_meta', add_coach_meta),
+    ]
+
+def batch_case(scale, n_scenarios=16):
+    '''
+    StatCompiler.compile_scenarios over leave one season out scenarios,
+    in process and across every core
+    '''
+    games = synthetic.games(scale)
+    compiler = StatCompiler(games=games)
+    compiler.coach_games
+    seasons = sorted(games['season'].unique())
+    scenarios = [
+        {'name' : i, 'exclude_seasons' : [seasons[i % len(seasons)]]}
+        for i in range(n_scenarios)
+    ]
+    return len(games), [
+        ('scenarios_1_worker', lambda: compiler.compile_scenarios(scenarios, workers=1)),
+        ('scenarios_all_workers', lambda: compiler.compile_scenarios(scenarios)),
+    ]
+
+def coach_table_case(scale):
+    '''
+    CoachTable.merge of a scraped index against existing meta missing the
+    newest tenth of coaches
+    '''
+    meta = synthetic.coach_meta(synthetic.games(scale))
+    table = CoachTable(
+        existing=meta.iloc[:int(len(meta) * 0.9)].copy(),
+        scraped_records=meta[['pfr_coach_id', 'pfr_coach_name']].to_dict('records')
+    )
+    table.build()
+    return len(meta), [('CoachTable.merge', table.merge)]
+
+def scrape_case(scale):
+    '''
+    Coach.scrape_coach on synthetic pfr pages served from memory
+    '''
+    pages = synthetic.coach_pages(PAGES_PER_SCALE * scale)
+    fetcher = PageBackend(pages)
+    coaches = []
+    for url in pages:
+        ## fetch_required=False so construction does not scrape ##
+        coaches.append(Coach(
+            {'pfr_coach_id' : url.split('/')[-1].split('.')[0]},
+            fetcher=fetcher, fetch_required=False
+        ))
+    def scrape():
+        for coach in coaches:
+            coach.scrape_coach()
+    return len(pages), [('Coach.scrape_coach', scrape)]
+
+def measure_import(statement, repeat=3):
+    '''
+    Best and mean wall time of an import statement in a fresh interpreter,
+    the interpreter's peak rss (linux only, 0 elsewhere), and which
+    HEAVY_MODULES it imported
+    '''
+    package = __name__.split('.')[0]
+    code = '\n'.join([
+        'import time, sys, json',
+        'start = time.perf_counter()',
+        statement.format(package),
+        'seconds = time.perf_counter() - start',
+        ## high water rss of this process, ru_maxrss carries over from the parent ##
+        'peak = 0',
+        'try:',
+        '    for line in open(\'/proc/self/status\'):',
+        '        if line.startswith(\'VmHWM\'):',
+        '            peak = int(line.split()[1]) / 1024',
+        'except OSError:',
+        '    pass',
+        'print(json.dumps([seconds, peak, [m for m in {0!r} if m in sys.modules]]))'.format(HEAVY_MODULES),
+    ])
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+            cwd=pathlib.Path(__file__).parent.parent.parent.resolve()
+        )
+        seconds, peak, modules = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(seconds)
+    return {
+        'seconds' : min(times),
+        'mean_seconds' : sum(times) / len(times),
+        'peak_mb' : peak,
+        'modules' : modules,
+    }
+
+CASES = [compiler_cases, batch_case, coach_table_case, scrape_case]
+
+def run_benchmarks(scales=SCALES, repeat=3, only=None, output=None, baseline=None, tolerance=0.25):
+    '''
+    Times each benchmark at each scale and returns the results, writing
+    them as json to output when given. With a baseline json, results are
+    compared and regressions beyond tolerance are printed
+    '''
+    results = []
+    for scale in scales:
+        for case in CASES:
+            rows, benches = case(scale)
+            for name, fn in benches:
+                if only is not None and name not in only:
+                    continue
+                result = measure(fn, repeat)
+                result.update({'benchmark' : name, 'scale' : scale, 'rows' : rows})
+                print('     {0:<22} x{1:<4} {2:>9.4f}s {3:>9.1f}MB'.format(
+                    name, scale, result['seconds'], result['peak_mb']
+                ))
+                results.append(result)
+    ## import time does not depend on scale ##
+    for name, statement in IMPORTS:
+        if only is not None and name not in only:
+            continue
+        result = measure_import(statement, repeat)
+        result.update({'benchmark' : name, 'scale' : 0, 'rows' : 0})
+        print('     {0:<22} {1:>15.4f}s {2:>9.1f}MB {3}'.format(
+            name, result['seconds'], result['peak_mb'], ', '.join(result['modules'])
+        ))
+        results.append(result)
+    report = {
+        'created_at' : datetime.datetime.now().isoformat(),
+        'python' : platform.python_version(),
+        'platform' : platform.platform(),
+        'pandas' : pd.__version__,
+        'numpy' : numpy.__version__,
+        'repeat' : repeat,
+        'results' : results,
+    }
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+    if baseline is not None:
+        report['regressions'] = compare(report, baseline, tolerance)
+    return report
+
+def compare(report, baseline, tolerance=0.25):
+    '''
+    Benchmarks that got slower or used more memory than the baseline (a
+    report or the path to one) by more than tolerance
+    '''
+    if not isinstance(baseline, dict):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    previous = {(r['benchmark'], r['scale']) : r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get((result['benchmark'], result['scale']))
+        if old is None:
+            continue
+        for field in ['seconds', 'peak_mb']:
+            if old[field] > 0 and result[field] > old[field] * (1 + tolerance):
+                regressions.append({
+                    'benchmark' : result['benchmark'],
+                    'scale' : result['scale'],
+                    'field' : field,
+                    'baseline' : old[field],
+                    'current' : result[field],
+                    'change' : result[field] / old[field] - 1,
+                })
+                print('     REGRESSION {0} x{1} {2}: {3:.4f} -> {4:.4f} (+{5:.0%})'.format(
+                    result['benchmark'], result['scale'], field,
+                    old[field], result[field], result[field] / old[field] - 1
+                ))
+    return regressions
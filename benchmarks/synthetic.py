@@ -0,0 +1,176 @@
+## packages ##
+import pandas as pd
+import numpy
+
+## fields the pre-99 deltas add to ##
+DELTA_COLUMNS = [
+    'games', 'seasons', 'wins', 'losses', 'ties', 'playoff_births',
+    'games_playoff', 'wins_playoff', 'losses_playoff', 'games_superbowl',
+    'wins_superbowl'
+]
+## playoff games per round before the superbowl, for 32 teams ##
+PLAYOFF_ROUNDS = [('WC', 6), ('DIV', 4), ('CON', 2)]
+
+def games(scale=1, seasons=range(1999, 2025), weeks=18, seed=0):
+    '''
+    nflfastR shaped games table with 32 * scale teams, so scale=1 is about
+    the size of the real history. Teams change coach between seasons about
+    15% of the time and every season ends in a single superbowl
+    '''
+    rng = numpy.random.default_rng(seed)
+    seasons = numpy.array(list(seasons))
+    n_teams = 32 * scale
+    teams = numpy.array(['T{0:04d}'.format(i) for i in range(n_teams)])
+    ## coach of each team in each season ##
+    changes = rng.random((len(seasons), n_teams)) < 0.15
+    changes[0] = True
+    tenure = numpy.cumsum(changes, axis=0)
+    coach_names = numpy.char.add(
+        numpy.char.add('Coach ', teams[None, :].repeat(len(seasons), axis=0)),
+        numpy.char.add('-', tenure.astype(str))
+    )
+    frames = []
+    for i, season in enumerate(seasons):
+        ## regular season, every team plays every week ##
+        pairs = numpy.argsort(rng.random((weeks, n_teams)), axis=1).reshape(weeks, -1, 2)
+        week = numpy.repeat(numpy.arange(1, weeks + 1), n_teams // 2)
+        home = pairs[:, :, 0].ravel()
+        away = pairs[:, :, 1].ravel()
+        game_type = numpy.full(len(home), 'REG', dtype=object)
+        ## playoffs, scaled with the league, then one superbowl ##
+        rounds = [(name, n * scale) for name, n in PLAYOFF_ROUNDS] + [('SB', 1)]
+        for j, (name, n) in enumerate(rounds):
+            teams_in_round = rng.permutation(n_teams)[:2 * n].reshape(-1, 2)
+            week = numpy.concatenate([week, numpy.full(n, weeks + 1 + j)])
+            home = numpy.concatenate([home, teams_in_round[:, 0]])
+            away = numpy.concatenate([away, teams_in_round[:, 1]])
+            game_type = numpy.concatenate([game_type, numpy.full(n, name, dtype=object)])
+        n_games = len(home)
+        home_score = rng.integers(0, 45, n_games)
+        away_score = rng.integers(0, 45, n_games)
+        spread = rng.integers(-14, 15, n_games) / 2
+        spread[rng.random(n_games) < 0.02] = numpy.nan
+        frames.append(pd.DataFrame({
+            'game_id' : numpy.char.add(
+                numpy.char.add('{0}_'.format(season), week.astype(str)),
+                numpy.char.add(numpy.char.add('_', teams[home]), numpy.char.add('_', teams[away]))
+            ),
+            'season' : season,
+            'game_type' : game_type,
+            'week' : week,
+            'home_team' : teams[home],
+            'away_team' : teams[away],
+            'home_score' : home_score,
+            'away_score' : away_score,
+            'result' : home_score - away_score,
+            'spread_line' : spread,
+            'home_rest' : rng.integers(4, 15, n_games),
+            'away_rest' : rng.integers(4, 15, n_games),
+            'roof' : rng.choice(['dome', 'closed', 'outdoors', 'open'], n_games),
+            'div_game' : (rng.random(n_games) < 0.35).astype('int64'),
+            'home_coach' : coach_names[i][home],
+            'away_coach' : coach_names[i][away],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def logos(scale=1):
+    return pd.DataFrame({
+        'team_abbr' : ['T{0:04d}'.format(i) for i in range(32 * scale)],
+        'team_color' : ['#{0:06x}'.format(i * 997 % 0xffffff) for i in range(32 * scale)],
+    })
+
+def coach_names(games):
+    return sorted(set(games['home_coach']) | set(games['away_coach']))
+
+def pfr_id(i):
+    return 'Syn{0:06d}'.format(i)
+
+def coach_meta(games, seed=0):
+    '''
+    coach_meta.csv shaped table with a row for every coach in games, random
+    headshots and coaching tree links
+    '''
+    rng = numpy.random.default_rng(seed)
+    names = coach_names(games)
+    ids = [pfr_id(i) for i in range(len(names))]
+    def tree():
+        links = [ids[j] for j in rng.integers(0, len(ids), rng.integers(0, 6))]
+        return ','.join(links) if len(links) > 0 else numpy.nan
+    return pd.DataFrame({
+        'pfr_coach_id' : ids,
+        'pfr_coach_name' : names,
+        'pfr_coach_image_url' : [
+            'https://example.com/{0}.jpg'.format(i) if rng.random() < 0.6 else numpy.nan
+            for i in ids
+        ],
+        'pfr_coach_tree_hired_by' : [tree() for _ in ids],
+        'pfr_coach_tree_hired' : [tree() for _ in ids],
+        'pfr_coach_last_checked' : '2025-09-09',
+    })
+
+def deltas(games, share=0.1, extra=400, seed=0):
+    '''
+    pre_99_coaching_deltas.csv shaped table covering share of the coaches in
+    games plus extra coaches who only exist in the deltas
+    '''
+    rng = numpy.random.default_rng(seed)
+    names = coach_names(games)
+    names = list(rng.choice(names, int(len(names) * share), replace=False))
+    names += ['Old Coach {0}'.format(i) for i in range(extra)]
+    n = len(names)
+    df = pd.DataFrame({'coach' : names})
+    for col in DELTA_COLUMNS:
+        values = rng.integers(0, 200, n)
+        ## match the mix of float and int columns in the real file ##
+        df[col] = values if col in ['seasons', 'ties'] else values.astype('float64')
+    return df
+
+def coach_page(pfr_coach_id, worked_for, employed, filler=2000, image=True):
+    '''
+    pfr coach page with the #meta block, the two commented out employment
+    tables and filler markup around them, roughly the size of a real page
+    '''
+    def table(key, ids):
+        rows = ''.join(
+            '<tr><th scope="row" class="left" data-stat="coach_name">'
+            '<a href="/coaches/{0}.htm">{0}</a></th>'
+            '<td class="right" data-stat="year_min">1990</td>'
+            '<td class="right" data-stat="year_max">1995</td></tr>'.format(i)
+            for i in ids
+        )
+        return (
+            '<div id="all_{0}" class="table_wrapper"><div class="section_heading">'
+            '<h2>{0}</h2></div><!--\n<div class="table_container" id="div_{0}">'
+            '<table class="stats_table" id="{0}"><tbody>{1}</tbody></table></div>\n-->'
+            '</div>'.format(key, rows)
+        )
+    fill = ''.join(
+        '<div class="filler"><p>Row {0} <a href="/years/{0}.htm">{0}</a></p>'
+        '<script>var x{0} = {0};</script></div>'.format(i)
+        for i in range(filler)
+    )
+    meta = '<div id="meta"><div class="media-item">{0}</div><div><h1>{1}</h1></div></div>'.format(
+        '<img src="https://example.com/{0}.jpg">'.format(pfr_coach_id) if image else '',
+        pfr_coach_id
+    )
+    return (
+        '<html><head><title>{0}</title></head><body><div id="wrap">'
+        '<div id="content">{1}{2}{3}{4}{2}</div></div></body></html>'
+    ).format(
+        pfr_coach_id, meta, fill[:len(fill) // 2].rsplit('<div class="filler">', 1)[0],
+        table('worked_for', worked_for), table('employed', employed)
+    )
+
+def coach_pages(n, seed=0):
+    '''
+    {url : html} for n synthetic coach pages
+    '''
+    rng = numpy.random.default_rng(seed)
+    pages = {}
+    for i in range(n):
+        links = [pfr_id(j) for j in rng.integers(0, max(n, 1), 20)]
+        pages['https://www.pro-football-reference.com/coaches/{0}.htm'.format(pfr_id(i))] = coach_page(
+            pfr_id(i), links[:rng.integers(0, 10)], links[10:10 + rng.integers(0, 10)],
+            image=rng.random() < 0.8
+        )
+    return pages
@@ -4,24 +4,34 @@ import datetime
 import pathlib
 import json
 import time
-import random
-import requests
-from bs4 import BeautifulSoup
 
-from .utils import id_from_url, Browser
+from .utils import counters, default_rate_limiter, CircuitOpenError
+from .parsers import parse_coach_page
+from .fetchers import default_fetcher, ThrottledError
 
 class Coach:
     '''
     Takes a row record from the coaches table and handles
     the SLA, scraping, and saving of profile URLs
     '''
-    def __init__(self, record, sla_days=365):
+    def __init__(self, record, sla_days=365, fetcher=None, rate_limiter=None, force=False, fetch_required=None):
         self.id = record['pfr_coach_id']
         self.record = record
         self.sla_days = sla_days
-        self.last_update = self.determine_last_fetch()
+        ## optional per worker fetch backend and shared rate limiter ##
+        self.fetcher = fetcher
+        self.rate_limiter = rate_limiter
         self.current_date = datetime.datetime.today().strftime('%Y-%m-%d')
-        self.fetch_required = self.determine_fetch_requirement()
+        ## a scheduler can decide instead of the flat SLA, in which case
+        ## the last check date is not parsed ##
+        self.last_update = None
+        ## set once a fetch finished and the record was checked ##
+        self.fetched = False
+        if force or fetch_required is not None:
+            self.fetch_required = force or fetch_required
+        else:
+            self.last_update = self.determine_last_fetch()
+            self.fetch_required = self.determine_fetch_requirement()
         ## update data if required
         if self.fetch_required:
             print('     Updating {0}'.format(record['pfr_coach_name']))
@@ -55,80 +65,46 @@ class Coach:
                 '%Y-%m-%d'
             ).date() -
             self.last_update
-        ).days > 365:
+        ).days > self.sla_days:
             return True
         ## if no conditions are met, do not update ##
         return False
 
-    def employment_table_helper(self, parsed_bs4, key):
-        '''
-        A helper to handle pfr's commented out tables
-        '''
-        ## return struc ##
-        return_array = []
-        try:
-            ## get the commented table ##
-            section = str(parsed_bs4.find('div', {'id' : 'all_{0}'.format(key)}))
-            new_parsed = BeautifulSoup(section.split('<!--')[1].split('-->')[0], 'html.parser')
-            ## now parse normally ##
-            table = new_parsed.findAll(
-                'table', {'id' : key}
-            )
-            if len(table) > 0:
-                coaches = table[0].findAll(
-                    'th', {'data-stat' : 'coach_name'}
-                )
-                if len(coaches) > 0:
-                    for c in coaches:
-                        anchor = c.findAll('a', href=True)
-                        if len(anchor) > 0:
-                            coach_id = id_from_url(
-                                anchor[0]['href']
-                            )
-                            if coach_id not in return_array:
-                                return_array.append(coach_id)
-        except Exception as e:
-            pass
-        ## return ##
-        return return_array
-        
-
     def scrape_coach(self):
         '''
         Scrapes the coaches profile if an update is required
         '''
+        ## use the worker's fetcher, or the default if none was passed ##
+        fetcher = self.fetcher if self.fetcher is not None else default_fetcher()
+        url = 'https://www.pro-football-reference.com/coaches/{0}.htm'.format(
+            self.id
+        )
+        ## pace requests that go over the network, and tell the limiter
+        ## how they went so adaptive pacing can react ##
+        rate_limiter = self.rate_limiter if self.rate_limiter is not None else default_rate_limiter()
+        network = fetcher.requires_network(url)
+        if network:
+            rate_limiter.wait()
         ## scrape pfr coaching page ##
-        time.sleep(5 + random.random() * 5)
         try:
-            ## use singleton browser instance ##
-            browser = Browser()
-            page_html = browser.get_page_html(
-                'https://www.pro-football-reference.com/coaches/{0}.htm'.format(
-                    self.id
-                )
-            )
+            page_html = fetcher.get_page_html(url)
+        except ThrottledError as e:
+            if network:
+                rate_limiter.throttled(e.retry_after)
+            raise
         except Exception as e:
+            if network:
+                rate_limiter.failure()
             raise Exception('PFR COACH SCRAPE ERROR: Could not scrape {0}: {1}'.format(
                 self.id, e
             ))
-        ## struc ##
-        img_url = numpy.nan
-        hired_by_array = []
-        hired_array = []
-        ## parse ##
-        soup = BeautifulSoup(page_html, "html.parser")
-        ## find image cells ##
-        image_block = soup.findAll('div', {'id' : 'meta'})
-        if len(image_block) > 0:
-            img = image_block[0].findAll('img')
-            if len(img) > 0:
-                img_url = img[0]['src']
-        else:
-            pass
-        ## find coaching tree ##
-        ## worked for ##
-        hired_by_array = self.employment_table_helper(soup, 'worked_for')
-        hired_array = self.employment_table_helper(soup, 'employed')
+        if network:
+            rate_limiter.success()
+        ## parse only the meta block and the coaching tree tables ##
+        parse_start = time.perf_counter()
+        img_url, hired_by_array, hired_array = parse_coach_page(page_html)
+        counters.add('pages_parsed')
+        counters.add('parse_seconds', time.perf_counter() - parse_start)
         ## return results ##
         return (
             img_url,
@@ -142,6 +118,12 @@ class Coach:
         '''
         try:
             img_url, hired_by, hired = self.scrape_coach()
+        except CircuitOpenError:
+            raise
+        except ThrottledError as e:
+            ## leave the record unchecked so it is retried next run ##
+            print('     {0}'.format(e))
+            return
         except Exception as e:
             print('Could not scrape {0}:'.format(self.id))
             print(e)
@@ -152,4 +134,5 @@ class Coach:
         self.record['pfr_coach_image_url'] = self.record['pfr_coach_image_url'] if pd.isnull(img_url) else img_url
         self.record['pfr_coach_tree_hired_by'] = self.record['pfr_coach_tree_hired_by'] if pd.isnull(hired_by) else hired_by
         self.record['pfr_coach_tree_hired'] = self.record['pfr_coach_tree_hired'] if pd.isnull(hired) else hired
-        self.record['pfr_coach_last_checked'] = self.current_date
\ No newline at end of file
+        self.record['pfr_coach_last_checked'] = self.current_date
+        self.fetched = True
\ No newline at end of file
@@ -2,31 +2,43 @@
 import pandas as pd
 import numpy
 import pathlib
-import requests
-from bs4 import BeautifulSoup
+import time
 
-from .utils import id_from_url, Browser
+from .utils import id_from_url, counters
+from .fetchers import default_fetcher
+from ..store.columnar import write_columnar, FORMATS
+from ..store.ChangeFeed import ChangeFeed
 
 class CoachTable:
     '''
     Table of coaches pulled from pfr. This class handles the reading of
-    existing data and appending
+    existing data and appending. columnar ('parquet' or 'arrow') also
+    writes a typed copy of the table next to coach_meta.csv
+
+    Construction does no work. build() loads the existing table (existing,
+    a DataFrame or path, defaults to coach_meta.csv), scrapes the index
+    unless scraped_records were given, and merges them once in memory.
+    update_and_save() builds and writes the table
     '''
-    def __init__(self):
+    def __init__(self, fetcher=None, columnar=None, existing=None, scraped_records=None):
         self.package_loc = pathlib.Path(__file__).parent.parent.resolve()
-        self.existing_df = self.load_existing()
-        self.scraped_records = []
+        self.columnar = columnar
+        self.fetcher = fetcher
+        self.existing = existing
+        self.existing_df = None
+        self.scraped_records = scraped_records
         self.new_records = []
         self.df = None
-        ## save ##
-        self.update_and_save()
 
     def load_existing(self):
         '''
         Attempt to load the local csv if it exists
         '''
+        if isinstance(self.existing, pd.DataFrame):
+            return self.existing
         try:
             return pd.read_csv(
+                self.existing if self.existing is not None else
                 '{0}/coaches/coach_meta.csv'.format(self.package_loc),
                 index_col=0
             )
@@ -37,10 +49,13 @@ class CoachTable:
         '''
         Scrapes the PFR coaching table for a list of all ids
         '''
-        ## use selenium browser to get HTML ##
-        browser = Browser()
-        page_html = browser.get_page_html('https://www.pro-football-reference.com/coaches/')
+        from bs4 import BeautifulSoup
+        if self.fetcher is None:
+            self.fetcher = default_fetcher()
+        ## get HTML from the fetch backend ##
+        page_html = self.fetcher.get_page_html('https://www.pro-football-reference.com/coaches/')
         ## parse with bs ##
+        parse_start = time.perf_counter()
         soup = BeautifulSoup(page_html, "html.parser")
         ## find coach cells ##
         coach_tds = soup.findAll('td', {'data-stat' : 'coach'})
@@ -62,6 +77,8 @@ class CoachTable:
         else:
             ## throw error if scrape failed ##
             raise Exception('PFR SCRAPE ERROR: Scraped the coaches page, but parser did not find coaches')
+        counters.add('pages_parsed')
+        counters.add('parse_seconds', time.perf_counter() - parse_start)
     
     def merge(self):
         '''
@@ -91,17 +108,44 @@ class CoachTable:
                 ].copy()
             ]).reset_index(drop=True)
     
-    def update_and_save(self):
+    def build(self):
         '''
-        Scrape, update, and save the coaches table
+        Load, scrape, and merge the coaches table once, without saving it
+        '''
+        if self.df is None:
+            self.existing_df = self.load_existing()
+            ## scrape the table to populate new records
+            if self.scraped_records is None:
+                self.scraped_records = []
+                self.scrape_table()
+            ## update the df ##
+            self.merge()
+        return self.df
+
+    def save(self, record=True):
+        '''
+        Write the built table to coach_meta.csv. record=False leaves the
+        write out of the change feed, for runs that record their last write
         '''
-        ## scrape the table to populate new records
-        self.scrape_table()
-        ## update the df ##
-        self.merge()
-        ## save ##
+        ## log the rows that change before replacing the file ##
+        if record:
+            ChangeFeed(
+                'coach_meta', 'pfr_coach_id', feed_dir='{0}/changes'.format(self.package_loc)
+            ).record('{0}/coaches/coach_meta.csv'.format(self.package_loc), self.df, index=True)
         self.df.to_csv(
             '{0}/coaches/coach_meta.csv'.format(self.package_loc)
         )
-        
-                
\ No newline at end of file
+        if self.columnar is not None:
+            write_columnar(
+                self.df,
+                '{0}/coaches/coach_meta.{1}'.format(self.package_loc, FORMATS[self.columnar]),
+                fmt=self.columnar
+            )
+
+    def update_and_save(self, record=True):
+        '''
+        Scrape, update, and save the coaches table
+        '''
+        self.build()
+        self.save(record=record)
+        return self.df
@@ -0,0 +1,289 @@
+## packages ##
+import pandas as pd
+import pathlib
+import datetime
+import hashlib
+import json
+import os
+from urllib.parse import urlparse
+import requests
+try:
+    from PIL import Image
+except ImportError:
+    ## thumbnails are optional, originals are still mirrored ##
+    Image = None
+
+from .utils import RateLimiter, USER_AGENT, counters
+from .fetchers import ThrottledError, THROTTLE_STATUS, parse_retry_after
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+## thumbnail bounding boxes, in pixels ##
+THUMB_SIZES = [64, 128, 256]
+## extensions for the content types hosts serve headshots as ##
+EXTENSIONS = {
+    'image/jpeg' : 'jpg',
+    'image/png' : 'png',
+    'image/gif' : 'gif',
+    'image/webp' : 'webp',
+}
+
+class HeadshotMirror:
+    '''
+    Local mirror of the headshots in coach_meta's pfr_coach_image_url, so
+    frontends do not hot link PFR, si.com, profootballhof.com, etc.
+
+    Each image is downloaded once and stored by the sha256 of its content in
+    objects/, so coaches sharing an image (or a url that moves to a copy of
+    the same file) are stored once. Thumbnails fitting each of sizes are
+    rendered to thumbs/{size}/{hash}.jpg when Pillow is installed.
+    manifest.json maps each coach to their source url, content hash and the
+    response validators (etag, last-modified), and each hash to its original
+    and thumbnails. A coach is only refetched when their url changes. With
+    force=True, mirrored urls are revalidated with If-None-Match /
+    If-Modified-Since and a 304 keeps the stored image. A run with Pillow fills in
+    thumbnails a run without it skipped, without refetching. Urls that
+    failed (not found, not an image) are also kept and not retried until
+    they change.
+
+    Requests are paced per host with a RateLimiter of min_interval and
+    jitter, since the images come from several hosts
+    '''
+
+    def __init__(
+        self, mirror_dir=None, sizes=THUMB_SIZES, min_interval=1, jitter=1,
+        timeout=30
+    ):
+        self.mirror_dir = pathlib.Path(
+            mirror_dir if mirror_dir is not None else
+            '{0}/headshots'.format(package_loc)
+        )
+        self.objects_dir = self.mirror_dir / 'objects'
+        self.thumbs_dir = self.mirror_dir / 'thumbs'
+        self.manifest_loc = self.mirror_dir / 'manifest.json'
+        self.sizes = list(sizes)
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.limiters = {}
+        self.session = None
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        '''
+        Load the manifest if it exists
+        '''
+        try:
+            with open(self.manifest_loc) as f:
+                return json.load(f)
+        except:
+            return {'coaches' : {}, 'objects' : {}, 'failed' : {}}
+
+    def save_manifest(self):
+        self.mirror_dir.mkdir(parents=True, exist_ok=True)
+        tmp = '{0}.tmp'.format(self.manifest_loc)
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp, self.manifest_loc)
+
+    def object_path(self, content_hash, ext):
+        return self.objects_dir / content_hash[:2] / '{0}.{1}'.format(content_hash, ext)
+
+    def thumb_path(self, content_hash, size):
+        return self.thumbs_dir / str(size) / '{0}.jpg'.format(content_hash)
+
+    def fetch_image(self, url, etag=None, last_modified=None):
+        '''
+        Fetch an image url with optional validators. Returns a tuple of the
+        status code, bytes and content type (None on a 304), and the
+        response's etag and last-modified headers. Raises ThrottledError on
+        429 / 503 and an exception if the response is not an image (ie a
+        block or error page served with a 200)
+        '''
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.headers.update({'User-Agent' : USER_AGENT})
+        host = urlparse(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = RateLimiter(self.min_interval, self.jitter)
+        self.limiters[host].wait()
+        headers = {}
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        counters.add('image_requests')
+        counters.add('bytes_fetched', len(resp.content))
+        if resp.status_code == 304:
+            return 304, None, None, etag, last_modified
+        if resp.status_code in THROTTLE_STATUS:
+            raise ThrottledError(url, parse_retry_after(resp.headers.get('Retry-After')))
+        resp.raise_for_status()
+        content_type = resp.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith('image/'):
+            raise Exception('HEADSHOT ERROR: {0} returned {1}, not an image'.format(
+                url, content_type or 'no content type'
+            ))
+        return (
+            resp.status_code, resp.content, content_type,
+            resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        )
+
+    def store_object(self, content, content_type):
+        '''
+        Writes an image's bytes under their hash unless already stored.
+        Returns the hash
+        '''
+        content_hash = hashlib.sha256(content).hexdigest()
+        if content_hash in self.manifest['objects']:
+            counters.add('images_deduped')
+            return content_hash
+        ext = EXTENSIONS.get(content_type, content_type.split('/')[-1])
+        path = self.object_path(content_hash, ext)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = '{0}.tmp'.format(path)
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+        self.manifest['objects'][content_hash] = {
+            'path' : str(path.relative_to(self.mirror_dir)),
+            'content_type' : content_type,
+            'bytes' : len(content),
+            'thumbs' : {},
+        }
+        return content_hash
+
+    def render_thumbs(self, content_hash):
+        '''
+        Renders any missing thumbnails of a stored image. Does nothing
+        without Pillow
+        '''
+        if Image is None:
+            return
+        entry = self.manifest['objects'][content_hash]
+        missing = [
+            size for size in self.sizes
+            if str(size) not in entry['thumbs'] or
+            not self.thumb_path(content_hash, size).is_file()
+        ]
+        if len(missing) == 0:
+            return
+        try:
+            with Image.open(self.mirror_dir / entry['path']) as img:
+                img.load()
+                entry['width'], entry['height'] = img.size
+                img = img.convert('RGB')
+                for size in missing:
+                    thumb = img.copy()
+                    ## keeps the aspect ratio and never upscales ##
+                    thumb.thumbnail((size, size), Image.LANCZOS)
+                    path = self.thumb_path(content_hash, size)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    thumb.save(path, 'JPEG', quality=85, optimize=True)
+                    entry['thumbs'][str(size)] = str(path.relative_to(self.mirror_dir))
+                    counters.add('thumbs_rendered')
+        except Exception as e:
+            print('     Could not render thumbnails for {0}: {1}'.format(content_hash, e))
+
+    def mirror(self, coach_meta, force=False):
+        '''
+        Mirrors the headshot of each coach in coach_meta (indexed by or with
+        a pfr_coach_id column). Returns a summary of the run
+        '''
+        urls = (
+            coach_meta.set_index('pfr_coach_id') if 'pfr_coach_id' in coach_meta.columns
+            else coach_meta
+        )['pfr_coach_image_url']
+        s = {'fetched' : 0, 'unchanged' : 0, 'deduped' : 0, 'failed' : 0, 'removed' : 0}
+        coaches = self.manifest['coaches']
+        failed = self.manifest.setdefault('failed', {})
+        try:
+            for pfr_id, url in urls.items():
+                if pd.isnull(url) or pd.isnull(pfr_id):
+                    continue
+                entry = coaches.get(pfr_id)
+                mirrored = (
+                    entry is not None and entry['url'] == url and
+                    entry['hash'] in self.manifest['objects']
+                )
+                if not force and (mirrored or failed.get(pfr_id) == url):
+                    s['unchanged'] += 1
+                    continue
+                try:
+                    status, content, content_type, etag, last_modified = self.fetch_image(
+                        url,
+                        etag=entry.get('etag') if mirrored else None,
+                        last_modified=entry.get('last_modified') if mirrored else None
+                    )
+                except ThrottledError:
+                    ## leave the rest for the next run ##
+                    print('     Throttled on {0}, stopping'.format(urlparse(url).netloc))
+                    s['failed'] += 1
+                    break
+                except Exception as e:
+                    print('     Could not mirror {0}: {1}'.format(pfr_id, e))
+                    failed[pfr_id] = url
+                    s['failed'] += 1
+                    continue
+                failed.pop(pfr_id, None)
+                if status == 304:
+                    entry['fetched_at'] = datetime.datetime.now().isoformat()
+                    s['unchanged'] += 1
+                    continue
+                known = hashlib.sha256(content).hexdigest() in self.manifest['objects']
+                coaches[pfr_id] = {
+                    'url' : url,
+                    'hash' : self.store_object(content, content_type),
+                    'etag' : etag,
+                    'last_modified' : last_modified,
+                    'fetched_at' : datetime.datetime.now().isoformat(),
+                }
+                s['deduped' if known else 'fetched'] += 1
+            ## drop coaches no longer in coach_meta or without an image ##
+            for pfr_id in list(coaches.keys()):
+                if pfr_id not in urls.index or pd.isnull(urls.get(pfr_id)):
+                    coaches.pop(pfr_id)
+                    s['removed'] += 1
+            for pfr_id in list(failed.keys()):
+                if failed[pfr_id] != urls.get(pfr_id):
+                    failed.pop(pfr_id)
+            self.prune()
+            for content_hash in self.manifest['objects']:
+                self.render_thumbs(content_hash)
+        finally:
+            self.save_manifest()
+        print('     Mirrored headshots: {0} fetched, {1} deduped, {2} unchanged, {3} failed'.format(
+            s['fetched'], s['deduped'], s['unchanged'], s['failed']
+        ))
+        return s
+
+    def prune(self):
+        '''
+        Deletes images no coach points to anymore
+        '''
+        used = set(entry['hash'] for entry in self.manifest['coaches'].values())
+        for content_hash in list(self.manifest['objects'].keys()):
+            if content_hash in used:
+                continue
+            entry = self.manifest['objects'].pop(content_hash)
+            paths = [entry['path']] + list(entry['thumbs'].values())
+            for path in paths:
+                (self.mirror_dir / path).unlink(missing_ok=True)
+
+    def local_path(self, pfr_coach_id, size=None):
+        '''
+        Path of a coach's mirrored headshot, the original or the thumbnail
+        of size. None if it is not mirrored
+        '''
+        entry = self.manifest['coaches'].get(pfr_coach_id)
+        if entry is None:
+            return None
+        obj = self.manifest['objects'][entry['hash']]
+        path = obj['path'] if size is None else obj['thumbs'].get(str(size))
+        return None if path is None else self.mirror_dir / path
+
+    def stop(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
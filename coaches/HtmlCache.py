@@ -0,0 +1,193 @@
+import pathlib
+import json
+import gzip
+import hashlib
+import threading
+import time
+import os
+
+class HtmlCache:
+    '''
+    Content addressed, gzip compressed on-disk cache of raw page html.
+
+    Html bodies are stored once per sha256 of their content in objects/,
+    and index.json maps each url to its content hash along with the
+    response validators (etag, last-modified) and the time it was last
+    fetched or revalidated. Eviction drops entries older than max_age
+    seconds and then the least recently fetched entries until the
+    compressed store fits within max_bytes.
+
+    The index is written after every flush_every changes and on flush()
+    (CachingBackend.stop flushes), not on every put. A crash loses at most
+    the last flush_every entries, whose pages are fetched again
+    '''
+    def __init__(self, cache_dir, max_age=None, max_bytes=None, flush_every=25):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.objects_dir = self.cache_dir.joinpath('objects')
+        self.index_loc = self.cache_dir.joinpath('index.json')
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        ## index changes not yet written ##
+        self.unsaved = 0
+        self._lock = threading.RLock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        '''
+        Load the url index if it exists
+        '''
+        try:
+            with open(self.index_loc) as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def save_index(self):
+        '''
+        Atomically write the url index
+        '''
+        tmp = self.index_loc.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_loc)
+
+    def changed(self):
+        '''
+        Count an index change, writing the index every flush_every changes
+        '''
+        with self._lock:
+            self.unsaved += 1
+            if self.unsaved >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        '''
+        Write the index if it has unsaved changes
+        '''
+        with self._lock:
+            if self.unsaved > 0:
+                self.save_index()
+                self.unsaved = 0
+
+    def object_path(self, content_hash):
+        return self.objects_dir.joinpath(
+            content_hash[:2], '{0}.html.gz'.format(content_hash)
+        )
+
+    def get(self, url):
+        '''
+        Returns the index entry for a url or None
+        '''
+        with self._lock:
+            entry = self.index.get(url)
+            return None if entry is None else dict(entry)
+
+    def is_fresh(self, url, ttl):
+        '''
+        True if the url was fetched or revalidated within ttl seconds
+        '''
+        entry = self.get(url)
+        if entry is None or ttl is None:
+            return False
+        return time.time() - entry['fetched_at'] <= ttl
+
+    def read(self, url):
+        '''
+        Returns the cached html for a url or None
+        '''
+        entry = self.get(url)
+        if entry is None:
+            return None
+        try:
+            with gzip.open(self.object_path(entry['hash']), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            ## object was removed out from under the index ##
+            with self._lock:
+                self.index.pop(url, None)
+                self.changed()
+            return None
+
+    def put(self, url, html, etag=None, last_modified=None):
+        '''
+        Store html for a url along with its validators
+        '''
+        body = html.encode('utf-8')
+        content_hash = hashlib.sha256(body).hexdigest()
+        path = self.object_path(content_hash)
+        with self._lock:
+            previous = self.index.get(url)
+            if not path.is_file():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix('.tmp')
+                with gzip.open(tmp, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp, path)
+            self.index[url] = {
+                'hash' : content_hash,
+                'etag' : etag,
+                'last_modified' : last_modified,
+                'fetched_at' : time.time(),
+                'size' : path.stat().st_size,
+            }
+            if previous is not None and previous['hash'] != content_hash:
+                self.remove_unreferenced([previous['hash']])
+            self.evict()
+            self.changed()
+
+    def touch(self, url):
+        '''
+        Mark a url as revalidated (ie a 304 response)
+        '''
+        with self._lock:
+            if url in self.index:
+                self.index[url]['fetched_at'] = time.time()
+                self.changed()
+
+    def evict(self):
+        '''
+        Apply age and size bounds, removing unreferenced objects
+        '''
+        with self._lock:
+            removed = []
+            ## age ##
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                for url in [u for u, e in self.index.items() if e['fetched_at'] < cutoff]:
+                    removed.append(self.index.pop(url)['hash'])
+            ## size, counting each shared object once ##
+            if self.max_bytes is not None:
+                refs = {}
+                sizes = {}
+                for e in self.index.values():
+                    refs[e['hash']] = refs.get(e['hash'], 0) + 1
+                    sizes[e['hash']] = e['size']
+                total = sum(sizes.values())
+                ## only sorted when over the bound ##
+                urls = [] if total <= self.max_bytes else sorted(
+                    self.index.items(), key=lambda x: x[1]['fetched_at']
+                )
+                for url, entry in urls:
+                    if total <= self.max_bytes:
+                        break
+                    del self.index[url]
+                    removed.append(entry['hash'])
+                    refs[entry['hash']] -= 1
+                    if refs[entry['hash']] == 0:
+                        total -= sizes[entry['hash']]
+            self.remove_unreferenced(removed)
+
+    def remove_unreferenced(self, hashes):
+        '''
+        Delete objects for the passed hashes that no url points to anymore
+        '''
+        if len(hashes) == 0:
+            return
+        with self._lock:
+            referenced = set(e['hash'] for e in self.index.values())
+            for content_hash in set(hashes) - referenced:
+                path = self.object_path(content_hash)
+                if path.is_file():
+                    path.unlink()
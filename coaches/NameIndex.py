@@ -0,0 +1,163 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+import json
+import re
+import difflib
+import unicodedata
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+## name suffixes dropped from keys ##
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+def normalize_name(name):
+    '''
+    Matching key for a coach name -- lower case ascii, no punctuation or
+    suffixes, single spaced. "J.D. Roberts" and "Bill O'Brien Jr." become
+    "jd roberts" and "bill obrien"
+    '''
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    name = re.sub(r"[.']", '', name.lower())
+    tokens = [t for t in re.split(r'[^a-z0-9]+', name) if t != '']
+    while len(tokens) > 1 and tokens[-1] in SUFFIXES:
+        tokens = tokens[:-1]
+    return ' '.join(tokens)
+
+def block_key(key):
+    '''
+    Fuzzy matching only compares names in the same block, the first four
+    letters of the surname
+    '''
+    return key.split(' ')[-1][:4]
+
+class NameIndex:
+    '''
+    Maps nflfastR coach strings to pfr_coach_id.
+
+    A name is resolved by, in order, the alias table (raw names or keys to
+    ids, coaches/name_aliases.json by default), an exact match on the
+    normalized key, and a fuzzy match against pfr names in the same block
+    with a similarity of at least cutoff. Keys shared by more than one id
+    (two coaches with the same name) resolve to the first id in coach_meta
+    unless aliased, and are listed in ambiguous. Fuzzy matches are listed
+    in fuzzy and unresolved names in unmatched so they can be reviewed and
+    pinned with add_alias / save_aliases
+
+    An alias for a name shared by coaches can be a list of
+    {"pfr_coach_id", "seasons" : [first, last]}, resolved by the season
+    passed to resolve. Without a season, the first entry is used
+    '''
+
+    def __init__(self, coach_meta, aliases=None, cutoff=0.85):
+        self.cutoff = cutoff
+        self.aliases_loc = (
+            aliases if isinstance(aliases, (str, pathlib.Path)) else
+            '{0}/coaches/name_aliases.json'.format(package_loc)
+        )
+        self.aliases = aliases if isinstance(aliases, dict) else self.load_aliases()
+        ## key -> ids in coach_meta order, and block -> keys ##
+        self.ids = {}
+        self.blocks = {}
+        for pfr_id, name in zip(coach_meta['pfr_coach_id'], coach_meta['pfr_coach_name']):
+            if pd.isnull(pfr_id) or pd.isnull(name):
+                continue
+            key = normalize_name(name)
+            if key not in self.ids:
+                self.ids[key] = []
+                self.blocks.setdefault(block_key(key), []).append(key)
+            if pfr_id not in self.ids[key]:
+                self.ids[key].append(pfr_id)
+        self.resolved = {}
+        self.ambiguous = {}
+        self.fuzzy = {}
+        self.unmatched = set()
+
+    def load_aliases(self):
+        '''
+        Load the persisted alias table if it exists
+        '''
+        try:
+            with open(self.aliases_loc) as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def add_alias(self, name, pfr_coach_id):
+        '''
+        Pins a name to an id, overriding any previous resolution
+        '''
+        self.aliases[name] = pfr_coach_id
+        self.resolved = {}
+
+    def save_aliases(self, path=None):
+        with open(path if path is not None else self.aliases_loc, 'w') as f:
+            json.dump(self.aliases, f, indent=4, sort_keys=True)
+
+    def alias(self, name, key, season=None):
+        '''
+        Aliased id of a name, or None if it has no alias for the season
+        '''
+        alias = self.aliases.get(name, self.aliases.get(key))
+        if alias is None or isinstance(alias, str):
+            return alias
+        for entry in alias:
+            first, last = entry['seasons']
+            if season is None or first <= season <= last:
+                return entry['pfr_coach_id']
+        return None
+
+    def resolve(self, name, season=None):
+        '''
+        pfr_coach_id for a name (as of a season, if given), or None if it
+        cannot be resolved
+        '''
+        if (name, season) in self.resolved:
+            return self.resolved[(name, season)]
+        key = normalize_name(name)
+        pfr_id = self.alias(name, key, season)
+        if pfr_id is None and key in self.ids:
+            ids = self.ids[key]
+            if len(ids) > 1:
+                self.ambiguous[name] = ids
+            pfr_id = ids[0]
+        elif pfr_id is None:
+            pfr_id = self.fuzzy_match(name, key)
+        self.resolved[(name, season)] = pfr_id
+        return pfr_id
+
+    def fuzzy_match(self, name, key):
+        '''
+        Closest unambiguous pfr name in the block, or None
+        '''
+        candidates = self.blocks.get(block_key(key), [])
+        matches = difflib.get_close_matches(key, candidates, n=2, cutoff=self.cutoff)
+        ## skip ties rather than guess between two coaches ##
+        if len(matches) == 0 or (
+            len(matches) == 2 and
+            difflib.SequenceMatcher(None, key, matches[0]).ratio() ==
+            difflib.SequenceMatcher(None, key, matches[1]).ratio()
+        ):
+            self.unmatched.add(name)
+            return None
+        self.fuzzy[name] = matches[0]
+        return self.ids[matches[0]][0]
+
+    def resolve_all(self, names):
+        '''
+        Array of pfr_coach_ids (null where unresolved) for a sequence of
+        names, resolving each distinct name once
+        '''
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        ids = numpy.array([self.resolve(name) for name in uniques] + [None], dtype=object)
+        ## code -1 (null names) picks the trailing None ##
+        return ids[codes]
+
+    def summary(self):
+        return {
+            'resolved' : sum(1 for i in self.resolved.values() if i is not None),
+            'ambiguous' : len(self.ambiguous),
+            'fuzzy' : len(self.fuzzy),
+            'unmatched' : len(self.unmatched),
+        }
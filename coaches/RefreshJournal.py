@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+
+class RefreshJournal:
+    '''
+    Append only journal of refreshed coach records. Each record is written
+    as a json line and flushed to disk as soon as the coach is handled, so
+    a crashed or blocked refresh keeps everything scraped up to that point.
+
+    The journal is periodically compacted into coach_meta.csv by the caller
+    (see compact), after which it is truncated
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        ## entries appended since the last compaction ##
+        self.pending = 0
+
+    def load(self):
+        '''
+        Records in the journal, keyed by pfr coach id. Later entries win and
+        a partially written last line (ie from a crash mid write) is ignored
+        '''
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['pfr_coach_id']] = record
+        return records
+
+    def append(self, record):
+        '''
+        Write a record and fsync it. Returns the number of entries since the
+        last compaction
+        '''
+        line = json.dumps(record, default=str)
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending += 1
+            return self.pending
+
+    def compact(self, write):
+        '''
+        Run write (which should atomically persist everything journaled so
+        far) and truncate the journal once it succeeds
+        '''
+        with self.lock:
+            write()
+            self.clear()
+
+    def clear(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.pending = 0
@@ -0,0 +1,162 @@
+## packages ##
+import pandas as pd
+import numpy
+import math
+import pathlib
+import datetime
+
+from .NameIndex import NameIndex
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+## coaches refreshed per run unless a budget is given, None is unlimited ##
+DEFAULT_BUDGET = 50
+
+class RefreshScheduler:
+    '''
+    Picks the coaches to refresh in a run, most overdue first, at most
+    budget per run (None for no limit)
+    '''
+    def __init__(
+        self, coach_meta, coach_stats=None, sla_days=365, active_sla_days=90,
+        missing_boost=1.5, budget=DEFAULT_BUDGET, pull_forward=0.5, today=None
+    ):
+        self.sla_days = sla_days
+        self.active_sla_days = active_sla_days
+        self.missing_boost = missing_boost
+        self.budget = budget
+        self.pull_forward = pull_forward
+        self.today = pd.Timestamp(
+            today if today is not None else datetime.date.today()
+        )
+        self.active_ids = self.load_active_ids(coach_meta, coach_stats)
+        self.plan = self.build_plan(coach_meta)
+
+    def load_active_ids(self, coach_meta, coach_stats=None):
+        '''
+        pfr ids of active coaches from the compiled stats, or an empty set if
+        they have not been compiled yet. Output from before it had a
+        pfr_coach_id column is matched with a NameIndex over coach_meta
+        '''
+        try:
+            if coach_stats is None or isinstance(coach_stats, (str, pathlib.Path)):
+                coach_stats = pd.read_csv(
+                    coach_stats if coach_stats is not None else
+                    '{0}/coaches.csv'.format(package_loc),
+                    usecols=lambda col: col in ['coach', 'is_active', 'pfr_coach_id']
+                )
+            active = coach_stats[coach_stats['is_active'] == 1]
+            ids = (
+                active['pfr_coach_id'].to_numpy(dtype=object, copy=True) if 'pfr_coach_id' in active.columns
+                else numpy.full(len(active), None, dtype=object)
+            )
+            unresolved = pd.isnull(ids)
+            if unresolved.any():
+                ids[unresolved] = NameIndex(coach_meta).resolve_all(active['coach'][unresolved])
+            return set(i for i in ids if not pd.isnull(i))
+        except:
+            return set()
+
+    def build_plan(self, coach_meta):
+        '''
+        Frame of the scheduling signals, priority and selection for each row
+        of coach_meta, in the same order. Priority is days since last check
+        over the coach's SLA (active_sla_days for active coaches), scaled by
+        missing_boost when the image or tree is missing. A coach is due at 1,
+        and runs under budget are topped up down to pull_forward
+        '''
+        plan = pd.DataFrame({
+            'pfr_coach_id' : coach_meta['pfr_coach_id'].to_numpy(),
+            'pfr_coach_name' : coach_meta['pfr_coach_name'].to_numpy(),
+        })
+        plan['is_active'] = plan['pfr_coach_id'].isin(self.active_ids).to_numpy()
+        plan['is_missing'] = (
+            pd.isnull(coach_meta['pfr_coach_image_url']) |
+            (
+                pd.isnull(coach_meta['pfr_coach_tree_hired_by']) &
+                pd.isnull(coach_meta['pfr_coach_tree_hired'])
+            )
+        ).to_numpy()
+        last_checked = pd.to_datetime(
+            coach_meta['pfr_coach_last_checked'], format='%Y-%m-%d', errors='coerce'
+        )
+        plan['days_since_check'] = (self.today - last_checked).dt.days.to_numpy()
+        plan['sla_days'] = numpy.where(
+            plan['is_active'], self.active_sla_days, self.sla_days
+        )
+        ## never checked coaches are always first ##
+        plan['priority'] = numpy.where(
+            pd.isnull(plan['days_since_check']),
+            numpy.inf,
+            plan['days_since_check'].fillna(0) / plan['sla_days'] *
+            numpy.where(plan['is_missing'], self.missing_boost, 1)
+        )
+        plan['is_due'] = plan['priority'] >= 1
+        ## pick by priority within the budget ##
+        order = numpy.argsort(-plan['priority'].to_numpy(), kind='stable')
+        eligible = plan['is_due'].to_numpy()[order]
+        if self.budget is not None:
+            eligible = eligible | (plan['priority'].to_numpy()[order] >= self.pull_forward)
+        picked = order[eligible]
+        if self.budget is not None:
+            picked = picked[:self.budget]
+        selected = numpy.zeros(len(plan), dtype=bool)
+        selected[picked] = True
+        plan['selected'] = selected
+        return plan
+
+    def fetch_required(self):
+        '''
+        Whether each row of coach_meta should be fetched this run
+        '''
+        return self.plan['selected'].tolist()
+
+    def work_list(self):
+        '''
+        Row positions in coach_meta to fetch this run, highest priority first
+        '''
+        selected = numpy.flatnonzero(self.plan['selected'].to_numpy())
+        return selected[numpy.argsort(-self.plan['priority'].to_numpy()[selected], kind='stable')]
+
+    def estimate(self, min_interval=5, jitter=5, workers=1, fetch_seconds=2, rows=None, max_rate=None, step=0.25):
+        '''
+        Expected cost of fetching the work list (or rows positions) -- every
+        request waits for a rate limiter slot (min_interval plus half the
+        jitter on average, shared by all workers) and takes fetch_seconds,
+        so a run is paced by whichever of the two is slower. With max_rate,
+        slots tighten by step per request towards max_rate a minute, as
+        with an AdaptiveRateLimiter that is never throttled
+        '''
+        n = len(self.work_list() if rows is None else rows)
+        intervals = numpy.full(n, float(min_interval))
+        if max_rate is not None:
+            floor = max(60 / max_rate - jitter / 2, 0)
+            intervals = numpy.maximum(floor, min_interval - step * numpy.arange(n))
+        per_request = numpy.maximum(intervals + jitter / 2, fetch_seconds / max(workers, 1))
+        return {
+            'requests' : n,
+            'seconds_per_request' : float(per_request.mean()) if n > 0 else 0.0,
+            'est_seconds' : float(per_request.sum()),
+        }
+
+    def steady_state_budget(self, runs_per_year=52):
+        '''
+        Budget that keeps every coach within their SLA when running
+        runs_per_year times a year
+        '''
+        sla = numpy.where(
+            self.plan['is_missing'],
+            self.plan['sla_days'] / self.missing_boost,
+            self.plan['sla_days']
+        )
+        return int(math.ceil((365 / sla).sum() / runs_per_year))
+
+    def summary(self):
+        return {
+            'coaches' : len(self.plan),
+            'due' : int(self.plan['is_due'].sum()),
+            'selected' : int(self.plan['selected'].sum()),
+            'active' : int(self.plan['is_active'].sum()),
+            'missing' : int(self.plan['is_missing'].sum()),
+            'budget' : self.budget,
+        }
@@ -1,3 +1,11 @@
-from .Coach import Coach
-from .CoachTable import CoachTable
-from .update_coaches import update_coach_meta
\ No newline at end of file
+from ..lazy import lazy_package
+
+lazy_package(__name__, {
+    'Coach' : ('.Coach', 'Coach'),
+    'CoachTable' : ('.CoachTable', 'CoachTable'),
+    'NameIndex' : ('.NameIndex', 'NameIndex'),
+    'HeadshotMirror' : ('.HeadshotMirror', 'HeadshotMirror'),
+    'update_coach_meta' : ('.update_coaches', 'update_coach_meta'),
+    'preview_coach_meta' : ('.update_coaches', 'preview_coach_meta'),
+    'FetchOptions' : ('.fetchers', 'FetchOptions'),
+})
\ No newline at end of file
@@ -0,0 +1,327 @@
+import pathlib
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+from .utils import Browser, USER_AGENT, counters, RateLimiter, AdaptiveRateLimiter
+from .HtmlCache import HtmlCache
+
+## responses that mean pfr wants us to slow down ##
+THROTTLE_STATUS = [429, 503]
+BLOCK_PAGE_MARKERS = ['rate limited request', 'too many requests']
+## block pages are small, real coach pages are not ##
+BLOCK_PAGE_MAX_BYTES = 20000
+
+class ThrottledError(Exception):
+    '''
+    Raised when a fetch was throttled (429 / 503 or a block page), with the
+    seconds pfr asked us to wait when it said
+    '''
+    def __init__(self, url, retry_after=None):
+        self.url = url
+        self.retry_after = retry_after
+        super().__init__('FETCH ERROR: Throttled on {0}{1}'.format(
+            url, '' if retry_after is None else ', retry after {0}s'.format(retry_after)
+        ))
+
+def parse_retry_after(value):
+    '''
+    Retry-After in seconds, or None if missing or given as a date
+    '''
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def check_block_page(url, html):
+    '''
+    Raises ThrottledError if html is a rate limit page instead of content
+    '''
+    if html is not None and len(html) < BLOCK_PAGE_MAX_BYTES:
+        lower = html.lower()
+        if any(marker in lower for marker in BLOCK_PAGE_MARKERS):
+            raise ThrottledError(url)
+    return html
+
+class FetchBackend:
+    '''
+    Interface for fetching raw page html. Backends implement get_page_html
+    and optionally stop to release any held resources
+    '''
+    def get_page_html(self, url):
+        '''
+        Return the html for a url
+        '''
+        raise NotImplementedError
+
+    def requires_network(self, url):
+        '''
+        Whether fetching the url will make a network request, which
+        callers use to decide if request pacing applies
+        '''
+        return True
+
+    def stop(self):
+        '''
+        Release any resources held by the backend
+        '''
+        pass
+
+class SessionBackend(FetchBackend):
+    '''
+    Pooled keep-alive requests session. PFR's coach pages are static, so
+    a plain http fetch returns the same html as a browser
+    '''
+    def __init__(self, timeout=30, pool_size=4):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+
+    def start(self):
+        '''
+        Create the session if it does not exist
+        '''
+        if self.session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'User-Agent' : USER_AGENT})
+            self.session = session
+
+    def fetch_conditional(self, url, etag=None, last_modified=None):
+        '''
+        Fetch a url with optional validators. Returns a tuple of the
+        status code, html (None on a 304), and the response's etag and
+        last-modified headers
+        '''
+        if self.session is None:
+            self.start()
+        headers = {}
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        counters.add('requests')
+        counters.add('bytes_fetched', len(resp.content))
+        if resp.status_code == 304:
+            return 304, None, etag, last_modified
+        if resp.status_code in THROTTLE_STATUS:
+            raise ThrottledError(url, parse_retry_after(resp.headers.get('Retry-After')))
+        resp.raise_for_status()
+        return (
+            resp.status_code, check_block_page(url, resp.text),
+            resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        )
+
+    def get_page_html(self, url):
+        return self.fetch_conditional(url)[1]
+
+    def stop(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+class SeleniumBackend(FetchBackend):
+    '''
+    Headless chrome backend. Opt in fallback for pages that need javascript
+    '''
+    def __init__(self, shared=True):
+        self.browser = Browser(shared=shared)
+
+    def get_page_html(self, url):
+        html = self.browser.get_page_html(url)
+        counters.add('requests')
+        counters.add('bytes_fetched', len(html.encode('utf-8')))
+        ## the browser does not expose status codes, only the page ##
+        return check_block_page(url, html)
+
+    def stop(self):
+        self.browser.stop()
+
+class FixtureBackend(FetchBackend):
+    '''
+    Serves pages from a local directory of saved html so the pipeline can
+    be run and benchmarked offline. URL paths map to files in the directory,
+    with directory urls mapping to index.htm:
+
+        /coaches/            -> {fixture_dir}/coaches/index.htm
+        /coaches/BeliBi0.htm -> {fixture_dir}/coaches/BeliBi0.htm
+    '''
+    def __init__(self, fixture_dir):
+        self.fixture_dir = pathlib.Path(fixture_dir)
+
+    def path_for_url(self, url):
+        '''
+        Translate a url into its fixture path
+        '''
+        path = urlparse(url).path or '/'
+        if path.endswith('/'):
+            path = '{0}index.htm'.format(path)
+        return self.fixture_dir.joinpath(path.lstrip('/'))
+
+    def get_page_html(self, url):
+        path = self.path_for_url(url)
+        if not path.is_file():
+            raise Exception('FIXTURE ERROR: No fixture for {0} at {1}'.format(
+                url, path
+            ))
+        counters.add('fixture_reads')
+        return path.read_text(encoding='utf-8')
+
+    def requires_network(self, url):
+        return False
+
+class CachingBackend(FetchBackend):
+    '''
+    Wraps a backend with an HtmlCache. Cached pages younger than ttl seconds
+    are served without a request. Older pages are revalidated with
+    If-None-Match / If-Modified-Since when the wrapped backend supports
+    conditional requests. With offline=True everything is served from the
+    cache and uncached urls raise
+    '''
+    def __init__(self, backend, cache, ttl=None, offline=False):
+        self.backend = backend
+        self.cache = cache
+        self.ttl = ttl
+        self.offline = offline
+
+    def requires_network(self, url):
+        if self.offline or self.cache.is_fresh(url, self.ttl):
+            return False
+        return self.backend.requires_network(url)
+
+    def get_page_html(self, url):
+        ## serve from cache if possible ##
+        if self.offline or self.cache.is_fresh(url, self.ttl):
+            html = self.cache.read(url)
+            if html is not None:
+                counters.add('cache_hits')
+                return html
+            if self.offline:
+                raise Exception('CACHE ERROR: {0} is not cached and the cache is offline'.format(url))
+        ## conditional revalidation ##
+        entry = self.cache.get(url)
+        if hasattr(self.backend, 'fetch_conditional'):
+            status, html, etag, last_modified = self.backend.fetch_conditional(
+                url,
+                etag=None if entry is None else entry['etag'],
+                last_modified=None if entry is None else entry['last_modified']
+            )
+            if status == 304:
+                html = self.cache.read(url)
+                if html is not None:
+                    counters.add('cache_revalidations')
+                    self.cache.touch(url)
+                    return html
+                ## cached body is gone, refetch unconditionally ##
+                status, html, etag, last_modified = self.backend.fetch_conditional(url)
+            self.cache.put(url, html, etag=etag, last_modified=last_modified)
+            return html
+        html = self.backend.get_page_html(url)
+        self.cache.put(url, html)
+        return html
+
+    def stop(self):
+        self.cache.flush()
+        self.backend.stop()
+
+## backend registry ##
+BACKENDS = {
+    'session' : SessionBackend,
+    'selenium' : SeleniumBackend,
+    'fixture' : FixtureBackend,
+}
+
+def get_fetcher(backend='session', **kwargs):
+    '''
+    Create a fetch backend by name. Backend instances are passed through
+    '''
+    if isinstance(backend, FetchBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise Exception('FETCH ERROR: Unknown backend {0}. Options are {1}'.format(
+            backend, ', '.join(BACKENDS.keys())
+        ))
+    return BACKENDS[backend](**kwargs)
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+def default_fetcher():
+    '''
+    Process wide session backend used when no fetcher is passed
+    '''
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = SessionBackend()
+        return _default_fetcher
+
+class FetchOptions:
+    '''
+    How a refresh fetches and paces pfr pages. backend and fixture_dir pick
+    the backend (see get_fetcher). With a cache_dir, pages go through an
+    HtmlCache (see CachingBackend). min_interval, jitter, max_rate and
+    max_failures configure the rate limiter, with max_rate=None for a fixed
+    RateLimiter instead of an AdaptiveRateLimiter
+    '''
+    def __init__(
+        self, backend='session', fixture_dir=None,
+        cache_dir=None, cache_ttl=None, cache_max_age=None, cache_max_bytes=None, offline=False,
+        min_interval=5, jitter=5, max_rate=12, max_failures=5
+    ):
+        if offline and cache_dir is None:
+            raise Exception('CACHE ERROR: offline refreshes require a cache_dir')
+        self.backend = backend
+        self.fixture_dir = fixture_dir
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.cache_max_age = cache_max_age
+        self.cache_max_bytes = cache_max_bytes
+        self.offline = offline
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.max_rate = max_rate
+        self.max_failures = max_failures
+
+    def new_cache(self):
+        '''
+        The HtmlCache fetchers share, or None without a cache_dir
+        '''
+        if self.cache_dir is None:
+            return None
+        return HtmlCache(
+            self.cache_dir, max_age=self.cache_max_age, max_bytes=self.cache_max_bytes
+        )
+
+    def new_fetcher(self, cache=None, shared=True):
+        '''
+        A fetcher for one worker. Workers that should not share a browser
+        pass shared=False
+        '''
+        if self.backend == 'fixture':
+            fetcher = get_fetcher(self.backend, fixture_dir=self.fixture_dir)
+        elif self.backend == 'selenium':
+            fetcher = get_fetcher(self.backend, shared=shared)
+        else:
+            fetcher = get_fetcher(self.backend)
+        if cache is not None:
+            fetcher = CachingBackend(fetcher, cache, ttl=self.cache_ttl, offline=self.offline)
+        return fetcher
+
+    def new_rate_limiter(self):
+        '''
+        The rate limiter every worker shares
+        '''
+        if self.max_rate is None:
+            return RateLimiter(min_interval=self.min_interval, jitter=self.jitter)
+        return AdaptiveRateLimiter(
+            min_interval=self.min_interval, jitter=self.jitter, max_rate=self.max_rate,
+            max_failures=self.max_failures
+        )
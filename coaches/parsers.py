@@ -0,0 +1,151 @@
+import re
+import html
+import numpy
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .utils import id_from_url
+
+## lxml is optional and much faster, html.parser is the fallback ##
+try:
+    import lxml
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+## comments and script / style bodies, where tags are only text ##
+RAW_TEXT = r'<!--.*?-->|<(script|style)(?=[\s/>]).*?(?:</\1\s*>|\Z)'
+RAW_TEXT_TOKENS = re.compile(RAW_TEXT, re.DOTALL | re.IGNORECASE)
+## a character or quoted value of an open tag's attributes, quoted values
+## can contain '>' ##
+TAG_ATTR = r'(?:"[^"]*"|\'[^\']*\'|[^\'">])'
+## div open / close tags with the open tag's attributes, skipping raw text ##
+DIV_TOKENS = re.compile(
+    RAW_TEXT + r'|<(/?)div(?=[\s/>])(' + TAG_ATTR + '*)',
+    re.DOTALL | re.IGNORECASE
+)
+ATTR = re.compile(
+    r'([^\s"\'>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?',
+    re.DOTALL
+)
+
+def parse_attrs(text):
+    '''
+    Attributes of an open tag as a dict with lower case names and the last
+    value of repeated ones, like html.parser
+    '''
+    attrs = {}
+    for name, double, single, bare in ATTR.findall(text):
+        attrs[name.lower()] = html.unescape(double or single or bare)
+    return attrs
+
+def div_start(page_html, div_id):
+    '''
+    Match of the first div open token with an id outside of comments and
+    script / style bodies, or None
+    '''
+    ## candidates are found with a single regex scan, an id attribute is
+    ## preceded by whitespace, a quote or a slash like in html.parser ##
+    candidates = re.compile(
+        r'<(?i:div)(?=[\s/>])' + TAG_ATTR + r'*?(?<=[\s"\'/])(?i:id)\s*=\s*'
+        r'(?:"{0}"|\'{0}\'|{0}(?=[\s/>]))'.format(re.escape(div_id)),
+        re.DOTALL
+    )
+    raw = RAW_TEXT_TOKENS.finditer(page_html)
+    region = next(raw, None)
+    for candidate in candidates.finditer(page_html):
+        pos = candidate.start()
+        while region is not None and region.end() <= pos:
+            region = next(raw, None)
+        if region is not None and region.start() <= pos:
+            continue
+        token = DIV_TOKENS.match(page_html, pos)
+        if parse_attrs(token.group(3)).get('id') == div_id:
+            return token
+    return None
+
+def div_fragment(page_html, div_id):
+    '''
+    Raw html of the first div with an id, found by scanning for its matching
+    close tag rather than parsing the whole document. Returns None if not
+    found
+    '''
+    token = div_start(page_html, div_id)
+    if token is None:
+        return None
+    start = token.start()
+    ## a self closed div is empty ##
+    if token.group(3).rstrip().endswith('/'):
+        return page_html[start:token.end() + 1]
+    depth = 0
+    for token in DIV_TOKENS.finditer(page_html, start):
+        if token.group(2) is None:
+            continue
+        if token.group(2) == '/':
+            depth -= 1
+        elif not token.group(3).rstrip().endswith('/'):
+            depth += 1
+        if depth == 0:
+            end = page_html.find('>', token.end())
+            return page_html[start:len(page_html) if end < 0 else end + 1]
+    ## unclosed, like the parser, run to the end of the document ##
+    return page_html[start:]
+
+def parse_image_url(page_html):
+    '''
+    Headshot url from the #meta block
+    '''
+    fragment = div_fragment(page_html, 'meta')
+    if fragment is None:
+        return numpy.nan
+    img = BeautifulSoup(
+        fragment, PARSER, parse_only=SoupStrainer('img')
+    ).findAll('img')
+    if len(img) > 0:
+        return img[0]['src']
+    return numpy.nan
+
+def parse_employment_table(page_html, key):
+    '''
+    Coach ids from one of pfr's commented out employment tables
+    ('worked_for' or 'employed'), in page order without duplicates
+    '''
+    ## return struc ##
+    return_array = []
+    try:
+        ## get the commented table ##
+        section = div_fragment(page_html, 'all_{0}'.format(key))
+        table_html = section.split('<!--')[1].split('-->')[0]
+        ## parse only the table ##
+        table = BeautifulSoup(
+            table_html, PARSER,
+            parse_only=SoupStrainer('table', {'id' : key})
+        ).findAll(
+            'table', {'id' : key}
+        )
+        if len(table) > 0:
+            coaches = table[0].findAll(
+                'th', {'data-stat' : 'coach_name'}
+            )
+            for c in coaches:
+                anchor = c.findAll('a', href=True)
+                if len(anchor) > 0:
+                    coach_id = id_from_url(
+                        anchor[0]['href']
+                    )
+                    if coach_id not in return_array:
+                        return_array.append(coach_id)
+    except Exception as e:
+        pass
+    ## return ##
+    return return_array
+
+def parse_coach_page(page_html):
+    '''
+    Parses a pfr coach page into the headshot url and the ids of coaches
+    they worked for and employed
+    '''
+    return (
+        parse_image_url(page_html),
+        parse_employment_table(page_html, 'worked_for'),
+        parse_employment_table(page_html, 'employed')
+    )
@@ -2,42 +2,269 @@ import pandas as pd
 import numpy
 import pathlib
 import json
+import os
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
 from .Coach import Coach
 from .CoachTable import CoachTable
-from .utils import Browser
+from .utils import CircuitOpenError
+from .fetchers import FetchOptions
+from .RefreshJournal import RefreshJournal
+from .RefreshScheduler import RefreshScheduler, DEFAULT_BUDGET
+from ..store.columnar import write_columnar, FORMATS
+from ..store.ChangeFeed import ChangeFeed
 
 fp = pathlib.Path(__file__).parent.resolve()
 
-def update_coach_meta():
+def refresh_record(record, fetcher=None, rate_limiter=None, force=False, on_refresh=None, fetch_required=None):
     '''
-    Wrapper to update the coach meta information
+    Refreshes a single coach record, returning the original record
+    if the coach could not be handled. on_refresh is called with the
+    record of every coach whose fetch finished (not throttled coaches,
+    which stay due). fetch_required overrides
+    the coach's own SLA check. Errors raised by on_refresh (ie a failed
+    checkpoint) are not handled here and stop the refresh
     '''
-    print('Updating coaching meta data...')
-    ## create the coach table ##
-    coach_table = CoachTable()
-    ## update ##
-    records = []
-    for record in coach_table.df.to_dict('records'):
-        ## for each record, create the update as requried ##
-        try:
-            ## init a coach, which handles SLA, update, etc ##
-            coach = Coach(record)
-            ## append the handled record ##
-            records.append(coach.record)
-        except Exception as e:
-            print('     Coach instance could not be created')
-            print('          {0}'.format(e))
-            records.append(record)
-    ## cleanup browser when done ##
-    Browser().stop()
-    ## combine ##
-    df = pd.DataFrame(records)
+    try:
+        ## init a coach, which handles SLA, update, etc ##
+        coach = Coach(
+            dict(record), fetcher=fetcher, rate_limiter=rate_limiter, force=force,
+            fetch_required=fetch_required
+        )
+    except Exception as e:
+        if isinstance(e, CircuitOpenError):
+            raise
+        print('     Coach instance could not be created')
+        print('          {0}'.format(e))
+        return record
+    if coach.fetched and on_refresh is not None:
+        on_refresh(coach.record)
+    ## return the handled record ##
+    return coach.record
+
+def refresh_records_concurrently(records, workers, rate_limiter, new_fetcher, force=False, on_refresh=None, fetch_required=None):
+    '''
+    Refreshes records with a pool of workers, each with its own fetcher
+    created by new_fetcher. All workers share the same rate limiter and
+    results are returned in the same order as the records that were passed.
+    fetch_required is an optional list of flags aligned with records
+    '''
+    local = threading.local()
+    fetchers = []
+    fetchers_lock = threading.Lock()
+    def worker_fetcher():
+        ## lazily create one fetcher per worker thread ##
+        if not hasattr(local, 'fetcher'):
+            local.fetcher = new_fetcher()
+            with fetchers_lock:
+                fetchers.append(local.fetcher)
+        return local.fetcher
+    def task(record, required):
+        return refresh_record(
+            record, worker_fetcher(), rate_limiter, force, on_refresh, required
+        )
+    if fetch_required is None:
+        fetch_required = [None] * len(records)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        ## map preserves input order ##
+        return list(executor.map(task, records, fetch_required))
+    finally:
+        ## after an error, coaches that have not started are dropped ##
+        executor.shutdown(cancel_futures=True)
+        ## cleanup worker fetchers ##
+        for fetcher in fetchers:
+            fetcher.stop()
+
+def overlay_records(df, records):
+    '''
+    Copy of df with the rows of records (dicts of the same columns) written
+    over the rows with the same pfr_coach_id
+    '''
+    records = list(records)
+    if len(records) == 0:
+        return df
+    updates = pd.DataFrame(records, columns=df.columns)
+    pos = pd.Index(df['pfr_coach_id']).get_indexer(updates['pfr_coach_id'])
+    updates = updates[pos >= 0]
+    pos = pos[pos >= 0]
+    df = df.copy()
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=object, copy=True)
+        values[pos] = updates[col].to_numpy(dtype=object)
+        df[col] = values
+    return df
+
+def load_refresh_table():
+    '''
+    The local coach_meta.csv with any journal of an interrupted refresh
+    overlaid, and the journal
+    '''
+    journal = RefreshJournal('{0}/coach_meta_journal.jsonl'.format(fp))
+    journaled = journal.load()
+    df = pd.read_csv('{0}/coach_meta.csv'.format(fp), index_col=0)
+    return overlay_records(df, journaled.values()), journal
+
+def preview_coach_meta(
+    sla_days=365, active_sla_days=90, budget=DEFAULT_BUDGET, force=False,
+    min_interval=5, jitter=5, workers=1, fetch_seconds=2, max_rate=12
+):
+    '''
+    Plans a refresh of the local coach meta the way update_coach_meta would,
+    without fetching anything, and returns the plan summary with the
+    estimated cost of the run (see RefreshScheduler.estimate)
+    '''
+    df, journal = load_refresh_table()
+    scheduler = RefreshScheduler(
+        df, sla_days=sla_days, active_sla_days=active_sla_days, budget=budget
+    )
+    work = numpy.arange(len(df)) if force else scheduler.work_list()
+    preview = scheduler.summary()
+    preview.update(scheduler.estimate(
+        min_interval=min_interval, jitter=jitter, workers=workers,
+        fetch_seconds=fetch_seconds, rows=work, max_rate=max_rate
+    ))
+    print('     Would refresh {requests} of {coaches} coaches ({due} due) in about {0:.0f} minutes'.format(
+        preview['est_seconds'] / 60, **preview
+    ))
+    return preview
+
+def coach_meta_feed():
+    return ChangeFeed('coach_meta', 'pfr_coach_id', feed_dir='{0}/changes'.format(fp.parent))
+
+def save_coach_meta(df, columnar=None, record=True):
+    '''
+    Applies the headshot overrides and writes coach_meta.csv. The csv is
+    written to a temp file and swapped in, so a crash mid write never
+    leaves a truncated table. record=False leaves the write out of the
+    change feed (checkpoints, see update_coach_meta)
+    '''
+    df = df.copy()
     ## apply hs overrides ##
     with open('{0}/img_overrides.json'.format(fp)) as f:
         img_map = json.load(f)
     df['pfr_coach_image_url'] = df['pfr_coach_id'].map(img_map).combine_first(df['pfr_coach_image_url'])
+    ## log the rows that change before replacing the file ##
+    if record:
+        coach_meta_feed().record('{0}/coach_meta.csv'.format(fp), df, index=True)
     ## save ##
-    df.to_csv(
-        '{0}/coach_meta.csv'.format(fp)
-    )
+    tmp = '{0}/coach_meta.csv.tmp'.format(fp)
+    df.to_csv(tmp)
+    os.replace(tmp, '{0}/coach_meta.csv'.format(fp))
+    if columnar is not None:
+        write_columnar(
+            df,
+            '{0}/coach_meta.{1}'.format(fp, FORMATS[columnar]),
+            fmt=columnar
+        )
+    return df
+
+def update_coach_meta(
+    fetch=None, workers=1, force=False, columnar=None, report=None,
+    checkpoint_every=25, sla_days=365, active_sla_days=90, budget=DEFAULT_BUDGET
+):
+    '''
+    Wrapper to update the coach meta information
+
+    fetch is a FetchOptions with the backend, cache and request pacing to
+    use (defaults if None). With workers > 1, coach profiles are scraped
+    concurrently, paced by one shared rate limiter. force=True refetches
+    every coach regardless of SLA (from cache with an offline fetch)
+
+    Coaches are refreshed in order of how far past their SLA they are
+    (sla_days, or active_sla_days for active coaches), at most budget per
+    run (see RefreshScheduler). Refreshed coaches are journaled and
+    checkpointed into coach_meta.csv every checkpoint_every coaches, so an
+    interrupted refresh resumes where it stopped (see RefreshJournal)
+
+    columnar ('parquet' or 'arrow') also writes a typed copy of coach_meta,
+    and report is an optional updater RunReport to record stage metrics in
+    '''
+    print('Updating coaching meta data...')
+    def stage(name):
+        if report is None:
+            return contextlib.nullcontext({})
+        return report.stage(name)
+    ## fetch backend setup, workers share the cache and rate limiter ##
+    fetch = FetchOptions() if fetch is None else fetch
+    cache = fetch.new_cache()
+    def new_fetcher():
+        ## workers each need their own browser ##
+        return fetch.new_fetcher(cache, shared=workers <= 1)
+    fetcher = new_fetcher()
+    rate_limiter = fetch.new_rate_limiter()
+    ## every write before the final save is left out of the change feed ##
+    coach_meta_feed().begin('{0}/coach_meta.csv'.format(fp))
+    try:
+        ## create the coach table ##
+        with stage('coach_table') as s:
+            coach_table = CoachTable(fetcher=fetcher, columnar=columnar)
+            coach_table.update_and_save(record=False)
+            s['rows_out'] = len(coach_table.df)
+        ## resume from the journal of an interrupted refresh ##
+        journal = RefreshJournal('{0}/coach_meta_journal.jsonl'.format(fp))
+        journaled = journal.load()
+        df = overlay_records(coach_table.df, journaled.values())
+        if len(journaled) > 0:
+            print('     Resuming with {0} coaches from the refresh journal'.format(
+                len(journaled)
+            ))
+            journal.compact(lambda: save_coach_meta(df, record=False))
+        ## schedule, only rows in the work list become records ##
+        scheduler = RefreshScheduler(
+            df, sla_days=sla_days, active_sla_days=active_sla_days, budget=budget
+        )
+        work = numpy.arange(len(df)) if force else scheduler.work_list()
+        records = df.iloc[work].to_dict('records')
+        print('     Scheduled {0} of {coaches} coaches ({due} due)'.format(
+            len(records), **scheduler.summary()
+        ))
+        ## refreshed records, overlaid onto the table at each checkpoint ##
+        refreshed = {}
+        def checkpoint():
+            try:
+                save_coach_meta(overlay_records(df, refreshed.values()), record=False)
+            except Exception as e:
+                ## stops the refresh, the journal keeps what was refreshed ##
+                raise Exception('COACH META ERROR: Could not checkpoint the refresh: {0}'.format(e))
+        def on_refresh(record):
+            ## workers add records while a checkpoint reads them ##
+            with journal.lock:
+                refreshed[record['pfr_coach_id']] = record
+                if journal.append(record) >= checkpoint_every:
+                    journal.compact(checkpoint)
+        ## update ##
+        with stage('refresh_coaches') as s:
+            s['rows_in'] = len(df)
+            s['scheduled'] = len(records)
+            try:
+                if workers > 1:
+                    records = refresh_records_concurrently(
+                        records, workers, rate_limiter, new_fetcher, force, on_refresh,
+                        [True] * len(records)
+                    )
+                else:
+                    records = [
+                        refresh_record(record, fetcher, rate_limiter, force, on_refresh, True)
+                        for record in records
+                    ]
+            except CircuitOpenError as e:
+                ## keep what was refreshed, the rest stay due for next run ##
+                print('     Stopping the refresh after {0} of {1} coaches'.format(
+                    len(refreshed), len(records)
+                ))
+                print('          {0}'.format(e))
+                records = list(refreshed.values())
+                s['halted'] = True
+            s['rows_out'] = len(records)
+    finally:
+        ## cleanup fetcher when done ##
+        fetcher.stop()
+    with stage('save') as s:
+        ## write refreshed rows over the table and save, then the journal
+        ## is no longer needed ##
+        df = save_coach_meta(overlay_records(df, records), columnar=columnar)
+        journal.clear()
+        s['rows_out'] = len(df)
\ No newline at end of file
@@ -1,9 +1,9 @@
 import numpy
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import time
+import random
+import threading
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
 
 ## utility func ##
 def id_from_url(url):
@@ -15,15 +15,208 @@ def id_from_url(url):
     except:
         return numpy.nan
 
+class RunCounters:
+    '''
+    Thread safe counters for scraping activity (requests, bytes, cache hits,
+    time spent pacing, etc) that the updater's run report reads per stage
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def add(self, key, value=1):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+## process wide counters ##
+counters = RunCounters()
+
+class CircuitOpenError(Exception):
+    '''
+    Raised by an adaptive rate limiter once it has stopped allowing requests
+    '''
+    pass
+
+class RateLimiter:
+    '''
+    Thread safe rate limiter shared by all scraping workers. Request start
+    times are spaced by a minimum interval plus random jitter, so total
+    throughput against PFR stays the same regardless of worker count.
+
+    Fetches report back with success, throttled and failure, which the
+    fixed limiter ignores (see AdaptiveRateLimiter)
+    '''
+    def __init__(self, min_interval=5, jitter=5):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def spacing(self):
+        '''
+        Seconds between this request's start and the next one's
+        '''
+        return self.min_interval + random.random() * self.jitter
+
+    def wait(self):
+        '''
+        Block until the next request slot is available
+        '''
+        with self._lock:
+            self.check()
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.spacing()
+        if slot > now:
+            counters.add('pacing_seconds', slot - now)
+            time.sleep(slot - now)
+
+    def check(self):
+        pass
+
+    def success(self):
+        pass
+
+    def throttled(self, retry_after=None):
+        pass
+
+    def failure(self):
+        pass
+
+class AdaptiveRateLimiter(RateLimiter):
+    '''
+    AIMD rate limiter. The interval between request starts begins at
+    min_interval. It drops by step after every healthy response, down to
+    the interval that averages max_rate requests a minute with jitter. It
+    is multiplied by backoff (up to max_interval) after a throttle signal
+    or a failed fetch. A Retry-After from the server also holds back the
+    next slot.
+
+    After max_failures throttles or failures in a row, or a Retry-After
+    longer than max_interval, the circuit opens. wait() then raises
+    CircuitOpenError so the run can stop cleanly instead of working through
+    the rest of its coaches. After cooldown seconds (or the Retry-After, if
+    longer) the circuit half opens and lets a single probe request through.
+    The circuit closes if the probe succeeds and opens for another cooldown
+    if it is throttled or fails, so a long lived limiter recovers once the
+    server does. Only the probe decides, responses to requests that were
+    already in flight when the circuit opened only adjust the interval
+    '''
+    def __init__(
+        self, min_interval=5, jitter=5, max_rate=12, step=0.25, backoff=2,
+        max_interval=300, max_failures=5, cooldown=900
+    ):
+        super().__init__(min_interval=min_interval, jitter=jitter)
+        self.interval = min_interval
+        self.floor = max(60 / max_rate - jitter / 2, 0)
+        self.step = step
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_reason = None
+        self.reopen_at = None
+        self.probing = False
+        self.probe_thread = None
+
+    def spacing(self):
+        return self.interval + random.random() * self.jitter
+
+    def check(self):
+        if self.open_reason is None:
+            return
+        ## half open, one probe per cooldown ##
+        now = time.monotonic()
+        if now >= self.reopen_at:
+            self.reopen_at = now + self.cooldown
+            self.probing = True
+            ## a worker makes its requests one at a time, so the probe's
+            ## response is the next one this thread reports ##
+            self.probe_thread = threading.get_ident()
+            counters.add('circuit_probes')
+            return
+        raise CircuitOpenError('RATE LIMIT ERROR: Circuit open, {0}'.format(self.open_reason))
+
+    def is_open(self):
+        return self.open_reason is not None
+
+    def is_probe(self):
+        '''
+        Whether the calling thread is reporting on the half open probe
+        '''
+        return self.probing and self.probe_thread == threading.get_ident()
+
+    def success(self):
+        with self._lock:
+            self.interval = max(self.floor, self.interval - self.step)
+            ## while open, only a healthy probe closes the circuit ##
+            if self.open_reason is None or self.is_probe():
+                self.failures = 0
+                self.open_reason = None
+                self.probing = False
+
+    def back_off(self, hold=0):
+        '''
+        Multiplicative decrease, pushing the next slot back by at least hold
+        seconds. Opens the circuit after too many failures in a row
+        '''
+        with self._lock:
+            self.interval = min(self.max_interval, max(self.interval, self.min_interval) * self.backoff)
+            self._next_slot = max(self._next_slot, time.monotonic() + max(hold, self.interval))
+            ## leave a probe in flight to decide ##
+            if self.probing and not self.is_probe():
+                return
+            self.failures += 1
+            if hold > self.max_interval:
+                self.open_reason = 'asked to wait {0:.0f} seconds'.format(hold)
+            elif self.failures >= self.max_failures:
+                self.open_reason = '{0} throttled or failed requests in a row'.format(self.failures)
+            elif not self.probing:
+                return
+            ## (re)open, the next probe waits out the cooldown or hold ##
+            self.reopen_at = time.monotonic() + max(self.cooldown, hold)
+            self.probing = False
+
+    def throttled(self, retry_after=None):
+        counters.add('throttled')
+        self.back_off(retry_after if retry_after is not None else 0)
+
+    def failure(self):
+        counters.add('fetch_failures')
+        self.back_off()
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+def default_rate_limiter():
+    '''
+    Process wide adaptive rate limiter used when no limiter is passed
+    '''
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = AdaptiveRateLimiter()
+        return _default_limiter
+
 class Browser:
     '''
     Singleton selenium browser wrapper for scraping pro-football-reference.com.
-    
+    Pass shared=False to create a standalone browser (ie one per worker)
+
+    Selenium is only imported when the browser is started, so it is not
+    required unless the selenium fetch backend is used
     '''
     _instance = None
     _driver = None
 
-    def __new__(cls):
+    def __new__(cls, shared=True):
+        if not shared:
+            return super(Browser, cls).__new__(cls)
         if cls._instance is None:
             cls._instance = super(Browser, cls).__new__(cls)
         return cls._instance
@@ -33,6 +226,8 @@ class Browser:
         Start the browser if not already running
         '''
         if self._driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
             options = Options()
             if headless:
                 options.add_argument('--headless')
@@ -40,8 +235,11 @@ class Browser:
             options.add_argument('--disable-dev-shm-usage')
             options.add_argument('--disable-gpu')
             options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36')
+            options.add_argument('--user-agent={0}'.format(USER_AGENT))
+            start = time.perf_counter()
             self._driver = webdriver.Chrome(options=options)
+            counters.add('browser_starts')
+            counters.add('browser_start_seconds', time.perf_counter() - start)
 
     def stop(self):
         '''
@@ -62,6 +260,8 @@ class Browser:
         
         ## wait for specific element if provided ##
         if wait_for_element:
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
             wait = WebDriverWait(self._driver, timeout)
             wait.until(EC.presence_of_element_located(wait_for_element))
         
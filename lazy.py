@@ -0,0 +1,45 @@
+## packages ##
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    '''
+    Package whose public names are only imported from their submodules when
+    first accessed, so importing the package does not import the scraping,
+    nfelodcm or pandas stacks behind names that are never used
+    '''
+
+    def __getattr__(self, name):
+        ## only called when the name is not already set ##
+        names = self.__dict__.get('lazy_names', {})
+        if name not in names:
+            raise AttributeError('module {0!r} has no attribute {1!r}'.format(self.__name__, name))
+        module, attr = names[name]
+        value = importlib.import_module(module, self.__name__)
+        if attr is not None:
+            value = getattr(value, attr)
+        super().__setattr__(name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        ## importing a submodule sets it on the package, which would hide a
+        ## class of the same name (coaches.Coach), so keep the class ##
+        names = self.__dict__.get('lazy_names', {})
+        if name in names and names[name][1] is not None and isinstance(value, types.ModuleType):
+            value = getattr(value, names[name][1])
+        super().__setattr__(name, value)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self.__dict__.get('lazy_names', {})))
+
+def lazy_package(name, names):
+    '''
+    Makes the package name lazy. names maps each public name to the
+    (relative module, attribute) it is imported from, with an attribute of
+    None for the module itself
+    '''
+    module = sys.modules[name]
+    module.lazy_names = names
+    module.__all__ = [n for n, (_, attr) in names.items() if attr is not None]
+    module.__class__ = LazyModule
@@ -0,0 +1,202 @@
+## packages ##
+import pandas as pd
+import numpy
+import hashlib
+import json
+import os
+
+## ATS splits stored as count / sum pairs ##
+ATS_SPLITS = [
+    'home', 'away', 'playoff', 'favorite', 'underdog',
+    'div', 'non_div', 'bye', 'dome'
+]
+
+class CoachPartials:
+    '''
+    Additive partial aggregates for every coach, season and team, which can
+    be folded into career records without going back to the games table.
+
+    Sums and counts are stored instead of means so partials can be combined,
+    and seasons / playoff seasons are recovered from the season key. Alongside
+    the partials, a state file stores the watermark of the last processed
+    game and a content hash for each season's games so new or changed games
+    can be found on the next run
+    '''
+
+    def __init__(self, package_loc):
+        self.partials_loc = '{0}/stats/coach_partials.csv'.format(package_loc)
+        self.state_loc = '{0}/stats/coach_partials_state.json'.format(package_loc)
+        self.partials = self.load_partials()
+        self.state = self.load_state()
+
+    def load_partials(self):
+        '''
+        Load persisted partials if they exist
+        '''
+        try:
+            return pd.read_csv(self.partials_loc)
+        except:
+            return None
+
+    def load_state(self):
+        '''
+        Load the watermark and season hashes if they exist
+        '''
+        try:
+            with open(self.state_loc) as f:
+                return json.load(f)
+        except:
+            return None
+
+    def has_state(self):
+        return self.partials is not None and self.state is not None
+
+    def season_hashes(self, games):
+        '''
+        Content hash of each season's games, independent of row order
+        '''
+        row_hashes = pd.util.hash_pandas_object(
+            games.drop(columns=['season']), index=False
+        ).values
+        hashes = {}
+        for season, idx in games.groupby(['season']).indices.items():
+            season = season[0] if isinstance(season, tuple) else season
+            hashes[str(int(season))] = hashlib.sha1(
+                numpy.sort(row_hashes[idx]).tobytes()
+            ).hexdigest()
+        return hashes
+
+    def changed_seasons(self, games):
+        '''
+        Seasons with new, changed, or removed games since the last run
+        '''
+        new_hashes = self.season_hashes(games)
+        old_hashes = {} if self.state is None else self.state['season_hashes']
+        return sorted(set(
+            int(s) for s in set(new_hashes) | set(old_hashes)
+            if new_hashes.get(s) != old_hashes.get(s)
+        ))
+
+    def compute(self, fields):
+        '''
+        Compute partials from coach-game rows that already have the
+        fields added by StatCompiler.add_game_fields
+        '''
+        df = pd.DataFrame({
+            'coach' : fields['coach'].astype(str),
+            'season' : fields['season'],
+            'team' : fields['team'].astype(str),
+            'games' : 1,
+            'wins' : fields['win'],
+            'losses' : fields['loss'],
+            'ties' : fields['tie'],
+            'games_playoff' : fields['playoffs'].astype('int64'),
+            'wins_playoff' : fields['win_playoff'],
+            'losses_playoff' : fields['loss_playoff'],
+            'ties_playoff' : fields['tie_playoff'],
+            'games_superbowl' : fields['superbowl'].astype('int64'),
+            'wins_superbowl' : fields['win_superbowl'],
+            'ats_return' : fields['ats_return'],
+            'ats_risked' : fields['ats_risked'],
+        })
+        ## means are stored as non-null count and sum ##
+        means = {
+            'ats' : fields['ats_result'],
+            'pf' : fields['pf'],
+            'pa' : fields['pa'],
+            'margin' : fields['result'],
+            'spread' : fields['spread'],
+        }
+        for split in ATS_SPLITS:
+            means['ats_{0}'.format(split)] = fields['ats_{0}'.format(split)]
+        for key, values in means.items():
+            df['{0}_n'.format(key)] = (~pd.isnull(values)).astype('int64')
+            df['{0}_sum'.format(key)] = values
+        ## drop null coaches like the career groupby does ##
+        df = df[~pd.isnull(fields['coach'].values)]
+        return df.groupby(
+            ['coach', 'season', 'team']
+        ).sum(min_count=0).reset_index()
+
+    def update(self, fields, seasons):
+        '''
+        Replace the partials for the passed seasons with those computed
+        from fields, returning the coaches whose partials changed
+        '''
+        new = self.compute(fields[numpy.isin(fields['season'], seasons)])
+        affected = set(new['coach'])
+        if self.partials is None:
+            self.partials = new
+        else:
+            replaced = numpy.isin(self.partials['season'], seasons)
+            affected |= set(self.partials.loc[replaced, 'coach'])
+            self.partials = pd.concat([
+                self.partials[~replaced],
+                new
+            ]).sort_values(
+                by=['coach', 'season', 'team']
+            ).reset_index(drop=True)
+        return affected
+
+    def reduce(self, coaches, active):
+        '''
+        Fold partials into career records for the passed coaches with the same
+        columns as StatCompiler.aggregate_games (before deltas)
+        '''
+        df = self.partials[self.partials['coach'].isin(coaches)]
+        by_coach = df.groupby(['coach'])
+        sums = by_coach.sum(numeric_only=True)
+        seasons = by_coach['season'].nunique()
+        playoff_births = df[df['games_playoff'] > 0].groupby(['coach'])['season'].nunique()
+        def mean(key):
+            return sums['{0}_sum'.format(key)] / sums['{0}_n'.format(key)].replace(0, numpy.nan)
+        agg = pd.DataFrame({
+            'seasons' : seasons,
+            'is_active' : numpy.where(numpy.isin(sums.index, active), 1, 0),
+            'games' : sums['games'],
+            'wins' : sums['wins'],
+            'losses' : sums['losses'],
+            'ties' : sums['ties'],
+            'playoff_births' : playoff_births.reindex(sums.index, fill_value=0),
+            'games_playoff' : sums['games_playoff'],
+            'wins_playoff' : sums['wins_playoff'],
+            'losses_playoff' : sums['losses_playoff'],
+            'ties_playoff' : sums['ties_playoff'],
+            'games_superbowl' : sums['games_superbowl'],
+            'wins_superbowl' : sums['wins_superbowl'],
+            'ats_pct' : mean('ats'),
+            'ats_return' : sums['ats_return'],
+            'ats_risked' : sums['ats_risked'],
+            'avg_pf' : mean('pf'),
+            'avg_pa' : mean('pa'),
+            'avg_margin' : mean('margin'),
+            'avg_spread' : mean('spread'),
+        }, index=sums.index)
+        for split in ATS_SPLITS:
+            agg['ats_pct_{0}'.format(split)] = mean('ats_{0}'.format(split))
+        agg = agg.reset_index()
+        return agg.sort_values(
+            by=['wins'],
+            ascending=[False]
+        ).reset_index(drop=True)
+
+    def save(self, games):
+        '''
+        Write partials and the state for the passed games
+        '''
+        last = games.sort_values(by=['season', 'week', 'game_id']).iloc[-1]
+        self.state = {
+            'watermark' : {
+                'season' : int(last['season']),
+                'week' : int(last['week']),
+                'game_id' : str(last['game_id']),
+            },
+            'season_hashes' : self.season_hashes(games),
+        }
+        self.partials.to_csv(self.partials_loc, index=False)
+        ## state is written last, so a failed write only means the changed ##
+        ## seasons get recomputed on the next run ##
+        tmp = '{0}.tmp'.format(self.state_loc)
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp, self.state_loc)
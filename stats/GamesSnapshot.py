@@ -0,0 +1,127 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+import hashlib
+import datetime
+import json
+import os
+
+from ..store.columnar import require_pyarrow, read_columnar
+
+class GamesSnapshot:
+    '''
+    Local, versioned copy of the nfelodcm datasets the compiler reads
+    (games and logos). Each dataset is stored as parquet and named by a
+    content hash, and manifest.json points at the current version of each.
+    A dataset is only rewritten when its content changes, and the last keep
+    versions are kept on disk.
+
+    Nothing is read until load() is called, and load() only reads the
+    requested columns
+    '''
+    def __init__(self, snapshot_dir=None, keep=3):
+        self.snapshot_dir = pathlib.Path(
+            snapshot_dir if snapshot_dir is not None else
+            '{0}/stats/snapshots'.format(pathlib.Path(__file__).parent.parent.resolve())
+        )
+        self.keep = keep
+        self.manifest_loc = self.snapshot_dir / 'manifest.json'
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_loc) as f:
+                return json.load(f)
+        except:
+            return {'datasets' : {}}
+
+    def write_manifest(self):
+        ## swap in the new manifest so readers never see a partial write ##
+        tmp = '{0}.tmp'.format(self.manifest_loc)
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(tmp, self.manifest_loc)
+
+    def has(self, name):
+        return name in self.manifest['datasets']
+
+    def current(self, name):
+        '''
+        Manifest entry of the current version of a dataset
+        '''
+        if not self.has(name):
+            raise Exception('SNAPSHOT ERROR: No snapshot of {0} in {1}'.format(
+                name, self.snapshot_dir
+            ))
+        return self.manifest['datasets'][name]['versions'][-1]
+
+    def content_hash(self, df):
+        '''
+        Hash of a frame's columns and values
+        '''
+        h = hashlib.sha256()
+        h.update(json.dumps([
+            [str(c), str(t)] for c, t in zip(df.columns, df.dtypes)
+        ]).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return h.hexdigest()
+
+    def save(self, name, df):
+        '''
+        Snapshot a dataset if its content changed. Returns the manifest
+        entry of the current version
+        '''
+        content_hash = self.content_hash(df)
+        if self.has(name) and self.current(name)['hash'] == content_hash:
+            return self.current(name)
+        pa = require_pyarrow()
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        dataset = self.manifest['datasets'].setdefault(name, {'versions' : []})
+        version = dataset['versions'][-1]['version'] + 1 if len(dataset['versions']) > 0 else 1
+        entry = {
+            'version' : version,
+            'hash' : content_hash,
+            'file' : '{0}-{1}-{2}.parquet'.format(name, version, content_hash[:12]),
+            'rows' : len(df),
+            'columns' : [str(c) for c in df.columns],
+            'created_at' : datetime.datetime.now().isoformat(),
+        }
+        pa.parquet.write_table(
+            pa.Table.from_pandas(df, preserve_index=False),
+            self.snapshot_dir / entry['file']
+        )
+        dataset['versions'].append(entry)
+        ## prune old versions once the manifest no longer points at them ##
+        pruned = dataset['versions'][:-self.keep]
+        dataset['versions'] = dataset['versions'][-self.keep:]
+        self.write_manifest()
+        for old in pruned:
+            try:
+                os.remove(self.snapshot_dir / old['file'])
+            except FileNotFoundError:
+                pass
+        return entry
+
+    def load(self, name, columns=None, version=None):
+        '''
+        Read a dataset, optionally a subset of its columns or an older version
+        '''
+        if version is None:
+            entry = self.current(name)
+        else:
+            entry = None
+            for v in self.manifest['datasets'].get(name, {'versions' : []})['versions']:
+                if v['version'] == version:
+                    entry = v
+            if entry is None:
+                raise Exception('SNAPSHOT ERROR: No version {0} of {1}'.format(
+                    version, name
+                ))
+        if columns is not None:
+            missing = [c for c in columns if c not in entry['columns']]
+            if len(missing) > 0:
+                raise Exception('SNAPSHOT ERROR: {0} snapshot is missing columns {1}'.format(
+                    name, ', '.join(missing)
+                ))
+        return read_columnar(self.snapshot_dir / entry['file'], columns=columns)
@@ -4,136 +4,428 @@ import numpy
 import codecs
 import pathlib
 import json
+import contextlib
 
-import nfelodcm as dcm
+from .CoachPartials import CoachPartials
+from .GamesSnapshot import GamesSnapshot
+from .splits import compute_splits, SPLITS
+from .metrics import evaluate_metrics, game_fields
+from .batch import run_batch
+from ..store.columnar import write_columnar, FORMATS
+from ..store.ChangeFeed import ChangeFeed
+from ..coaches.NameIndex import NameIndex
+
+## columns of the external datasets the compiler reads ##
+GAME_COLUMNS = [
+    'game_id', 'season', 'game_type', 'week', 'home_team', 'away_team',
+    'home_score', 'away_score', 'result', 'spread_line', 'home_rest',
+    'away_rest', 'roof', 'div_game', 'home_coach', 'away_coach'
+]
+LOGO_COLUMNS = ['team_abbr', 'team_color']
+## output columns add_teams and add_coach_meta add to the compiled stats ##
+ENRICHED_COLUMNS = [
+    'teams', 'pfr_coach_id', 'pfr_coach_image_url',
+    'pfr_coach_tree_hired_by', 'pfr_coach_tree_hired'
+]
+SOURCES = ['dcm', 'snapshot', 'auto']
+## pipeline inputs and the stages built from them : what each depends on ##
+STAGES = {
+    'games' : [],
+    'logos' : [],
+    'coach_meta' : [],
+    'pre_fastr_deltas' : [],
+    'coach_games' : ['games'],
+    'name_index' : ['coach_meta'],
+    'compiled_stats' : ['coach_games', 'pre_fastr_deltas', 'logos', 'coach_meta', 'name_index'],
+}
+
+def read_input(value, index_col=None):
+    '''
+    A pipeline input given as a DataFrame, or a path to a csv or parquet file
+    '''
+    if isinstance(value, pd.DataFrame):
+        return value
+    if str(value).endswith('.parquet'):
+        return pd.read_parquet(value)
+    return pd.read_csv(value, index_col=index_col)
+
+class Memoized:
+    '''
+    Pipeline value on a StatCompiler, built by its build_<name> method on
+    first access and kept until it, or anything it depends on, is set
+    '''
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.name not in obj.memo:
+            obj.memo[self.name] = getattr(obj, 'build_{0}'.format(self.name))()
+        return obj.memo[self.name]
+
+    def __set__(self, obj, value):
+        obj.invalidate(self.name)
+        obj.memo[self.name] = value
 
 class StatCompiler:
     '''
     Compiles coaching stats and adds to the coaching meta
+
+    Inputs (games, logos, coach_meta, pre_fastr_deltas) can be passed as
+    DataFrames or paths, otherwise they are loaded from source ('dcm',
+    'snapshot' or 'auto') when first needed. Stages are built lazily and
+    memoized, and run() compiles and writes coaches.csv. With
+    incremental=True, only coaches touched by new games are recomputed
     '''
 
-    def __init__(self):
+    games = Memoized()
+    logos = Memoized()
+    coach_meta = Memoized()
+    pre_fastr_deltas = Memoized()
+    coach_games = Memoized()
+    name_index = Memoized()
+    compiled_stats = Memoized()
+
+    def __init__(
+        self, incremental=False, columnar=None, report=None, source='dcm', snapshot_dir=None,
+        games=None, logos=None, coach_meta=None, pre_fastr_deltas=None, aliases=None
+    ):
         ## meta ##
         self.package_loc = pathlib.Path(__file__).parent.parent.resolve()
-        ## datasets ##
-        self.games, self.logos = self.fetch_external()
-        self.coach_meta = pd.read_csv(
-            '{0}/coaches/coach_meta.csv'.format(self.package_loc),
-            index_col=0
+        self.incremental = incremental
+        self.columnar = columnar
+        self.report = report
+        if source not in SOURCES:
+            raise Exception('STAT COMPILER ERROR: Unknown source {0}. Options are {1}'.format(
+                source, ', '.join(SOURCES)
+            ))
+        self.source = source
+        self.snapshot_dir = snapshot_dir
+        self.snapshot = None
+        self.aliases = aliases
+        ## injected inputs and memoized stages ##
+        self.inputs = {}
+        self.memo = {}
+        self.update(
+            games=games, logos=logos, coach_meta=coach_meta,
+            pre_fastr_deltas=pre_fastr_deltas
         )
-        self.pre_fastr_deltas = pd.read_csv(
-            '{0}/stats/pre_99_coaching_deltas.csv'.format(self.package_loc),
-            index_col=0
+
+    def update(self, **inputs):
+        '''
+        Replaces inputs (DataFrames or paths) and drops the stages built
+        from them. Inputs set to None go back to their usual source
+        '''
+        for name, value in inputs.items():
+            if name not in STAGES or len(STAGES[name]) > 0:
+                raise Exception('STAT COMPILER ERROR: Unknown input {0}'.format(name))
+            self.inputs[name] = value
+            self.invalidate(name)
+        return self
+
+    def invalidate(self, name):
+        '''
+        Drops a memoized value and everything built from it
+        '''
+        self.memo.pop(name, None)
+        for stage, depends in STAGES.items():
+            if name in depends:
+                self.invalidate(stage)
+
+    def build_games(self):
+        if self.inputs.get('games') is not None:
+            games = read_input(self.inputs['games'])[GAME_COLUMNS]
+            return games[~pd.isnull(games['result'])]
+        games, logos = self.fetch_external()
+        ## both come from the same load, keep logos unless injected ##
+        if 'logos' not in self.memo and self.inputs.get('logos') is None:
+            self.memo['logos'] = logos
+        return games
+
+    def build_logos(self):
+        if self.inputs.get('logos') is not None:
+            return read_input(self.inputs['logos'])[LOGO_COLUMNS]
+        games, logos = self.fetch_external()
+        if 'games' not in self.memo and self.inputs.get('games') is None:
+            self.memo['games'] = games
+        return logos
+
+    def build_coach_meta(self):
+        coach_meta = self.inputs.get('coach_meta')
+        if coach_meta is None:
+            coach_meta = '{0}/coaches/coach_meta.csv'.format(self.package_loc)
+        return read_input(coach_meta, index_col=0)
+
+    def build_pre_fastr_deltas(self):
+        deltas = self.inputs.get('pre_fastr_deltas')
+        if deltas is None:
+            deltas = '{0}/stats/pre_99_coaching_deltas.csv'.format(self.package_loc)
+        return read_input(deltas, index_col=0)
+
+    def build_coach_games(self):
+        ## long coach-game table shared by the aggregation stages ##
+        with self.stage('flatten') as s:
+            s['rows_in'] = len(self.games)
+            flat = self.flatten_games()
+            s['rows_out'] = len(flat)
+        return flat
+
+    def build_name_index(self):
+        return NameIndex(self.coach_meta, aliases=self.aliases)
+
+    def build_compiled_stats(self):
+        '''
+        Every coach compiled from the full games history, in memory
+        '''
+        coach_games = self.coach_games
+        with self.stage('aggregate') as s:
+            s['rows_in'] = len(coach_games)
+            self.compiled_stats = self.aggregate_games()
+            s['rows_out'] = len(self.compiled_stats)
+        ## enrich ##
+        with self.stage('add_teams') as s:
+            self.add_teams()
+            s['rows_out'] = len(self.compiled_stats)
+        with self.stage('add_coach_meta') as s:
+            self.add_coach_meta()
+            s['rows_out'] = len(self.compiled_stats)
+        return self.compiled_stats
+
+    def run(self):
+        '''
+        Compiles and writes coaches.csv (and partials for incremental runs),
+        returning the compiled stats
+        '''
+        ## datasets ##
+        with self.stage('load_external') as s:
+            s['rows_out'] = len(self.games)
+            self.logos
+        with self.stage('load_local') as s:
+            s['rows_out'] = len(self.coach_meta) + len(self.pre_fastr_deltas)
+        ## build the flat table in its own stage ##
+        self.coach_games
+        self.partials = CoachPartials(self.package_loc)
+        if self.incremental and self.partials.has_state() and self.load_existing_output() is not None:
+            self.compile_incremental()
+        else:
+            self.compile_full()
+        return self.compiled_stats
+
+    def compile_full(self):
+        '''
+        Compiles every coach from the full games history and saves it
+        '''
+        ## builds on first access ##
+        self.compiled_stats
+        ## save ##
+        with self.stage('save') as s:
+            self.save_output()
+            s['rows_out'] = len(self.compiled_stats)
+        ## persist partials for incremental runs ##
+        with self.stage('save_partials') as s:
+            self.partials.partials = None
+            self.partials.update(
+                self.add_game_fields(self.coach_games),
+                self.coach_games['season'].unique()
+            )
+            self.partials.save(self.games)
+            s['rows_out'] = len(self.partials.partials)
+
+    def stage(self, name):
+        '''
+        Report stage for a block, or a no-op without a report
+        '''
+        if self.report is None:
+            return contextlib.nullcontext({})
+        return self.report.stage(name)
+
+    def compile_incremental(self):
+        '''
+        Recomputes coaches touched by new or changed games and replaces
+        their rows in the existing output, then adds teams and coach meta
+        to every row
+        '''
+        existing = self.load_existing_output()
+        if 'pfr_coach_id' not in existing.columns:
+            ## output from before the name index, every row needs an id ##
+            return self.compile_full()
+        with self.stage('update_partials') as s:
+            changed = self.partials.changed_seasons(self.games)
+            fields = self.add_game_fields(
+                self.coach_games[numpy.isin(self.coach_games['season'], changed)]
+            )
+            s['rows_in'] = len(fields)
+            affected = self.partials.update(fields, changed)
+            ## coaches whose active status flipped without new games ##
+            active = self.active_coaches()
+            flipped = existing[
+                existing['is_active'] != numpy.where(
+                    numpy.isin(existing['coach'], active), 1, 0
+                )
+            ]
+            affected |= set(flipped['coach'])
+            s['rows_out'] = len(affected)
+        ## stats of coaches that are not recomputed. Teams and meta are
+        ## added to every row below, so meta refreshed since the last run
+        ## reaches coaches without new games ##
+        kept = existing[~existing['coach'].isin(affected)].drop(
+            columns=ENRICHED_COLUMNS, errors='ignore'
         )
-        ## final output ##
-        self.compiled_stats = self.aggregate_games()
+        if len(affected) == 0:
+            print('     No new or changed games')
+            self.compiled_stats = kept.reset_index(drop=True)
+        else:
+            print('     Recomputing {0} coaches from {1} changed seasons'.format(
+                len(affected), len(changed)
+            ))
+            ## career records for affected coaches only ##
+            with self.stage('aggregate') as s:
+                agg = self.partials.reduce(affected, active)
+                deltas = self.match_deltas(self.pre_fastr_deltas.copy(), affected)
+                deltas = deltas[deltas['coach'].isin(affected)].copy()
+                agg = self.add_deltas_to_games(agg, deltas)
+                agg = self.add_rate_fields(agg)
+                s['rows_out'] = len(agg)
+            ## replace affected rows, other rows keep their relative order ##
+            self.compiled_stats = pd.concat([kept, agg]).sort_values(
+                by=['wins'],
+                ascending=[False],
+                kind='mergesort'
+            ).reset_index(drop=True)
         ## enrich ##
-        self.add_teams()
-        self.add_coach_meta()
+        with self.stage('add_teams'):
+            self.add_teams()
+        with self.stage('add_coach_meta'):
+            self.add_coach_meta()
         ## save ##
-        self.save_output()
+        with self.stage('save') as s:
+            self.save_output()
+            self.partials.save(self.games)
+            s['rows_out'] = len(self.compiled_stats)
+
+    def load_existing_output(self):
+        '''
+        Load the previously compiled coaches.csv if it exists. Floats are
+        read back exactly, so rows that are not recomputed are written back
+        unchanged
+        '''
+        try:
+            return pd.read_csv(
+                '{0}/coaches.csv'.format(self.package_loc),
+                float_precision='round_trip'
+            )
+        except:
+            return None
 
     def fetch_external(self):
         '''
-        Gets external dataset using nfelodcm
+        Gets external dataset using nfelodcm or the local snapshot. 'auto'
+        refreshes the snapshot from nfelodcm and falls back to it if
+        nfelodcm cannot be loaded
         '''
-        db = dcm.load(['games', 'logos'])
-        db['games'] = db['games'][
-            ~pd.isnull(db['games']['result'])
-        ].copy()
-        return db['games'], db['logos']
+        self.open_snapshot()
+        if self.source == 'snapshot':
+            games, logos = self.load_snapshot()
+        else:
+            try:
+                ## imported here so the compiler can be used without nfelodcm ##
+                import nfelodcm as dcm
+                db = dcm.load(['games', 'logos'])
+            except Exception as e:
+                if self.source != 'auto' or not self.snapshot.has('games'):
+                    raise
+                print('     Could not load from nfelodcm, using the local snapshot')
+                print('          {0}'.format(e))
+                games, logos = self.load_snapshot()
+            else:
+                if self.source == 'auto':
+                    self.snapshot.save('games', db['games'])
+                    self.snapshot.save('logos', db['logos'])
+                games = db['games'][GAME_COLUMNS]
+                logos = db['logos'][LOGO_COLUMNS]
+        ## only played games, filtered after the column selection ##
+        return games[~pd.isnull(games['result'])], logos
+
+    def open_snapshot(self):
+        '''
+        The local GamesSnapshot, opened when a source first needs it
+        '''
+        if self.snapshot is None:
+            self.snapshot = GamesSnapshot(self.snapshot_dir)
+        return self.snapshot
+
+    def load_snapshot(self):
+        '''
+        Reads the compiler's columns from the local snapshot
+        '''
+        self.open_snapshot()
+        return (
+            self.snapshot.load('games', columns=GAME_COLUMNS),
+            self.snapshot.load('logos', columns=LOGO_COLUMNS)
+        )
     
+    def match_deltas(self, deltas, coaches):
+        '''
+        Strips delta names and renames those that are not in coaches, but
+        resolve to the same pfr id as one that is, to that coach's name
+        '''
+        ## make sure whitespace is removed ##
+        deltas['coach'] = deltas['coach'].str.strip()
+        coaches = pd.Series(list(coaches), dtype=object).drop_duplicates()
+        by_id = {
+            pfr_id : name for name, pfr_id in
+            zip(coaches, self.name_index.resolve_all(coaches))
+            if pfr_id is not None
+        }
+        names = set(coaches)
+        deltas['coach'] = [
+            name if name in names or pfr_id is None else by_id.get(pfr_id, name)
+            for name, pfr_id in zip(deltas['coach'], self.name_index.resolve_all(deltas['coach']))
+        ]
+        return deltas
+
     def add_deltas_to_games(self, df, deltas):
         '''
         Adds data from before fastR to the dataset to make sure it is accurate
         for all time numbers like wins and losses, etc. This will not handle ATS
         information
         '''
-        ## make sure whitespace is removed ##
-        deltas['coach'] = deltas['coach'].str.strip()
-        ## if coach is in DF, then add delta from fields ##
-        ## if coach is not in df then add to new record ##
-        existing = []
-        ## missing ##
-        missing = []
-        for index, row in deltas.iterrows():
-            coach = row['coach']
-            existing_rec = df[df['coach'] == coach]
-            if len(existing_rec) == 0:
-                missing.append({
-                    'coach': coach,
-                    'seasons' : row['seasons'],
-                    'is_active' : 0,
-                    'games' : row['games'],
-                    'wins' : row['wins'],
-                    'losses' : row['losses'],
-                    'ties' : row['ties'],
-                    'playoff_births' : row['playoff_births'],
-                    'games_playoff' : row['games_playoff'],
-                    'wins_playoff' : row['wins_playoff'],
-                    'losses_playoff' : row['losses_playoff'],
-                    'ties_playoff' : 0,
-                    'games_superbowl' : row['games_superbowl'],
-                    'wins_superbowl' : row['wins_superbowl'],
-                    'ats_pct' : numpy.nan,
-                    'ats_return' : numpy.nan,
-                    'ats_risked' : numpy.nan,
-                    'avg_pf' : numpy.nan,
-                    'avg_pa' : numpy.nan,
-                    'avg_margin' : numpy.nan,
-                    'avg_spread' : numpy.nan,
-                    'ats_pct_home' : numpy.nan,
-                    'ats_pct_away' : numpy.nan,
-                    'ats_pct_playoff' : numpy.nan,
-                    'ats_pct_favorite' : numpy.nan,
-                    'ats_pct_underdog' : numpy.nan,
-                    'ats_pct_div' : numpy.nan,
-                    'ats_pct_non_div' : numpy.nan,
-                    'ats_pct_bye' : numpy.nan,
-                    'ats_pct_dome' : numpy.nan,
-                })
-            else:
-                record = existing_rec.iloc[0]
-                existing.append({
-                    'coach': record['coach'],
-                    'seasons' : row['seasons'] + record['seasons'],
-                    'is_active' : record['is_active'],
-                    'games' : row['games'] + record['games'],
-                    'wins' : row['wins'] + record['wins'],
-                    'losses' : row['losses'] + record['losses'],
-                    'ties' : row['ties'] + record['ties'],
-                    'playoff_births' : row['playoff_births'] + record['playoff_births'],
-                    'games_playoff' : row['games_playoff'] + record['games_playoff'],
-                    'wins_playoff' : row['wins_playoff'] + record['wins_playoff'],
-                    'losses_playoff' : row['losses_playoff'] + record['losses_playoff'],
-                    'ties_playoff' : record['ties_playoff'],
-                    'games_superbowl' : row['games_superbowl'] + record['games_superbowl'],
-                    'wins_superbowl' : row['wins_superbowl'] + record['wins_superbowl'],
-                    'ats_pct' : record['ats_pct'],
-                    'ats_return' : record['ats_return'],
-                    'ats_risked' : record['ats_risked'],
-                    'avg_pf' : record['avg_pf'],
-                    'avg_pa' : record['avg_pa'],
-                    'avg_margin' : record['avg_margin'],
-                    'avg_spread' : record['avg_spread'],
-                    'ats_pct_home' : record['ats_pct_home'],
-                    'ats_pct_away' : record['ats_pct_away'],
-                    'ats_pct_playoff' : record['ats_pct_playoff'],
-                    'ats_pct_favorite' : record['ats_pct_favorite'],
-                    'ats_pct_underdog' : record['ats_pct_underdog'],
-                    'ats_pct_div' : record['ats_pct_div'],
-                    'ats_pct_non_div' : record['ats_pct_non_div'],
-                    'ats_pct_bye' : record['ats_pct_bye'],
-                    'ats_pct_dome' : record['ats_pct_dome'],
-                })
-        ## turn into dfs and merge ##
-        existing_df = pd.DataFrame(existing)
-        missing_df = pd.DataFrame(missing)
-        new_df = pd.concat([existing_df, missing_df])
-        ## add exisint coaches that arent in new ##
-        not_in_new = df[~df['coach'].isin(new_df['coach'])]
-        if len(not_in_new) > 0:
-            new_df = pd.concat([new_df, not_in_new])
+        ## match delta names to the nflfastR spelling, on a copy ##
+        deltas = self.match_deltas(deltas.copy(), df['coach'])
+        ## fields the deltas add to ##
+        additive = [
+            'seasons', 'games', 'wins', 'losses', 'ties',
+            'playoff_births', 'games_playoff', 'wins_playoff',
+            'losses_playoff', 'games_superbowl', 'wins_superbowl'
+        ]
+        ## outer merge so coaches only in the deltas get their own record ##
+        merged = pd.merge(
+            df.assign(_df_pos=numpy.arange(len(df))),
+            deltas[['coach'] + additive].assign(_delta_pos=numpy.arange(len(deltas))),
+            on=['coach'],
+            how='outer',
+            suffixes=('', '_delta'),
+            indicator=True
+        )
+        in_df = merged['_merge'] != 'right_only'
+        in_deltas = merged['_merge'] != 'left_only'
+        ## add deltas to fastR totals, keeping the source dtypes ##
+        for col in additive:
+            merged[col] = (
+                merged[col].where(in_df, 0) +
+                merged['{0}_delta'.format(col)].where(in_deltas, 0)
+            ).astype(numpy.result_type(df[col].dtype, deltas[col].dtype))
+        ## coaches only in the deltas are inactive with no playoff ties ##
+        for col in ['is_active', 'ties_playoff']:
+            merged[col] = merged[col].where(in_df, 0).astype(df[col].dtype)
+        ## put rows in the order ties on wins have always been broken in --
+        ## coaches with deltas, coaches only in the deltas (both in deltas
+        ## order), then coaches without deltas (in df order) ##
+        merged['_group'] = numpy.where(in_df & in_deltas, 0, numpy.where(in_deltas, 1, 2))
+        merged['_pos'] = numpy.where(in_deltas, merged['_delta_pos'], merged['_df_pos'])
+        merged = merged.sort_values(by=['_group', '_pos'], kind='mergesort')
+        new_df = merged[df.columns].reset_index(drop=True)
         ## resort ##
         new_df = new_df.sort_values(
             by=['wins'],
@@ -142,256 +434,108 @@ class StatCompiler:
         new_df = new_df.groupby(['coach']).head(1)
         return new_df
 
-    def aggregate_games(self):
+    def flatten_games(self):
         '''
-        Aggregates the games file into coaching records
+        Flattens games into a long table with one row per coach per game,
+        built once and read by every aggregation stage. Keys are categorical
+        and flags are int8 to keep the table small
         '''
-        ## copy games for convenience of not writing self.games repeatedly
-        df = self.games.copy()
-        ## add game context
-        df['home_result'] = df['result']
-        df['away_result'] = -1 * df['home_result']
-        df['home_spread'] = df['spread_line'] * -1
-        df['away_spread'] = df['spread_line']
-        df['playoffs'] = numpy.where(
-            df['game_type'] != 'REG',
+        g = self.games
+        ## game context ##
+        playoffs = numpy.where(g['game_type'] != 'REG', 1, 0)
+        last_week = g.groupby(['season'])['week'].transform('max')
+        superbowl = numpy.where(
+            (g['week'] == last_week) & ## last observed week of the season
+            (g['game_type'] != 'REG') & ## is in the playoffs
+            (g.groupby(['season','week'])['result'].transform('count') == 1), ## only one game that week
             1,
             0
         )
-        df['home_is_home'] = 1
-        df['away_is_home'] = 0
-        df['last_week'] = df.groupby(['season'])['week'].transform('max')
-        df['superbowl'] = numpy.where(
-            (df['week'] == df['last_week']) & ## last observed week of the season
-            (df['game_type'] != 'REG') & ## is in the playoffs
-            (df.groupby(['season','week'])['result'].transform('count') == 1), ## only one game that week
-            1,
-            0
-        )
-        ## add byes ##
-        df['home_bye'] = numpy.where(
-            df['home_rest'] > 11,
-            1,
-            0
-        )
-        df['away_bye'] = numpy.where(
-            df['away_rest'] > 11,
-            1,
-            0
-        )
-        df['in_dome'] = numpy.where(
+        in_dome = numpy.where(
             numpy.isin(
-                df['roof'],
+                g['roof'],
                 ['dome', 'closed'],
             ),
             1,
             0
         )
-        ## flatten games
-        flat = pd.concat([
-            df[[
-                'season', 'home_coach', 'home_team', 'week',
-                'home_score', 'away_score',
-                'home_spread',
-                'home_result',
-                'home_is_home',
-                'playoffs', 'superbowl',
-                'home_bye', 'in_dome', 'div_game'
-            ]].rename(columns={
-                'home_coach': 'coach',
-                'home_team': 'team',
-                'home_score': 'pf',
-                'away_score': 'pa',
-                'home_result': 'result',
-                'home_spread': 'spread',
-                'home_is_home': 'is_home',
-                'home_bye': 'bye',
-            }),
-            df[[
-                'season', 'away_coach', 'away_team', 'week',
-                'away_score', 'home_score',
-                'away_spread',
-                'away_result',
-                'away_is_home',
-                'playoffs', 'superbowl',
-                'away_bye', 'in_dome', 'div_game'
-            ]].rename(columns={
-                'away_coach': 'coach',
-                'away_team': 'team',
-                'away_score': 'pf',
-                'home_score': 'pa',
-                'away_result': 'result',
-                'away_spread': 'spread',
-                'away_is_home': 'is_home',
-                'away_bye': 'bye',
-            })
+        ## stack home rows on top of away rows ##
+        def stack(home, away):
+            return numpy.concatenate([
+                numpy.asarray(home), numpy.asarray(away)
             ])
-        ## create fields to aggregate ##
-        flat['win'] = numpy.where(
-            flat['result'] > 0,
-            1,
-            0
-        )
-        flat['loss'] = numpy.where(
-            flat['result'] < 0,
-            1,
-            0
-        )
-        flat['tie'] = numpy.where(
-            flat['result'] == 0,
-            1,
-            0
-        )
-        flat['ats_result'] = numpy.where(
-            flat['result'] + flat['spread'] > 0,
-            1,
-            numpy.where(
-                flat['result'] + flat['spread'] < 0,
-                0,
-                numpy.nan
-            )
-        )
-        flat['ats_return'] = numpy.where(
-            flat['ats_result'] == 1,
-            1,
-            numpy.where(
-                flat['ats_result'] == 0,
-                -1.1,
-                0
-            )
-        )
-        flat['ats_risked'] = 1.1
-        flat['win_playoff'] = numpy.where(
-            flat['playoffs'] == 1,
-            numpy.where(
-                flat['result'] > 0,
-                1,
-                0
-            ),
-            numpy.nan
-        )
-        flat['loss_playoff'] = numpy.where(
-            flat['playoffs'] == 1,
-            numpy.where(
-                flat['result'] < 0,
-                1,
-                0
-            ),
-            numpy.nan
-        )
-        flat['tie_playoff'] = numpy.where(
-            flat['playoffs'] == 1,
-            numpy.where(
-                flat['result'] == 0,
-                1,
-                0
-            ),
-            numpy.nan
-        )
-        flat['playoff_season'] = numpy.where(
-            flat['playoffs'] == 1,
-            flat['season'],
-            numpy.nan
-        )
-        flat['win_superbowl'] = numpy.where(
-            flat['superbowl'] == 1,
-            numpy.where(
-                flat['result'] > 0,
-                1,
-                0
-            ),
-            numpy.nan
-        )
-        ## ATS Splits ##
-        flat['ats_home'] = numpy.where(
-            flat['is_home'] == 1,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_away'] = numpy.where(
-            flat['is_home'] == 0,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_playoff'] = numpy.where(
-            flat['playoffs'] == 1,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_favorite'] = numpy.where(
-            flat['spread'] < 0,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_underdog'] = numpy.where(
-            flat['spread'] > 0,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_div'] = numpy.where(
-            flat['div_game'] == 1,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_non_div'] = numpy.where(
-            flat['div_game'] == 0,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_bye'] = numpy.where(
-            flat['bye'] == 1,
-            flat['ats_result'],
-            numpy.nan
-        )
-        flat['ats_dome'] = numpy.where(
-            flat['in_dome'] == 1,
-            flat['ats_result'],
-            numpy.nan
-        )
-        ## get active coaches ##
-        active = flat.sort_values(
+        flat = pd.DataFrame({
+            'season' : stack(g['season'], g['season']).astype('int16'),
+            'coach' : pd.Categorical(stack(g['home_coach'], g['away_coach'])),
+            'team' : pd.Categorical(stack(g['home_team'], g['away_team'])),
+            'week' : stack(g['week'], g['week']).astype('int16'),
+            'pf' : stack(g['home_score'], g['away_score']),
+            'pa' : stack(g['away_score'], g['home_score']),
+            'spread' : stack(g['spread_line'] * -1, g['spread_line']),
+            'result' : stack(g['result'], -1 * g['result']),
+            'is_home' : numpy.repeat(numpy.array([1, 0], dtype='int8'), len(g)),
+            'playoffs' : stack(playoffs, playoffs).astype('int8'),
+            'superbowl' : stack(superbowl, superbowl).astype('int8'),
+            'bye' : stack(g['home_rest'] > 11, g['away_rest'] > 11).astype('int8'),
+            'in_dome' : stack(in_dome, in_dome).astype('int8'),
+            'div_game' : stack(g['div_game'], g['div_game']).astype('int8'),
+        })
+        return flat
+
+    def add_game_fields(self, flat):
+        '''
+        Adds the per coach-game fields that are aggregated into records (see
+        metrics.GAME_FIELDS)
+        '''
+        ## shallow copy so derived fields do not land on the shared table ##
+        flat = flat.copy(deep=False)
+        for name, values in game_fields(flat).items():
+            flat[name] = values
+        return flat
+
+    def active_coaches(self):
+        '''
+        Coaches who coached the most recent game for any team
+        '''
+        return self.coach_games.sort_values(
             by=['team','season','week'],
             ascending=[True,True,True]
-        ).groupby(['team']).tail(1)[
+        ).groupby(['team'], observed=True).tail(1)[
             'coach'
         ].unique().tolist()
+
+    def add_rate_fields(self, agg):
+        '''
+        Calcs the fields derived from aggregated totals
+        '''
+        agg['ats_roi'] = agg['ats_return'] / agg['ats_risked']
+        agg['win_pct'] = agg['wins'] / (agg['wins']+agg['losses']+agg['ties'])
+        agg['win_pct_playoff'] = agg['wins_playoff'] / (agg['wins_playoff']+agg['losses_playoff']+agg['ties_playoff'])
+        return agg
+
+    def aggregate_games(self):
+        '''
+        Aggregates the games file into coaching records
+        '''
+        flat = self.coach_games.copy(deep=False)
+        codes = flat['coach'].cat.codes.to_numpy().astype('int64')
+        coaches = flat['coach'].cat.categories
+        ## get active coaches, checked once per coach rather than per game ##
+        active = self.active_coaches()
         flat['is_active'] = numpy.where(
-            numpy.isin(flat['coach'], active),
+            coaches.isin(active),
             1,
             0
-        )
-        ## aggregate ##
-        agg = flat.groupby(['coach']).agg(
-            seasons = ('season', 'nunique'),
-            is_active = ('is_active', 'max'),
-            games = ('season', 'count'),
-            wins = ('win', 'sum'),
-            losses = ('loss', 'sum'),
-            ties = ('tie', 'sum'),
-            playoff_births = ('playoff_season', 'nunique'),
-            games_playoff = ('playoffs', 'sum'),
-            wins_playoff = ('win_playoff', 'sum'),
-            losses_playoff = ('loss_playoff', 'sum'),
-            ties_playoff = ('tie_playoff', 'sum'),
-            games_superbowl = ('superbowl', 'sum'),
-            wins_superbowl = ('win_superbowl', 'sum'),
-            ats_pct = ('ats_result', 'mean'),
-            ats_return = ('ats_return', 'sum'),
-            ats_risked = ('ats_risked', 'sum'),
-            avg_pf = ('pf', 'mean'),
-            avg_pa = ('pa', 'mean'),
-            avg_margin = ('result', 'mean'),
-            avg_spread = ('spread', 'mean'),
-            ats_pct_home = ('ats_home', 'mean'),
-            ats_pct_away = ('ats_away', 'mean'),
-            ats_pct_playoff = ('ats_playoff', 'mean'),
-            ats_pct_favorite = ('ats_favorite', 'mean'),
-            ats_pct_underdog = ('ats_underdog', 'mean'),
-            ats_pct_div = ('ats_div', 'mean'),
-            ats_pct_non_div = ('ats_non_div', 'mean'),
-            ats_pct_bye = ('ats_bye', 'mean'),
-            ats_pct_dome = ('ats_dome', 'mean')
-        ).reset_index()
+        )[codes]
+        ## aggregate every metric in the registry over the coach codes ##
+        results = evaluate_metrics(flat, codes, len(coaches))
+        ## like an observed groupby, only coaches with games ##
+        observed = numpy.bincount(codes[codes >= 0], minlength=len(coaches)) > 0
+        agg = pd.DataFrame({
+            'coach' : coaches[observed],
+            **{name : values[observed] for name, values in results.items()}
+        })
+        agg['coach'] = agg['coach'].astype(str)
         agg = agg.sort_values(
             by=['wins'],
             ascending=[False]
@@ -399,39 +543,49 @@ class StatCompiler:
         ## add deltas from before 1999 ##
         agg = self.add_deltas_to_games(agg, self.pre_fastr_deltas)
         ## calc some post agg fields ##
-        agg['ats_roi'] = agg['ats_return'] / agg['ats_risked']
-        agg['win_pct'] = agg['wins'] / (agg['wins']+agg['losses']+agg['ties'])
-        agg['win_pct_playoff'] = agg['wins_playoff'] / (agg['wins_playoff']+agg['losses_playoff']+agg['ties_playoff'])
+        agg = self.add_rate_fields(agg)
         ## return ##
         return agg
 
+    def compile_splits(self, splits=SPLITS, windows=None, metrics=None, path=None):
+        '''
+        Per career, season, team stint and trailing window coach metrics as
+        a long table (see splits.compute_splits), optionally saved as csv
+        '''
+        with self.stage('splits') as s:
+            s['rows_in'] = len(self.coach_games)
+            df = compute_splits(
+                self.add_game_fields(self.coach_games),
+                splits=splits, windows=windows, metrics=metrics
+            )
+            if path is not None:
+                df.to_csv(path, index=False)
+            s['rows_out'] = len(df)
+        return df
+
+    def compile_scenarios(self, scenarios, workers=None):
+        '''
+        Career metrics for each what-if scenario, stacked (see
+        batch.run_batch), with scenarios spread over worker processes
+        '''
+        with self.stage('scenarios') as s:
+            s['rows_in'] = len(self.coach_games) * len(scenarios)
+            df = run_batch(self, scenarios, workers=workers)
+            s['rows_out'] = len(df)
+        return df
+
     def add_teams(self):
         '''
         Adds an array of teams that the coach coached for
         '''
-        ## load games #
-        g = self.games.copy()
-        ## flatten ##
-        g = g[~pd.isnull(g['result'])]
-        ## flatten ##
-        flat = pd.concat([
-            g[[
-                'home_coach', 'home_team',
-            ]].rename(columns={
-                'home_coach': 'coach',
-                'home_team': 'team'
-            }),
-            g[[
-                'away_coach', 'away_team',
-            ]].rename(columns={
-                'away_coach': 'coach',
-                'away_team': 'team'
-            })
-        ])
+        ## coach and team of every coach-game ##
+        flat = self.coach_games[['coach', 'team']]
         ## aggregate by games coached by team to get a good order ##
-        agg = flat.groupby(['coach', 'team']).agg(
+        agg = flat.groupby(['coach', 'team'], observed=True).agg(
             games = ('team', 'count')
         ).reset_index()
+        agg['coach'] = agg['coach'].astype(str)
+        agg['team'] = agg['team'].astype(str)
         agg = agg.sort_values(
             by=['coach', 'games'],
             ascending=[True, False]
@@ -468,22 +622,40 @@ class StatCompiler:
         '''
         ## load pfr data ##
         pfr = self.coach_meta.copy()
-        pfr = pfr.groupby(['pfr_coach_name']).head(1)
+        pfr = pfr.groupby(['pfr_coach_id']).head(1)
+        ## resolve names to ids ##
+        self.compiled_stats = self.compiled_stats.copy()
+        self.compiled_stats['pfr_coach_id'] = self.name_index.resolve_all(
+            self.compiled_stats['coach']
+        )
+        unmatched = self.compiled_stats.loc[pd.isnull(self.compiled_stats['pfr_coach_id']), 'coach']
+        if len(unmatched) > 0:
+            print('     Could not match {0} coaches to a pfr id: {1}'.format(
+                len(unmatched), ', '.join(unmatched.head(10))
+            ))
         ## add headshots ##
         self.compiled_stats = pd.merge(
             self.compiled_stats,
             pfr[[
-                'pfr_coach_name', 'pfr_coach_image_url',
+                'pfr_coach_id', 'pfr_coach_image_url',
                 'pfr_coach_tree_hired_by' , 'pfr_coach_tree_hired'
-            ]].rename(columns={
-                'pfr_coach_name': 'coach',
-            }),
-            on=['coach'],
+            ]],
+            on=['pfr_coach_id'],
             how='left'
         )
 
     def save_output(self):
+        ## log the rows that change before replacing the file ##
+        ChangeFeed(
+            'coaches', 'coach', feed_dir='{0}/changes'.format(self.package_loc)
+        ).record('{0}/coaches.csv'.format(self.package_loc), self.compiled_stats)
         self.compiled_stats.to_csv(
             '{0}/coaches.csv'.format(self.package_loc),
             index=False
-        )
\ No newline at end of file
+        )
+        if self.columnar is not None:
+            write_columnar(
+                self.compiled_stats,
+                '{0}/coaches.{1}'.format(self.package_loc, FORMATS[self.columnar]),
+                fmt=self.columnar
+            )
\ No newline at end of file
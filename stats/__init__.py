@@ -1 +1,6 @@
-from .StatCompiler import StatCompiler
\ No newline at end of file
+from ..lazy import lazy_package
+
+lazy_package(__name__, {
+    'StatCompiler' : ('.StatCompiler', 'StatCompiler'),
+    'run_batch' : ('.batch', 'run_batch'),
+})
\ No newline at end of file
@@ -0,0 +1,151 @@
+## packages ##
+import pandas as pd
+import numpy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .metrics import evaluate_metrics, METRICS
+
+## flattened columns the metric registry reads, shared with the workers ##
+SHARED_COLUMNS = [
+    'season', 'pf', 'pa', 'spread', 'result', 'is_home', 'playoffs',
+    'superbowl', 'bye', 'in_dome', 'div_game', 'is_active'
+]
+## what a scenario can change ##
+SCENARIO_FIELDS = ['name', 'seasons', 'exclude_seasons', 'spread_line', 'result']
+
+## base arrays of a worker process, attached from shared memory ##
+worker_blocks = []
+worker_arrays = {}
+
+def share_arrays(arrays):
+    '''
+    Copies arrays into shared memory blocks. Returns the blocks and the
+    spec workers attach with -- {column : (block name, dtype, length)}
+    '''
+    blocks = []
+    spec = {}
+    for col, values in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        blocks.append(block)
+        numpy.ndarray(len(values), dtype=values.dtype, buffer=block.buf)[:] = values
+        spec[col] = (block.name, values.dtype.str, len(values))
+    return blocks, spec
+
+def attach_arrays(spec):
+    '''
+    Worker initializer, read only views of the shared base arrays
+    '''
+    for col, (name, dtype, length) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        worker_blocks.append(block)
+        values = numpy.ndarray(length, dtype=dtype, buffer=block.buf)
+        values.setflags(write=False)
+        worker_arrays[col] = values
+
+def scenario_frame(arrays, scenario):
+    '''
+    Flattened table and coach codes for a scenario. Base columns are used
+    in place, only the columns a scenario changes are allocated, and rows
+    outside the scenario's seasons get a code of -1 so they are dropped
+    '''
+    unknown = set(scenario) - set(SCENARIO_FIELDS)
+    if len(unknown) > 0:
+        raise Exception('BATCH ERROR: Unknown scenario fields {0}'.format(', '.join(sorted(unknown))))
+    cols = {col : arrays[col] for col in SHARED_COLUMNS}
+    codes = arrays['codes']
+    n_games = len(codes) // 2
+    ## season filters ##
+    keep = None
+    if scenario.get('seasons') is not None:
+        keep = numpy.isin(arrays['season'], scenario['seasons'])
+    if scenario.get('exclude_seasons') is not None:
+        excluded = ~numpy.isin(arrays['season'], scenario['exclude_seasons'])
+        keep = excluded if keep is None else keep & excluded
+    if keep is not None:
+        codes = numpy.where(keep, codes, -1)
+    ## per game overrides, in the order of the games table ##
+    for field, col in [('spread_line', 'spread'), ('result', 'result')]:
+        if scenario.get(field) is None:
+            continue
+        values = numpy.asarray(scenario[field], dtype='float64')
+        if len(values) != n_games:
+            raise Exception('BATCH ERROR: {0} has {1} values for {2} games'.format(
+                field, len(values), n_games
+            ))
+        ## home rows are stacked on top of away rows, see flatten_games ##
+        if field == 'spread_line':
+            cols[col] = numpy.concatenate([values * -1, values])
+        else:
+            cols[col] = numpy.concatenate([values, values * -1])
+    return pd.DataFrame(cols, copy=False), codes
+
+def evaluate_scenario(scenario, n, metrics=METRICS, arrays=None):
+    '''
+    Metric arrays for each of the n coach codes under a scenario, plus the
+    number of games each coach has in it
+    '''
+    arrays = arrays if arrays is not None else worker_arrays
+    flat, codes = scenario_frame(arrays, scenario)
+    results = evaluate_metrics(flat, codes, n, metrics)
+    games = numpy.bincount(codes[codes >= 0], minlength=n)
+    return results, games
+
+def run_batch(compiler, scenarios, workers=None, metrics=METRICS):
+    '''
+    Evaluates metrics over the compiler's flattened games for each scenario
+    and returns one stacked frame with a scenario column.
+
+    A scenario is a dict of
+        name -- label in the output, defaults to its position
+        seasons / exclude_seasons -- seasons to keep / drop
+        spread_line / result -- per game values replacing the base ones,
+            in the order of the compiler's games table
+
+    The base arrays are copied into shared memory once and attached by each
+    worker process, so only the scenarios and per coach results are pickled.
+    workers defaults to the cpu count, and 1 runs in process. Results are
+    career metrics before pre-99 deltas, for coaches with games in the
+    scenario
+    '''
+    flat = compiler.coach_games
+    coaches = flat['coach'].cat.categories
+    codes = flat['coach'].cat.codes.to_numpy().astype('int64')
+    arrays = {col : flat[col].to_numpy() for col in SHARED_COLUMNS if col != 'is_active'}
+    arrays['is_active'] = numpy.where(
+        coaches.isin(compiler.active_coaches()), 1, 0
+    ).astype('int8')[codes]
+    arrays['codes'] = codes
+    scenarios = [dict(scenario) for scenario in scenarios]
+    workers = workers if workers is not None else os.cpu_count()
+    if workers <= 1:
+        outputs = [evaluate_scenario(scenario, len(coaches), metrics, arrays) for scenario in scenarios]
+    else:
+        blocks, spec = share_arrays(arrays)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=attach_arrays, initargs=(spec,)
+            ) as pool:
+                outputs = list(pool.map(
+                    evaluate_scenario, scenarios,
+                    [len(coaches)] * len(scenarios), [metrics] * len(scenarios),
+                    chunksize=max(1, len(scenarios) // (workers * 4))
+                ))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    ## stack ##
+    frames = []
+    for i, (scenario, (results, games)) in enumerate(zip(scenarios, outputs)):
+        observed = games > 0
+        agg = pd.DataFrame({
+            'coach' : coaches[observed].astype(str),
+            **{name : values[observed] for name, values in results.items()}
+        })
+        if metrics is METRICS:
+            agg = compiler.add_rate_fields(agg)
+        agg.insert(0, 'scenario', scenario.get('name', i))
+        frames.append(agg)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,201 @@
+## packages ##
+import pandas as pd
+import numpy
+
+## shared filters on the flattened coach-game table ##
+MASKS = {
+    'playoffs' : lambda f: f['playoffs'].to_numpy() == 1,
+    'superbowl' : lambda f: f['superbowl'].to_numpy() == 1,
+    'home' : lambda f: f['is_home'].to_numpy() == 1,
+    'away' : lambda f: f['is_home'].to_numpy() == 0,
+    'favorite' : lambda f: f['spread'].to_numpy() < 0,
+    'underdog' : lambda f: f['spread'].to_numpy() > 0,
+    'div' : lambda f: f['div_game'].to_numpy() == 1,
+    'non_div' : lambda f: f['div_game'].to_numpy() == 0,
+    'bye' : lambda f: f['bye'].to_numpy() == 1,
+    'dome' : lambda f: f['in_dome'].to_numpy() == 1,
+}
+
+def ats_result(f):
+    cover = f['result'].to_numpy() + f['spread'].to_numpy()
+    return numpy.where(cover > 0, 1.0, numpy.where(cover < 0, 0.0, numpy.nan))
+
+## per coach-game values, null where a game does not count towards a mean ##
+VALUES = {
+    'season' : lambda f: f['season'].to_numpy(dtype='float64'),
+    'pf' : lambda f: f['pf'].to_numpy(dtype='float64'),
+    'pa' : lambda f: f['pa'].to_numpy(dtype='float64'),
+    'result' : lambda f: f['result'].to_numpy(dtype='float64'),
+    'spread' : lambda f: f['spread'].to_numpy(dtype='float64'),
+    'playoffs' : lambda f: f['playoffs'].to_numpy(dtype='float64'),
+    'superbowl' : lambda f: f['superbowl'].to_numpy(dtype='float64'),
+    'is_active' : lambda f: f['is_active'].to_numpy(dtype='float64'),
+    'win' : lambda f: (f['result'].to_numpy() > 0).astype('float64'),
+    'loss' : lambda f: (f['result'].to_numpy() < 0).astype('float64'),
+    'tie' : lambda f: (f['result'].to_numpy() == 0).astype('float64'),
+    'ats_result' : ats_result,
+    'ats_return' : lambda f: numpy.where(
+        f.value('ats_result') == 1, 1, numpy.where(f.value('ats_result') == 0, -1.1, 0)
+    ),
+    'ats_risked' : lambda f: numpy.full(len(f), 1.1),
+}
+
+## per coach-game fields StatCompiler.add_game_fields adds for the partials
+## and splits : (mask, value, dtype), null where the mask is false ##
+GAME_FIELDS = {
+    'win' : (None, 'win', 'int64'),
+    'loss' : (None, 'loss', 'int64'),
+    'tie' : (None, 'tie', 'int64'),
+    'ats_result' : (None, 'ats_result', 'float64'),
+    'ats_return' : (None, 'ats_return', 'float64'),
+    'ats_risked' : (None, 'ats_risked', 'float64'),
+    'win_playoff' : ('playoffs', 'win', 'float64'),
+    'loss_playoff' : ('playoffs', 'loss', 'float64'),
+    'tie_playoff' : ('playoffs', 'tie', 'float64'),
+    'playoff_season' : ('playoffs', 'season', 'float64'),
+    'win_superbowl' : ('superbowl', 'win', 'float64'),
+    'ats_home' : ('home', 'ats_result', 'float64'),
+    'ats_away' : ('away', 'ats_result', 'float64'),
+    'ats_playoff' : ('playoffs', 'ats_result', 'float64'),
+    'ats_favorite' : ('favorite', 'ats_result', 'float64'),
+    'ats_underdog' : ('underdog', 'ats_result', 'float64'),
+    'ats_div' : ('div', 'ats_result', 'float64'),
+    'ats_non_div' : ('non_div', 'ats_result', 'float64'),
+    'ats_bye' : ('bye', 'ats_result', 'float64'),
+    'ats_dome' : ('dome', 'ats_result', 'float64'),
+}
+
+## career metric : (mask, value, reducer, dtype) ##
+METRICS = {
+    'seasons' : (None, 'season', 'nunique', 'int64'),
+    'is_active' : (None, 'is_active', 'max', 'int64'),
+    'games' : (None, 'season', 'count', 'int64'),
+    'wins' : (None, 'win', 'sum', 'int64'),
+    'losses' : (None, 'loss', 'sum', 'int64'),
+    'ties' : (None, 'tie', 'sum', 'int64'),
+    'playoff_births' : ('playoffs', 'season', 'nunique', 'int64'),
+    'games_playoff' : (None, 'playoffs', 'sum', 'int64'),
+    'wins_playoff' : ('playoffs', 'win', 'sum', 'float64'),
+    'losses_playoff' : ('playoffs', 'loss', 'sum', 'float64'),
+    'ties_playoff' : ('playoffs', 'tie', 'sum', 'float64'),
+    'games_superbowl' : (None, 'superbowl', 'sum', 'int64'),
+    'wins_superbowl' : ('superbowl', 'win', 'sum', 'float64'),
+    'ats_pct' : (None, 'ats_result', 'mean', 'float64'),
+    'ats_return' : (None, 'ats_return', 'sum', 'float64'),
+    'ats_risked' : (None, 'ats_risked', 'sum', 'float64'),
+    'avg_pf' : (None, 'pf', 'mean', 'float64'),
+    'avg_pa' : (None, 'pa', 'mean', 'float64'),
+    'avg_margin' : (None, 'result', 'mean', 'float64'),
+    'avg_spread' : (None, 'spread', 'mean', 'float64'),
+    'ats_pct_home' : ('home', 'ats_result', 'mean', 'float64'),
+    'ats_pct_away' : ('away', 'ats_result', 'mean', 'float64'),
+    'ats_pct_playoff' : ('playoffs', 'ats_result', 'mean', 'float64'),
+    'ats_pct_favorite' : ('favorite', 'ats_result', 'mean', 'float64'),
+    'ats_pct_underdog' : ('underdog', 'ats_result', 'mean', 'float64'),
+    'ats_pct_div' : ('div', 'ats_result', 'mean', 'float64'),
+    'ats_pct_non_div' : ('non_div', 'ats_result', 'mean', 'float64'),
+    'ats_pct_bye' : ('bye', 'ats_result', 'mean', 'float64'),
+    'ats_pct_dome' : ('dome', 'ats_result', 'mean', 'float64'),
+}
+
+class GameFrame:
+    '''
+    Wraps the flattened table so masks and values are computed once and
+    shared by every metric that uses them
+    '''
+    def __init__(self, flat):
+        self.flat = flat
+        self.masks = {}
+        self.values = {}
+
+    def __len__(self):
+        return len(self.flat)
+
+    def __getitem__(self, col):
+        return self.flat[col]
+
+    def mask(self, name):
+        if name not in self.masks:
+            self.masks[name] = MASKS[name](self)
+        return self.masks[name]
+
+    def value(self, name):
+        if name not in self.values:
+            self.values[name] = VALUES[name](self)
+        return self.values[name]
+
+def game_fields(flat, fields=GAME_FIELDS):
+    '''
+    {field : array} of the game fields over the flattened table, from the
+    same masks and values the career metrics use
+    '''
+    frame = GameFrame(flat)
+    out = {}
+    for name, (mask, value, dtype) in fields.items():
+        values = frame.value(value)
+        if mask is not None:
+            values = numpy.where(frame.mask(mask), values, numpy.nan)
+        out[name] = values.astype(dtype)
+    return out
+
+def group_sum(codes, values, n):
+    '''
+    Per group sum in a single grouped pass. pandas sums each group in row
+    order with Kahan compensation, like the groupby the metrics replaced, so
+    integer valued sums are exact and others are within about 2e-16 times
+    the group's sum of absolute values of the exact sum
+    '''
+    sums = pd.Series(values, copy=False).groupby(codes, sort=False).sum()
+    out = numpy.zeros(n, dtype='float64')
+    out[sums.index.to_numpy()] = sums.to_numpy()
+    return out
+
+def reduce_groups(reducer, codes, values, n):
+    '''
+    Reduce values (nulls already dropped, sorted by code) into n groups
+    '''
+    if reducer == 'count':
+        return numpy.bincount(codes, minlength=n)
+    if reducer == 'sum':
+        return group_sum(codes, values, n)
+    if reducer == 'mean':
+        counts = numpy.bincount(codes, minlength=n)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(counts > 0, group_sum(codes, values, n) / counts, numpy.nan)
+    if reducer == 'nunique':
+        if len(values) == 0:
+            return numpy.zeros(n, dtype='int64')
+        ## unique (code, value) pairs as a single integer key ##
+        values = values.astype('int64')
+        low = values.min()
+        span = values.max() - low + 1
+        pairs = numpy.unique(codes * span + (values - low))
+        return numpy.bincount(pairs // span, minlength=n)
+    if reducer == 'max':
+        out = numpy.full(n, -numpy.inf)
+        numpy.maximum.at(out, codes, values)
+        ## groups without rows are 0, like count and sum ##
+        out[numpy.isneginf(out)] = 0
+        return out
+    raise Exception('METRICS ERROR: Unknown reducer {0}'.format(reducer))
+
+def evaluate_metrics(flat, codes, n, metrics=METRICS):
+    '''
+    Evaluates metrics over the flattened coach-game table, grouped by codes
+    (0 to n - 1, negative codes are dropped). Returns {metric : array}.
+    Results are cast to the dtype in the registry
+    '''
+    frame = GameFrame(flat)
+    ## rows are sorted by code once, masks are applied in that order ##
+    order = numpy.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    results = {}
+    for name, (mask, value, reducer, dtype) in metrics.items():
+        values = frame.value(value)[order]
+        rows = ~numpy.isnan(values)
+        if mask is not None:
+            rows = rows & frame.mask(mask)[order]
+        out = reduce_groups(reducer, sorted_codes[rows], values[rows], n)
+        results[name] = out.astype(dtype)
+    return results
@@ -0,0 +1,161 @@
+## packages ##
+import pandas as pd
+import numpy
+
+## metric : (kind, column) on the game fields. sums are totals, means are ##
+## averages over games where the column is not null, and ratios divide the ##
+## sums of two columns ##
+SPLIT_METRICS = {
+    'games' : ('count', 'result'),
+    'wins' : ('sum', 'win'),
+    'losses' : ('sum', 'loss'),
+    'ties' : ('sum', 'tie'),
+    'win_pct' : ('mean', 'win'),
+    'games_playoff' : ('sum', 'playoffs'),
+    'wins_playoff' : ('sum', 'win_playoff'),
+    'ats_pct' : ('mean', 'ats_result'),
+    'ats_roi' : ('ratio', ('ats_return', 'ats_risked')),
+    'avg_pf' : ('mean', 'pf'),
+    'avg_pa' : ('mean', 'pa'),
+    'avg_margin' : ('mean', 'result'),
+    'avg_spread' : ('mean', 'spread'),
+    'ats_pct_home' : ('mean', 'ats_home'),
+    'ats_pct_away' : ('mean', 'ats_away'),
+    'ats_pct_playoff' : ('mean', 'ats_playoff'),
+    'ats_pct_favorite' : ('mean', 'ats_favorite'),
+    'ats_pct_underdog' : ('mean', 'ats_underdog'),
+    'ats_pct_div' : ('mean', 'ats_div'),
+    'ats_pct_non_div' : ('mean', 'ats_non_div'),
+    'ats_pct_bye' : ('mean', 'ats_bye'),
+    'ats_pct_dome' : ('mean', 'ats_dome'),
+}
+SPLITS = ['career', 'season', 'team']
+SPLIT_COLUMNS = [
+    'split', 'coach', 'key', 'season_start', 'season_end', 'metric', 'value', 'n'
+]
+
+def metric_arrays(fields, metrics):
+    '''
+    Numerator and denominator matrices (rows x metrics) of the game fields.
+    The value of a metric over any set of rows is the ratio of their sums,
+    except for totals, whose denominator only counts games
+    '''
+    num = numpy.zeros((len(fields), len(metrics)), dtype='float64')
+    den = numpy.zeros((len(fields), len(metrics)), dtype='float64')
+    for i, metric in enumerate(metrics):
+        kind, col = SPLIT_METRICS[metric]
+        if kind == 'ratio':
+            num[:, i] = numpy.nan_to_num(fields[col[0]].to_numpy(dtype='float64'))
+            den[:, i] = numpy.nan_to_num(fields[col[1]].to_numpy(dtype='float64'))
+            continue
+        values = fields[col].to_numpy(dtype='float64')
+        present = ~numpy.isnan(values)
+        num[:, i] = present if kind == 'count' else numpy.where(present, values, 0)
+        den[:, i] = present
+    return num, den
+
+def long_frame(split, coach, key, season_start, season_end, sums_num, sums_den, metrics):
+    '''
+    Long format (one row per group per metric) frame of summed groups
+    '''
+    is_total = numpy.array([SPLIT_METRICS[m][0] in ['sum', 'count'] for m in metrics])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        values = numpy.where(is_total, sums_num, sums_num / sums_den)
+    ## ratios of nothing are null rather than inf ##
+    values[~is_total & (sums_den == 0)] = numpy.nan
+    n_metrics = len(metrics)
+    return pd.DataFrame({
+        'split' : split,
+        'coach' : numpy.repeat(coach, n_metrics),
+        'key' : numpy.repeat(key, n_metrics),
+        'season_start' : numpy.repeat(season_start, n_metrics),
+        'season_end' : numpy.repeat(season_end, n_metrics),
+        'metric' : numpy.tile(metrics, len(coach)),
+        'value' : values.ravel(),
+        'n' : sums_den.ravel(),
+    })
+
+def compute_splits(fields, splits=SPLITS, windows=None, metrics=None):
+    '''
+    Coach metrics at several granularities from the game fields (the
+    flattened coach-game table after StatCompiler.add_game_fields), as one
+    long frame with columns split, coach, key, season_start, season_end,
+    metric, value and n (games behind the value).
+
+    splits can include 'career', 'season' (key is the season) and 'team'
+    (one group per stint with a team, key is the team). Each window N adds
+    a 'last_N' split with the trailing N games as of every game a coach
+    coached (key is season-week of that game).
+
+    Rows are sorted by coach and date once and the metric matrices are
+    prefix summed, so every group and window is a difference of two rows
+    of the prefix sums
+    '''
+    metrics = list(SPLIT_METRICS.keys()) if metrics is None else list(metrics)
+    windows = [] if windows is None else list(windows)
+    for split in splits:
+        if split not in SPLITS:
+            raise Exception('SPLITS ERROR: Unknown split {0}. Options are {1}'.format(
+                split, ', '.join(SPLITS)
+            ))
+    ## chronological order within each coach ##
+    coach = fields['coach'].astype(str).to_numpy()
+    season = fields['season'].to_numpy()
+    week = fields['week'].to_numpy()
+    team = fields['team'].astype(str).to_numpy()
+    order = numpy.lexsort((week, season, coach))
+    coach, season, week, team = coach[order], season[order], week[order], team[order]
+    num, den = metric_arrays(fields.iloc[order], metrics)
+    ## prefix sums with a leading zero row, so a group [start, end) is ##
+    ## cum[end] - cum[start] ##
+    cum_num = numpy.vstack([numpy.zeros((1, len(metrics))), numpy.cumsum(num, axis=0)])
+    cum_den = numpy.vstack([numpy.zeros((1, len(metrics))), numpy.cumsum(den, axis=0)])
+    n = len(coach)
+    new_coach = numpy.ones(n, dtype=bool)
+    new_coach[1:] = coach[1:] != coach[:-1]
+    def groups(split, starts_mask, key):
+        starts = numpy.flatnonzero(starts_mask)
+        ends = numpy.append(starts[1:], n)
+        return long_frame(
+            split, coach[starts], key(starts, ends),
+            season[starts], season[ends - 1],
+            cum_num[ends] - cum_num[starts], cum_den[ends] - cum_den[starts],
+            metrics
+        )
+    frames = []
+    if 'career' in splits:
+        frames.append(groups(
+            'career', new_coach, lambda starts, ends: numpy.full(len(starts), 'career')
+        ))
+    if 'season' in splits:
+        new_season = new_coach.copy()
+        new_season[1:] |= season[1:] != season[:-1]
+        frames.append(groups(
+            'season', new_season, lambda starts, ends: season[starts].astype(str)
+        ))
+    if 'team' in splits:
+        new_stint = new_coach.copy()
+        new_stint[1:] |= team[1:] != team[:-1]
+        frames.append(groups(
+            'team', new_stint, lambda starts, ends: team[starts]
+        ))
+    if len(windows) > 0:
+        ## first row of each row's coach ##
+        coach_start = numpy.maximum.accumulate(
+            numpy.where(new_coach, numpy.arange(n), 0)
+        )
+        ends = numpy.arange(1, n + 1)
+        key = numpy.char.add(
+            numpy.char.add(season.astype(str), '-'), week.astype(str)
+        )
+        for window in windows:
+            starts = numpy.maximum(ends - window, coach_start)
+            frames.append(long_frame(
+                'last_{0}'.format(window), coach, key,
+                season[starts], season,
+                cum_num[ends] - cum_num[starts], cum_den[ends] - cum_den[starts],
+                metrics
+            ))
+    if len(frames) == 0:
+        return pd.DataFrame(columns=SPLIT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,213 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+import datetime
+import json
+import io
+import os
+import shutil
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+## numbers this close (relative, or absolute near 0) are the same value ##
+TOLERANCE = 1e-9
+
+class ChangeFeed:
+    '''
+    Versioned log of the rows changed in a dataset (coaches.csv or
+    coach_meta.csv) each time it is written.
+
+    record() diffs the frame about to be written against the file it
+    replaces, by key column and on the values as they appear in the csv
+    (nulls are ''). Numbers are compared by value within TOLERANCE, so
+    float formatting and summation order are not changes. When anything
+    changed, the dataset's version in
+    {feed_dir}/manifest.json goes up by one and the change log is written to
+    {feed_dir}/{dataset}/{version}.json, listing inserted rows with their
+    values, updated rows with [old, new] for each changed column, and
+    removed keys. Writes that change nothing keep the version, so consumers
+    can skip a run by comparing versions, and otherwise apply since() in
+    order. Only the last keep logs are kept.
+
+    A run that writes the file several times (ie checkpoints) calls begin()
+    first and only records its last write, so the run is one version. The
+    file as it was before the run is kept until then, so changes written by
+    a run that died part way are recorded by the next one
+    '''
+
+    def __init__(self, dataset, key, feed_dir=None, keep=100):
+        self.dataset = dataset
+        self.key = key
+        self.feed_dir = pathlib.Path(
+            feed_dir if feed_dir is not None else
+            '{0}/changes'.format(package_loc)
+        )
+        self.keep = keep
+        self.manifest_loc = self.feed_dir / 'manifest.json'
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_loc) as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def save_manifest(self, manifest):
+        tmp = '{0}.tmp'.format(self.manifest_loc)
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp, self.manifest_loc)
+
+    def version(self):
+        '''
+        Current version of the dataset, 0 if it has never been recorded
+        '''
+        return self.load_manifest().get(self.dataset, {}).get('version', 0)
+
+    def log_loc(self, version):
+        return self.feed_dir / self.dataset / '{0:08d}.json'.format(version)
+
+    def pending_loc(self):
+        return self.feed_dir / self.dataset / 'pending.csv'
+
+    def begin(self, path):
+        '''
+        Keeps the file at path as the base the next record() diffs against,
+        unless a run that was never recorded already left one
+        '''
+        pending = self.pending_loc()
+        if pending.is_file() or not pathlib.Path(path).is_file():
+            return self
+        pending.parent.mkdir(parents=True, exist_ok=True)
+        tmp = '{0}.tmp'.format(pending)
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, pending)
+        return self
+
+    def as_written(self, df, index=False):
+        '''
+        The frame as strings, the way it reads back from its csv
+        '''
+        return pd.read_csv(
+            io.StringIO(df.to_csv(index=index)), dtype=str,
+            keep_default_na=False, index_col=0 if index else None
+        )
+
+    def read_existing(self, path, index=False):
+        try:
+            return pd.read_csv(
+                path, dtype=str, keep_default_na=False,
+                index_col=0 if index else None
+            )
+        except:
+            return None
+
+    def diff(self, old, new):
+        '''
+        Inserted, updated and removed rows between two frames of strings
+        '''
+        new = new.drop_duplicates(subset=[self.key]).set_index(self.key)
+        if old is None:
+            old = pd.DataFrame(columns=new.columns, index=pd.Index([], name=self.key))
+        else:
+            old = old.drop_duplicates(subset=[self.key]).set_index(self.key)
+        cols = list(new.columns) + [c for c in old.columns if c not in new.columns]
+        inserted = new.index.difference(old.index, sort=False)
+        removed = old.index.difference(new.index, sort=False)
+        common = new.index.intersection(old.index, sort=False)
+        ## columns added or dropped compare against '' ##
+        before = old.reindex(index=common, columns=cols, fill_value='').to_numpy()
+        after = new.reindex(index=common, columns=cols, fill_value='').to_numpy()
+        changed = before != after
+        ## numbers compare by value ##
+        for j in numpy.flatnonzero(changed.any(axis=0)):
+            old_values = pd.to_numeric(pd.Series(before[:, j]), errors='coerce').to_numpy(dtype='float64')
+            new_values = pd.to_numeric(pd.Series(after[:, j]), errors='coerce').to_numpy(dtype='float64')
+            changed[:, j] &= ~numpy.isclose(
+                old_values, new_values, rtol=TOLERANCE, atol=TOLERANCE
+            )
+        rows = numpy.flatnonzero(changed.any(axis=1))
+        return {
+            'inserted' : [
+                {'key' : k, 'values' : values}
+                for k, values in zip(inserted, new.loc[inserted].to_dict('records'))
+            ],
+            'updated' : [
+                {'key' : common[i], 'changes' : {
+                    cols[j] : [before[i, j], after[i, j]]
+                    for j in numpy.flatnonzero(changed[i])
+                }}
+                for i in rows
+            ],
+            'removed' : [{'key' : k} for k in removed],
+            'columns_added' : [c for c in new.columns if c not in old.columns],
+            'columns_removed' : [c for c in old.columns if c not in new.columns],
+        }
+
+    def record(self, path, df, index=False):
+        '''
+        Records the changes from the file at path (or the base kept by
+        begin()) to df, which is about to be written there (index as passed
+        to to_csv). Returns the change log, or None if nothing changed
+        '''
+        pending = self.pending_loc()
+        base = pending if pending.is_file() else path
+        changes = self.diff(self.read_existing(base, index), self.as_written(df, index))
+        if (
+            len(changes['inserted']) == 0 and len(changes['updated']) == 0 and
+            len(changes['removed']) == 0 and len(changes['columns_added']) == 0 and
+            len(changes['columns_removed']) == 0
+        ):
+            pending.unlink(missing_ok=True)
+            return None
+        manifest = self.load_manifest()
+        entry = manifest.get(self.dataset, {})
+        version = entry.get('version', 0) + 1
+        log = {
+            'dataset' : self.dataset,
+            'key' : self.key,
+            'version' : version,
+            'previous_version' : version - 1,
+            'created_at' : datetime.datetime.now().isoformat(),
+            **changes
+        }
+        (self.feed_dir / self.dataset).mkdir(parents=True, exist_ok=True)
+        with open(self.log_loc(version), 'w') as f:
+            json.dump(log, f)
+        manifest[self.dataset] = {
+            'version' : version,
+            'updated_at' : log['created_at'],
+            'rows' : len(df),
+            'oldest' : max(entry.get('oldest', 1), version - self.keep + 1),
+        }
+        self.save_manifest(manifest)
+        pending.unlink(missing_ok=True)
+        self.prune(manifest[self.dataset]['oldest'])
+        print('     {0} version {1}: {2} inserted, {3} updated, {4} removed'.format(
+            self.dataset, version, len(changes['inserted']),
+            len(changes['updated']), len(changes['removed'])
+        ))
+        return log
+
+    def prune(self, oldest):
+        for path in (self.feed_dir / self.dataset).glob('*.json'):
+            if int(path.stem) < oldest:
+                path.unlink()
+
+    def since(self, version):
+        '''
+        Change logs after version, in order. None if some of them have been
+        pruned, in which case the consumer has to reload the dataset
+        '''
+        entry = self.load_manifest().get(self.dataset, {})
+        current = entry.get('version', 0)
+        if version >= current:
+            return []
+        if version + 1 < entry.get('oldest', 1):
+            return None
+        logs = []
+        for v in range(version + 1, current + 1):
+            with open(self.log_loc(v)) as f:
+                logs.append(json.load(f))
+        return logs
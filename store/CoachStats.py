@@ -0,0 +1,151 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+
+from .columnar import parse_teams, parse_id_list, TREE_COLUMNS
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+class CoachStats:
+    '''
+    Read only, in memory store of the compiled coach stats with prebuilt
+    indexes. Lookups by name, pfr id, team and active status are dict or
+    array lookups, and top n queries read from sort orders computed once
+    per metric.
+
+    Records are returned as "coach cards" (dicts with teams and the coaching
+    tree parsed into lists). They are shared across calls, so callers should
+    copy before mutating
+    '''
+
+    def __init__(self, df=None, coach_meta=None):
+        ## load compiled stats ##
+        if df is None or isinstance(df, (str, pathlib.Path)):
+            df = pd.read_csv(
+                df if df is not None else '{0}/coaches.csv'.format(package_loc)
+            )
+        self.df = df.reset_index(drop=True)
+        ## older outputs do not carry the pfr id, so join it from meta ##
+        if 'pfr_coach_id' not in self.df.columns:
+            self.df['pfr_coach_id'] = self.df['coach'].map(
+                self.load_id_map(coach_meta)
+            )
+        ## records ##
+        self.records = self.df.to_dict('records')
+        for record in self.records:
+            record['teams'] = parse_teams(record.get('teams')) or []
+            for col in TREE_COLUMNS:
+                record[col] = parse_id_list(record.get(col)) or []
+        ## indexes ##
+        self.name_index = {}
+        self.id_index = {}
+        self.team_index = {}
+        for i, record in enumerate(self.records):
+            self.name_index.setdefault(record['coach'], i)
+            if not pd.isnull(record['pfr_coach_id']):
+                self.id_index.setdefault(record['pfr_coach_id'], i)
+            for team in record['teams']:
+                self.team_index.setdefault(team['team'], []).append(i)
+        self.active_index = numpy.flatnonzero(
+            self.df['is_active'].to_numpy() == 1
+        )
+        ## metric sort orders are built on first use ##
+        self.sort_orders = {}
+
+    def load_id_map(self, coach_meta=None):
+        '''
+        Map of pfr coach name to id from the coach meta table
+        '''
+        if coach_meta is None or isinstance(coach_meta, (str, pathlib.Path)):
+            coach_meta = pd.read_csv(
+                coach_meta if coach_meta is not None else
+                '{0}/coaches/coach_meta.csv'.format(package_loc),
+                index_col=0
+            )
+        meta = coach_meta.groupby(['pfr_coach_name']).head(1)
+        return dict(zip(meta['pfr_coach_name'], meta['pfr_coach_id']))
+
+    def get(self, coach):
+        '''
+        Coach card by nflfastR / pfr coach name
+        '''
+        i = self.name_index.get(coach)
+        return None if i is None else self.records[i]
+
+    def get_by_id(self, pfr_coach_id):
+        '''
+        Coach card by pfr coach id
+        '''
+        i = self.id_index.get(pfr_coach_id)
+        return None if i is None else self.records[i]
+
+    def by_team(self, team, active_only=False):
+        '''
+        Coach cards for every coach who coached a team
+        '''
+        idx = self.team_index.get(team, [])
+        if active_only:
+            idx = [i for i in idx if self.records[i]['is_active'] == 1]
+        return [self.records[i] for i in idx]
+
+    def active(self):
+        '''
+        Coach cards for active coaches
+        '''
+        return [self.records[i] for i in self.active_index]
+
+    def sort_order(self, metric, ascending=False):
+        '''
+        Row order for a metric with nulls dropped, along with the sort keys
+        (values, negated when descending) which are always increasing.
+        Cached per metric and direction
+        '''
+        key = (metric, ascending)
+        if key not in self.sort_orders:
+            if metric not in self.df.columns:
+                raise Exception('COACH STATS ERROR: {0} is not a column'.format(metric))
+            keys = self.df[metric].to_numpy(dtype='float64')
+            keys = keys if ascending else -keys
+            order = numpy.argsort(keys, kind='stable')
+            ## argsort puts nan last ##
+            order = order[~numpy.isnan(keys[order])]
+            self.sort_orders[key] = (order, keys[order])
+        return self.sort_orders[key]
+
+    def top(self, metric, n=10, ascending=False, min_games=None, active_only=False):
+        '''
+        Top n coach cards by a metric, optionally requiring a minimum number
+        of games or active status
+        '''
+        order, keys = self.sort_order(metric, ascending)
+        if min_games is None and not active_only:
+            return [self.records[i] for i in order[:n]]
+        results = []
+        for i in order:
+            record = self.records[i]
+            if min_games is not None and not record['games'] >= min_games:
+                continue
+            if active_only and record['is_active'] != 1:
+                continue
+            results.append(record)
+            if len(results) >= n:
+                break
+        return results
+
+    def rank(self, coach, metric, ascending=False):
+        '''
+        1 based rank of a coach by a metric, or None if the coach or their
+        value is missing. Ties share the best rank
+        '''
+        i = self.name_index.get(coach)
+        if i is None:
+            return None
+        order, keys = self.sort_order(metric, ascending)
+        value = self.df[metric].iat[i]
+        if pd.isnull(value):
+            return None
+        ## binary search on the increasing sort keys ##
+        return int(numpy.searchsorted(
+            keys, value if ascending else -value, side='left'
+        )) + 1
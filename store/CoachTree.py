@@ -0,0 +1,238 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+
+from .columnar import parse_id_list
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+class CoachTree:
+    '''
+    Coaching tree compiled from the pfr_coach_tree_hired_by and
+    pfr_coach_tree_hired fields of coach_meta.csv.
+
+    Every pfr coach id gets a stable integer code and mentor -> protege edges
+    are stored as CSR arrays (indptr / indices) in both directions, so
+    traversals are array slices instead of string parsing. Each edge also
+    remembers the meta row it came from, which lets update() re-parse only
+    the rows whose tree fields changed
+    '''
+
+    def __init__(self, coach_meta=None):
+        if coach_meta is None or isinstance(coach_meta, (str, pathlib.Path)):
+            coach_meta = pd.read_csv(
+                coach_meta if coach_meta is not None else
+                '{0}/coaches/coach_meta.csv'.format(package_loc),
+                index_col=0
+            )
+        ## node codes ##
+        self.ids = []
+        self.codes = {}
+        self.names = {}
+        ## edge list, one entry per edge per owning row ##
+        self.edge_src = numpy.zeros(0, dtype='int32')
+        self.edge_dst = numpy.zeros(0, dtype='int32')
+        self.edge_owner = numpy.zeros(0, dtype='int32')
+        ## tree fields each row was last parsed from ##
+        self.row_fields = {}
+        ## metric arrays aligned to codes, built on first use ##
+        self.metric_values = {}
+        self.metric_source = None
+        self.update(coach_meta)
+
+    def code(self, pfr_coach_id):
+        '''
+        Integer code for an id, assigning a new one if needed
+        '''
+        if pfr_coach_id not in self.codes:
+            self.codes[pfr_coach_id] = len(self.ids)
+            self.ids.append(pfr_coach_id)
+        return self.codes[pfr_coach_id]
+
+    def row_edges(self, pfr_coach_id, hired_by, hired):
+        '''
+        Mentor -> protege edges contributed by one meta row
+        '''
+        node = self.code(pfr_coach_id)
+        edges = []
+        for mentor in parse_id_list(hired_by) or []:
+            edges.append((self.code(mentor), node))
+        for protege in parse_id_list(hired) or []:
+            edges.append((node, self.code(protege)))
+        return edges
+
+    def update(self, coach_meta):
+        '''
+        Re-parse rows whose tree fields changed (or that were added or removed)
+        and rebuild the CSR arrays. Returns the number of rows re-parsed
+        '''
+        fields = {}
+        for row in coach_meta[[
+            'pfr_coach_id', 'pfr_coach_name',
+            'pfr_coach_tree_hired_by', 'pfr_coach_tree_hired'
+        ]].itertuples(index=False):
+            if pd.isnull(row.pfr_coach_id):
+                continue
+            self.names[row.pfr_coach_id] = row.pfr_coach_name
+            fields[row.pfr_coach_id] = (
+                None if pd.isnull(row.pfr_coach_tree_hired_by) else row.pfr_coach_tree_hired_by,
+                None if pd.isnull(row.pfr_coach_tree_hired) else row.pfr_coach_tree_hired
+            )
+        ## in coach_meta order, then removed rows, so codes (and ties
+        ## broken by them) do not depend on set ordering ##
+        changed = [
+            pfr_coach_id for pfr_coach_id in list(fields) + [
+                pfr_coach_id for pfr_coach_id in self.row_fields if pfr_coach_id not in fields
+            ]
+            if fields.get(pfr_coach_id) != self.row_fields.get(pfr_coach_id)
+        ]
+        if len(changed) == 0:
+            return 0
+        ## drop edges owned by changed rows ##
+        keep = ~numpy.isin(
+            self.edge_owner,
+            [self.code(pfr_coach_id) for pfr_coach_id in changed]
+        )
+        src = [self.edge_src[keep]]
+        dst = [self.edge_dst[keep]]
+        owner = [self.edge_owner[keep]]
+        ## add edges from their current fields ##
+        for pfr_coach_id in changed:
+            if pfr_coach_id not in fields:
+                self.row_fields.pop(pfr_coach_id, None)
+                continue
+            self.row_fields[pfr_coach_id] = fields[pfr_coach_id]
+            edges = self.row_edges(pfr_coach_id, *fields[pfr_coach_id])
+            if len(edges) > 0:
+                edges = numpy.array(edges, dtype='int32')
+                src.append(edges[:, 0])
+                dst.append(edges[:, 1])
+                owner.append(numpy.full(len(edges), self.codes[pfr_coach_id], dtype='int32'))
+        self.edge_src = numpy.concatenate(src)
+        self.edge_dst = numpy.concatenate(dst)
+        self.edge_owner = numpy.concatenate(owner)
+        self.build_csr()
+        self.metric_values = {}
+        return len(changed)
+
+    def build_csr(self):
+        '''
+        Build child and parent CSR arrays from the unique edges
+        '''
+        n = len(self.ids)
+        ## both rows of a mentor / protege pair usually list the same edge ##
+        pairs = numpy.unique(
+            self.edge_src.astype('int64') * n + self.edge_dst,
+        )
+        src = (pairs // n).astype('int32')
+        dst = (pairs % n).astype('int32')
+        self.children_indptr, self.children = self.csr(src, dst, n)
+        self.parents_indptr, self.parents = self.csr(dst, src, n)
+
+    def csr(self, rows, cols, n):
+        order = numpy.argsort(rows, kind='stable')
+        indptr = numpy.zeros(n + 1, dtype='int64')
+        indptr[1:] = numpy.cumsum(numpy.bincount(rows, minlength=n))
+        return indptr, cols[order]
+
+    def expand(self, indptr, indices, frontier):
+        '''
+        All neighbors of the frontier codes in one vectorized gather
+        '''
+        starts = indptr[frontier]
+        lens = indptr[frontier + 1] - starts
+        total = lens.sum()
+        if total == 0:
+            return numpy.zeros(0, dtype=indices.dtype)
+        offsets = numpy.repeat(starts - numpy.cumsum(lens) + lens, lens) + numpy.arange(total)
+        return indices[offsets]
+
+    def traverse(self, pfr_coach_id, indptr, indices, depth=None):
+        '''
+        Breadth first traversal returning an array of depths by code, with
+        -1 for unreached nodes
+        '''
+        depths = numpy.full(len(self.ids), -1, dtype='int32')
+        if pfr_coach_id not in self.codes:
+            return depths
+        frontier = numpy.array([self.codes[pfr_coach_id]])
+        depths[frontier] = 0
+        level = 0
+        while len(frontier) > 0 and (depth is None or level < depth):
+            level += 1
+            nxt = numpy.unique(self.expand(indptr, indices, frontier))
+            frontier = nxt[depths[nxt] < 0]
+            depths[frontier] = level
+        return depths
+
+    def to_ids(self, depths):
+        codes = numpy.flatnonzero(depths > 0)
+        codes = codes[numpy.argsort(depths[codes], kind='stable')]
+        return {self.ids[c] : int(depths[c]) for c in codes}
+
+    def descendants(self, pfr_coach_id, depth=None):
+        '''
+        Coaches hired by the coach, and by those coaches, etc, up to depth
+        levels. Returns {pfr_coach_id : depth} ordered by depth
+        '''
+        return self.to_ids(
+            self.traverse(pfr_coach_id, self.children_indptr, self.children, depth)
+        )
+
+    def ancestors(self, pfr_coach_id, depth=None):
+        '''
+        Coaches the coach worked for, and who they worked for, etc, up to
+        depth levels. Returns {pfr_coach_id : depth} ordered by depth
+        '''
+        return self.to_ids(
+            self.traverse(pfr_coach_id, self.parents_indptr, self.parents, depth)
+        )
+
+    def lowest_common_mentor(self, pfr_coach_id_a, pfr_coach_id_b, depth=None):
+        '''
+        The shared ancestor closest to both coaches (smallest of the two
+        depths, then smallest total depth, then first in coach_meta), or None
+        '''
+        a = self.traverse(pfr_coach_id_a, self.parents_indptr, self.parents, depth)
+        b = self.traverse(pfr_coach_id_b, self.parents_indptr, self.parents, depth)
+        common = numpy.flatnonzero((a > 0) & (b > 0))
+        if len(common) == 0:
+            return None
+        best = numpy.lexsort((
+            a[common] + b[common],
+            numpy.maximum(a[common], b[common])
+        ))[0]
+        return self.ids[common[best]]
+
+    def metric_array(self, stats, metric):
+        '''
+        Values of a compiled stats metric aligned to codes (0 where missing).
+        stats is a frame with pfr_coach_id or a CoachStats store
+        '''
+        if stats is not self.metric_source:
+            self.metric_values = {}
+            self.metric_source = stats
+        if metric not in self.metric_values:
+            df = getattr(stats, 'df', stats)
+            df = df[~pd.isnull(df['pfr_coach_id'])]
+            values = numpy.zeros(len(self.ids), dtype='float64')
+            codes = df['pfr_coach_id'].map(self.codes)
+            found = ~pd.isnull(codes)
+            values[codes[found].astype('int64').to_numpy()] = numpy.nan_to_num(
+                df.loc[found, metric].to_numpy(dtype='float64')
+            )
+            self.metric_values[metric] = values
+        return self.metric_values[metric]
+
+    def tree_stats(self, pfr_coach_id, stats, metrics=('games', 'wins'), depth=None, include_root=False):
+        '''
+        Totals of compiled stats metrics over every descendant of a coach,
+        ie total wins of all coaches descended from Bill Walsh
+        '''
+        depths = self.traverse(pfr_coach_id, self.children_indptr, self.children, depth)
+        codes = numpy.flatnonzero(depths >= 0 if include_root else depths > 0)
+        totals = {'coaches' : int(len(codes))}
+        for metric in metrics:
+            totals[metric] = float(self.metric_array(stats, metric)[codes].sum())
+        return totals
@@ -0,0 +1,5 @@
+from .columnar import load_coaches, load_coach_meta, write_columnar
+from .readers import read_coaches, read_coach_meta
+from .CoachStats import CoachStats
+from .CoachTree import CoachTree
+from .ChangeFeed import ChangeFeed
\ No newline at end of file
@@ -0,0 +1,163 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+import json
+import ast
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+## column types, everything not listed is inferred ##
+COUNT_COLUMNS = [
+    'seasons', 'games', 'wins', 'losses', 'ties', 'playoff_births',
+    'games_playoff', 'wins_playoff', 'losses_playoff', 'ties_playoff',
+    'games_superbowl', 'wins_superbowl'
+]
+STRING_COLUMNS = [
+    'coach', 'pfr_coach_id', 'pfr_coach_name', 'pfr_coach_image_url'
+]
+TREE_COLUMNS = [
+    'pfr_coach_tree_hired_by', 'pfr_coach_tree_hired'
+]
+FORMATS = {
+    'parquet' : 'parquet',
+    'arrow' : 'arrow',
+}
+
+def require_pyarrow():
+    '''
+    pyarrow is an optional dependency only needed for columnar output
+    '''
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        raise Exception('COLUMNAR ERROR: pyarrow is required for parquet / arrow output. Install it with pip install pyarrow')
+    return pyarrow
+
+def parse_teams(value):
+    '''
+    Parses the teams field, which is a list of json strings in memory and the
+    string repr of that list once it has been through csv, into a list of
+    {'team', 'color'} dicts
+    '''
+    if isinstance(value, str):
+        value = ast.literal_eval(value)
+    if not isinstance(value, (list, tuple, numpy.ndarray)):
+        return None
+    teams = []
+    for team in value:
+        if isinstance(team, str):
+            team = json.loads(team)
+        teams.append({
+            'team' : team.get('team'),
+            'color' : team.get('color'),
+        })
+    return teams
+
+def parse_id_list(value):
+    '''
+    Parses a comma joined string of pfr coach ids into a list
+    '''
+    if isinstance(value, (list, tuple, numpy.ndarray)):
+        return list(value)
+    if not isinstance(value, str) or value == '':
+        return None
+    return value.split(',')
+
+def column_type(pa, col):
+    '''
+    Arrow type for a known column, or None to infer it
+    '''
+    if col in COUNT_COLUMNS:
+        return pa.int32()
+    if col == 'is_active':
+        return pa.bool_()
+    if col in STRING_COLUMNS:
+        return pa.string()
+    if col in TREE_COLUMNS:
+        return pa.list_(pa.string())
+    if col == 'teams':
+        return pa.list_(pa.struct([
+            ('team', pa.string()),
+            ('color', pa.string()),
+        ]))
+    if col == 'pfr_coach_last_checked':
+        return pa.date32()
+    return None
+
+def to_arrow_table(df):
+    '''
+    Convert a coaches or coach meta frame into a typed arrow table
+    '''
+    pa = require_pyarrow()
+    arrays = []
+    fields = []
+    for col in df.columns:
+        values = df[col]
+        typ = column_type(pa, col)
+        if col == 'teams':
+            arr = pa.array([parse_teams(v) for v in values], type=typ)
+        elif col in TREE_COLUMNS:
+            arr = pa.array([parse_id_list(v) for v in values], type=typ)
+        elif col == 'pfr_coach_last_checked':
+            arr = pa.array(
+                pd.to_datetime(values, errors='coerce').dt.date,
+                type=typ, from_pandas=True
+            )
+        elif col == 'is_active':
+            arr = pa.array(values == 1, type=typ)
+        elif typ is not None:
+            ## counts can come through as floats after the deltas ##
+            arr = pa.array(values, from_pandas=True).cast(typ)
+        else:
+            arr = pa.array(values, from_pandas=True)
+        arrays.append(arr)
+        fields.append(pa.field(col, arr.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+def write_columnar(df, path, fmt='parquet'):
+    '''
+    Write a coaches or coach meta frame as parquet or arrow ipc
+    '''
+    if fmt not in FORMATS:
+        raise Exception('COLUMNAR ERROR: Unknown format {0}. Options are {1}'.format(
+            fmt, ', '.join(FORMATS.keys())
+        ))
+    pa = require_pyarrow()
+    table = to_arrow_table(df)
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, path)
+    else:
+        pa.feather.write_feather(table, path, compression='uncompressed')
+
+def read_columnar(path, columns=None, as_arrow=False):
+    '''
+    Read a file written by write_columnar, picking the reader by extension
+    '''
+    pa = require_pyarrow()
+    if str(path).endswith('.parquet'):
+        table = pa.parquet.read_table(path, columns=columns)
+    else:
+        ## uncompressed ipc can be memory mapped ##
+        table = pa.feather.read_table(path, columns=columns, memory_map=True)
+    return table if as_arrow else table.to_pandas()
+
+def load_coaches(path=None, fmt='parquet', columns=None, as_arrow=False):
+    '''
+    Load compiled coach stats written alongside coaches.csv. teams is a
+    list of {'team', 'color'} structs and the coaching tree fields are
+    lists of pfr coach ids
+    '''
+    if path is None:
+        path = '{0}/coaches.{1}'.format(package_loc, FORMATS[fmt])
+    return read_columnar(path, columns=columns, as_arrow=as_arrow)
+
+def load_coach_meta(path=None, fmt='parquet', columns=None, as_arrow=False):
+    '''
+    Load coach meta written alongside coaches/coach_meta.csv
+    '''
+    if path is None:
+        path = '{0}/coaches/coach_meta.{1}'.format(package_loc, FORMATS[fmt])
+    return read_columnar(path, columns=columns, as_arrow=as_arrow)
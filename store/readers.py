@@ -0,0 +1,35 @@
+## packages ##
+import pandas as pd
+import pathlib
+
+from .columnar import parse_teams, parse_id_list, TREE_COLUMNS
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+def read_coaches(path=None, columns=None, parse=False):
+    '''
+    Reads the shipped coaches.csv, or only columns of it. Needs nothing but
+    pandas. With parse=True, teams and the coaching tree fields are parsed
+    into lists (see columnar.parse_teams and parse_id_list)
+    '''
+    df = pd.read_csv(
+        path if path is not None else '{0}/coaches.csv'.format(package_loc),
+        usecols=columns
+    )
+    if parse:
+        if 'teams' in df.columns:
+            df['teams'] = df['teams'].map(parse_teams)
+        for col in TREE_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].map(parse_id_list)
+    return df
+
+def read_coach_meta(path=None, columns=None):
+    '''
+    Reads the shipped coaches/coach_meta.csv, or only columns of it
+    '''
+    df = pd.read_csv(
+        path if path is not None else '{0}/coaches/coach_meta.csv'.format(package_loc),
+        index_col=0
+    )
+    return df if columns is None else df[columns]
@@ -0,0 +1,65 @@
+## packages ##
+import pandas as pd
+
+from ..store.ChangeFeed import ChangeFeed
+
+def frame(values):
+    return pd.DataFrame({
+        'coach' : ['A', 'B', 'C'],
+        'wins' : [10.0, 20.0, 30.0],
+        'ats_roi' : values,
+        'teams' : ['x', 'y', 'z'],
+    })
+
+def write(df, path):
+    df.to_csv(path, index=False)
+
+def test_float_noise_is_not_a_change(tmp_path):
+    path = tmp_path / 'coaches.csv'
+    feed = ChangeFeed('coaches', 'coach', feed_dir=tmp_path / 'changes')
+    write(frame([0.1 + 0.2, -0.05, 0.0]), path)
+    assert feed.record(path, frame([0.3, -0.05 + 1e-17, 1e-16])) is None
+    assert feed.version() == 0
+
+def test_changes_are_logged_by_key(tmp_path):
+    path = tmp_path / 'coaches.csv'
+    feed = ChangeFeed('coaches', 'coach', feed_dir=tmp_path / 'changes')
+    old = frame([0.1, 0.2, 0.3])
+    write(old, path)
+    new = frame([0.1, 0.25, 0.3]).iloc[[1, 0]]
+    new.loc[1, 'teams'] = 'w'
+    log = feed.record(path, new)
+    assert feed.version() == 1
+    assert log['updated'] == [
+        {'key' : 'B', 'changes' : {'ats_roi' : ['0.2', '0.25'], 'teams' : ['y', 'w']}}
+    ]
+    assert log['removed'] == [{'key' : 'C'}]
+    assert feed.since(0) == [log]
+    assert feed.since(1) == []
+
+def test_run_with_checkpoints_is_one_version(tmp_path):
+    path = tmp_path / 'coaches.csv'
+    feed = ChangeFeed('coaches', 'coach', feed_dir=tmp_path / 'changes')
+    write(frame([0.1, 0.2, 0.3]), path)
+    feed.begin(path)
+    ## checkpoints write without recording ##
+    write(frame([0.5, 0.2, 0.3]), path)
+    ## a run that dies keeps the base from before it ##
+    ChangeFeed('coaches', 'coach', feed_dir=tmp_path / 'changes').begin(path)
+    write(frame([0.5, 0.6, 0.3]), path)
+    log = feed.record(path, frame([0.5, 0.6, 0.7]))
+    assert feed.version() == 1
+    assert [row['key'] for row in log['updated']] == ['A', 'B', 'C']
+    assert not feed.pending_loc().exists()
+
+def test_pruned_logs_need_a_reload(tmp_path):
+    path = tmp_path / 'coaches.csv'
+    feed = ChangeFeed('coaches', 'coach', feed_dir=tmp_path / 'changes', keep=2)
+    write(frame([0.0, 0.0, 0.0]), path)
+    for i in range(1, 5):
+        df = frame([float(i), 0.0, 0.0])
+        feed.record(path, df)
+        write(df, path)
+    assert feed.version() == 4
+    assert [log['version'] for log in feed.since(2)] == [3, 4]
+    assert feed.since(1) is None
@@ -0,0 +1,87 @@
+import numpy
+import pandas as pd
+
+from ..store.CoachTree import CoachTree
+
+def fixture_meta():
+    '''
+    Small coach_meta with edges listed from one or both ends. Tomlin and
+    Frazier both worked for Dungy and Billick, a tie for their mentor
+    '''
+    rows = [
+        ('WalsBi0', 'Bill Walsh', None, 'HolmMi0,SeifGe0'),
+        ('SeifGe0', 'George Seifert', 'WalsBi0', None),
+        ('HolmMi0', 'Mike Holmgren', 'WalsBi0', 'ReidAn0,GrudJo0'),
+        ('ReidAn0', 'Andy Reid', 'HolmMi0', 'PedeDo0'),
+        ('GrudJo0', 'Jon Gruden', 'HolmMi0,SeifGe0', None),
+        ('PedeDo0', 'Doug Pederson', None, 'SiriNi0'),
+        ('DungTo0', 'Tony Dungy', None, 'TomlMi0,FrazLe0'),
+        ('BillBr0', 'Brian Billick', None, None),
+        ('TomlMi0', 'Mike Tomlin', 'BillBr0,DungTo0', None),
+        ('FrazLe0', 'Leslie Frazier', 'BillBr0', None),
+    ]
+    return pd.DataFrame(rows, columns=[
+        'pfr_coach_id', 'pfr_coach_name', 'pfr_coach_tree_hired_by', 'pfr_coach_tree_hired'
+    ])
+
+def test_descendants_and_ancestors():
+    tree = CoachTree(fixture_meta())
+    assert tree.descendants('WalsBi0') == {
+        'HolmMi0' : 1, 'SeifGe0' : 1, 'ReidAn0' : 2, 'GrudJo0' : 2,
+        'PedeDo0' : 3, 'SiriNi0' : 4
+    }
+    ## ordered by depth, then coach_meta order ##
+    assert list(tree.descendants('WalsBi0')) == [
+        'SeifGe0', 'HolmMi0', 'ReidAn0', 'GrudJo0', 'PedeDo0', 'SiriNi0'
+    ]
+    assert tree.descendants('WalsBi0', depth=2) == {
+        'HolmMi0' : 1, 'SeifGe0' : 1, 'ReidAn0' : 2, 'GrudJo0' : 2
+    }
+    ## Gruden is reached through both mentors, at the shorter depth ##
+    assert tree.ancestors('GrudJo0') == {'HolmMi0' : 1, 'SeifGe0' : 1, 'WalsBi0' : 2}
+    assert tree.ancestors('SiriNi0', depth=1) == {'PedeDo0' : 1}
+    assert tree.descendants('NotACoach') == {}
+
+def test_update_reparses_changed_rows():
+    meta = fixture_meta()
+    tree = CoachTree(meta)
+    assert tree.update(meta) == 0
+    ## Reid hires Sirianni directly ##
+    meta.loc[meta['pfr_coach_id'] == 'ReidAn0', 'pfr_coach_tree_hired'] = 'PedeDo0,SiriNi0'
+    assert tree.update(meta) == 1
+    assert tree.descendants('HolmMi0')['SiriNi0'] == 2
+    ## edges only listed by a removed row go with it ##
+    meta = meta[meta['pfr_coach_id'] != 'PedeDo0']
+    assert tree.update(meta) == 1
+    assert tree.descendants('PedeDo0') == {}
+    assert tree.ancestors('SiriNi0') == {'ReidAn0' : 1, 'HolmMi0' : 2, 'WalsBi0' : 3}
+    ## and match a tree built from scratch ##
+    fresh = CoachTree(meta)
+    for pfr_coach_id in meta['pfr_coach_id']:
+        assert tree.descendants(pfr_coach_id) == fresh.descendants(pfr_coach_id)
+        assert tree.ancestors(pfr_coach_id) == fresh.ancestors(pfr_coach_id)
+
+def test_lowest_common_mentor():
+    tree = CoachTree(fixture_meta())
+    ## the closer mentor wins over the root ##
+    assert tree.lowest_common_mentor('ReidAn0', 'GrudJo0') == 'HolmMi0'
+    assert tree.lowest_common_mentor('PedeDo0', 'SeifGe0') == 'WalsBi0'
+    ## smallest of the two depths before the total ##
+    assert tree.lowest_common_mentor('SiriNi0', 'GrudJo0') == 'HolmMi0'
+    ## tied mentors go to the first in coach_meta ##
+    assert tree.lowest_common_mentor('TomlMi0', 'FrazLe0') == 'DungTo0'
+    assert tree.lowest_common_mentor('TomlMi0', 'ReidAn0') is None
+
+def test_tree_stats():
+    tree = CoachTree(fixture_meta())
+    stats = pd.DataFrame({
+        'pfr_coach_id' : ['WalsBi0', 'HolmMi0', 'ReidAn0', 'GrudJo0', None],
+        'games' : [152, 280, 400, 250, 10],
+        'wins' : [92, 161, 270, 117, numpy.nan],
+    })
+    assert tree.tree_stats('WalsBi0', stats) == {
+        'coaches' : 6, 'games' : 930.0, 'wins' : 548.0
+    }
+    assert tree.tree_stats('WalsBi0', stats, metrics=('wins',), depth=1, include_root=True) == {
+        'coaches' : 3, 'wins' : 253.0
+    }
@@ -0,0 +1,167 @@
+## packages ##
+import pandas as pd
+import numpy
+import pathlib
+
+from ..stats.StatCompiler import StatCompiler
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+def add_deltas_iterrows(df, deltas):
+    '''
+    The original row by row add_deltas_to_games, kept as the reference the
+    merge based version has to match
+    '''
+    ## make sure whitespace is removed ##
+    deltas['coach'] = deltas['coach'].str.strip()
+    ## if coach is in DF, then add delta from fields ##
+    ## if coach is not in df then add to new record ##
+    existing = []
+    ## missing ##
+    missing = []
+    for index, row in deltas.iterrows():
+        coach = row['coach']
+        existing_rec = df[df['coach'] == coach]
+        if len(existing_rec) == 0:
+            missing.append({
+                'coach': coach,
+                'seasons' : row['seasons'],
+                'is_active' : 0,
+                'games' : row['games'],
+                'wins' : row['wins'],
+                'losses' : row['losses'],
+                'ties' : row['ties'],
+                'playoff_births' : row['playoff_births'],
+                'games_playoff' : row['games_playoff'],
+                'wins_playoff' : row['wins_playoff'],
+                'losses_playoff' : row['losses_playoff'],
+                'ties_playoff' : 0,
+                'games_superbowl' : row['games_superbowl'],
+                'wins_superbowl' : row['wins_superbowl'],
+                'ats_pct' : numpy.nan,
+                'ats_return' : numpy.nan,
+                'ats_risked' : numpy.nan,
+                'avg_pf' : numpy.nan,
+                'avg_pa' : numpy.nan,
+                'avg_margin' : numpy.nan,
+                'avg_spread' : numpy.nan,
+                'ats_pct_home' : numpy.nan,
+                'ats_pct_away' : numpy.nan,
+                'ats_pct_playoff' : numpy.nan,
+                'ats_pct_favorite' : numpy.nan,
+                'ats_pct_underdog' : numpy.nan,
+                'ats_pct_div' : numpy.nan,
+                'ats_pct_non_div' : numpy.nan,
+                'ats_pct_bye' : numpy.nan,
+                'ats_pct_dome' : numpy.nan,
+            })
+        else:
+            record = existing_rec.iloc[0]
+            existing.append({
+                'coach': record['coach'],
+                'seasons' : row['seasons'] + record['seasons'],
+                'is_active' : record['is_active'],
+                'games' : row['games'] + record['games'],
+                'wins' : row['wins'] + record['wins'],
+                'losses' : row['losses'] + record['losses'],
+                'ties' : row['ties'] + record['ties'],
+                'playoff_births' : row['playoff_births'] + record['playoff_births'],
+                'games_playoff' : row['games_playoff'] + record['games_playoff'],
+                'wins_playoff' : row['wins_playoff'] + record['wins_playoff'],
+                'losses_playoff' : row['losses_playoff'] + record['losses_playoff'],
+                'ties_playoff' : record['ties_playoff'],
+                'games_superbowl' : row['games_superbowl'] + record['games_superbowl'],
+                'wins_superbowl' : row['wins_superbowl'] + record['wins_superbowl'],
+                'ats_pct' : record['ats_pct'],
+                'ats_return' : record['ats_return'],
+                'ats_risked' : record['ats_risked'],
+                'avg_pf' : record['avg_pf'],
+                'avg_pa' : record['avg_pa'],
+                'avg_margin' : record['avg_margin'],
+                'avg_spread' : record['avg_spread'],
+                'ats_pct_home' : record['ats_pct_home'],
+                'ats_pct_away' : record['ats_pct_away'],
+                'ats_pct_playoff' : record['ats_pct_playoff'],
+                'ats_pct_favorite' : record['ats_pct_favorite'],
+                'ats_pct_underdog' : record['ats_pct_underdog'],
+                'ats_pct_div' : record['ats_pct_div'],
+                'ats_pct_non_div' : record['ats_pct_non_div'],
+                'ats_pct_bye' : record['ats_pct_bye'],
+                'ats_pct_dome' : record['ats_pct_dome'],
+            })
+    ## turn into dfs and merge ##
+    existing_df = pd.DataFrame(existing)
+    missing_df = pd.DataFrame(missing)
+    new_df = pd.concat([existing_df, missing_df])
+    ## add exisint coaches that arent in new ##
+    not_in_new = df[~df['coach'].isin(new_df['coach'])]
+    if len(not_in_new) > 0:
+        new_df = pd.concat([new_df, not_in_new])
+    ## resort ##
+    new_df = new_df.sort_values(
+        by=['wins'],
+        ascending=[False]
+    ).reset_index(drop=True)
+    new_df = new_df.groupby(['coach']).head(1)
+    return new_df
+
+def fastr_records():
+    '''
+    Career records shaped like aggregate_games output before deltas, taken
+    from the shipped coaches.csv
+    '''
+    df = pd.read_csv('{0}/coaches.csv'.format(package_loc))
+    df = df[list(df.columns[:df.columns.get_loc('ats_pct_dome') + 1])].copy()
+    for col in ['is_active', 'ties', 'ties_playoff']:
+        df[col] = df[col].astype('int64')
+    return df.sort_values(by=['wins'], ascending=[False]).reset_index(drop=True)
+
+def shipped_deltas():
+    return pd.read_csv(
+        '{0}/stats/pre_99_coaching_deltas.csv'.format(package_loc),
+        index_col=0
+    )
+
+def test_shipped_deltas_have_duplicate_coaches():
+    ## the duplicate rows below rely on this ##
+    deltas = shipped_deltas()
+    assert (deltas['coach'].str.strip() == 'Jim Mora').sum() == 2
+
+def test_add_deltas_matches_iterrows():
+    compiler = StatCompiler()
+    records = fastr_records()
+    ## all coaches, coaches missing from either side, and a shuffled order ##
+    cases = [
+        records,
+        records.iloc[::2].reset_index(drop=True),
+        records.iloc[1::3].reset_index(drop=True),
+        records[records['coach'] != 'Jim Mora'].reset_index(drop=True),
+        records.sample(frac=1, random_state=7).reset_index(drop=True),
+    ]
+    for df in cases:
+        expected = add_deltas_iterrows(df.copy(), shipped_deltas())
+        result = compiler.add_deltas_to_games(df.copy(), shipped_deltas())
+        assert result.to_csv() == expected.to_csv()
+
+def test_add_deltas_keeps_the_better_duplicate():
+    compiler = StatCompiler()
+    records = fastr_records()
+    for df in [records, records[records['coach'] != 'Jim Mora']]:
+        result = compiler.add_deltas_to_games(df.copy(), shipped_deltas())
+        expected = add_deltas_iterrows(df.copy(), shipped_deltas())
+        assert (result['coach'] == 'Jim Mora').sum() == 1
+        assert (
+            result.loc[result['coach'] == 'Jim Mora', 'wins'].iloc[0] ==
+            expected.loc[expected['coach'] == 'Jim Mora', 'wins'].iloc[0]
+        )
+
+def test_add_deltas_does_not_modify_inputs():
+    compiler = StatCompiler()
+    df = fastr_records()
+    deltas = shipped_deltas()
+    deltas['coach'] = deltas['coach'] + ' '
+    df_before = df.copy()
+    deltas_before = deltas.copy()
+    compiler.add_deltas_to_games(df, deltas)
+    pd.testing.assert_frame_equal(df, df_before)
+    pd.testing.assert_frame_equal(deltas, deltas_before)
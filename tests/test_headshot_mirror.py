@@ -0,0 +1,192 @@
+## packages ##
+import pandas as pd
+import pytest
+import io
+import sys
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from ..coaches.HeadshotMirror import HeadshotMirror
+
+mirror_module = sys.modules[HeadshotMirror.__module__]
+
+def image_bytes(color, size=(200, 300), fmt='JPEG'):
+    '''
+    Encoded image, or placeholder bytes without Pillow
+    '''
+    if mirror_module.Image is None:
+        return '{0}-{1}-{2}'.format(color, size, fmt).encode()
+    buffer = io.BytesIO()
+    mirror_module.Image.new('RGB', size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+class StandIn:
+    '''
+    Local http server standing in for the image hosts. Serves pages as
+    path : (body, content type), answers If-None-Match with a 304 and
+    keeps the paths it was asked for
+    '''
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.conditional = []
+        stand_in = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            def do_GET(self):
+                stand_in.requests.append(self.path)
+                if self.path == '/throttled.jpg':
+                    self.send_response(429)
+                    self.send_header('Retry-After', '30')
+                    self.end_headers()
+                    return
+                if self.path not in stand_in.pages:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body, content_type = stand_in.pages[self.path]
+                etag = '"{0}"'.format(hash(body))
+                if self.headers.get('If-None-Match') is not None:
+                    stand_in.conditional.append(self.path)
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return 'http://127.0.0.1:{0}{1}'.format(self.server.server_port, path)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    server.pages = {
+        '/a.jpg' : (image_bytes('red'), 'image/jpeg'),
+        '/a_copy.jpg' : (image_bytes('red'), 'image/jpeg'),
+        '/b.png' : (image_bytes('blue', (50, 40), 'PNG'), 'image/png'),
+        '/c.jpg' : (image_bytes('green'), 'image/jpeg'),
+        '/block.jpg' : (b'<html>Rate limited request</html>', 'text/html'),
+    }
+    yield server
+    server.stop()
+
+def coach_meta(urls):
+    return pd.DataFrame({
+        'pfr_coach_id' : list(urls.keys()),
+        'pfr_coach_image_url' : list(urls.values()),
+    })
+
+def new_mirror(path):
+    return HeadshotMirror(path, min_interval=0, jitter=0)
+
+def stored_objects(path):
+    return sorted(p.name for p in (path / 'objects').rglob('*.*'))
+
+def test_same_content_is_stored_once(tmp_path, stand_in):
+    mirror = new_mirror(tmp_path)
+    s = mirror.mirror(coach_meta({
+        'A' : stand_in.url('/a.jpg'), 'A2' : stand_in.url('/a_copy.jpg'),
+        'B' : stand_in.url('/b.png'), 'N' : None,
+    }))
+    assert (s['fetched'], s['deduped']) == (2, 1)
+    assert len(stored_objects(tmp_path)) == 2
+    assert mirror.local_path('A') == mirror.local_path('A2')
+    assert mirror.local_path('A').read_bytes() == stand_in.pages['/a.jpg'][0]
+    assert mirror.local_path('N') is None
+
+def test_unchanged_urls_are_not_refetched(tmp_path, stand_in):
+    urls = {'A' : stand_in.url('/a.jpg'), 'B' : stand_in.url('/b.png')}
+    new_mirror(tmp_path).mirror(coach_meta(urls))
+    stand_in.requests = []
+    s = new_mirror(tmp_path).mirror(coach_meta(urls))
+    assert s['unchanged'] == 2
+    assert stand_in.requests == []
+
+def test_force_revalidates_with_a_304(tmp_path, stand_in):
+    urls = {'A' : stand_in.url('/a.jpg'), 'B' : stand_in.url('/b.png')}
+    new_mirror(tmp_path).mirror(coach_meta(urls))
+    ## b changes on the host, a does not ##
+    stand_in.pages['/b.png'] = (image_bytes('yellow', (50, 40), 'PNG'), 'image/png')
+    mirror = new_mirror(tmp_path)
+    s = mirror.mirror(coach_meta(urls), force=True)
+    assert sorted(stand_in.conditional) == ['/a.jpg', '/b.png']
+    assert (s['unchanged'], s['fetched']) == (1, 1)
+    assert mirror.local_path('B').read_bytes() == stand_in.pages['/b.png'][0]
+    ## the old b is no longer used ##
+    assert len(stored_objects(tmp_path)) == 2
+
+def test_changed_url_is_refetched_and_old_image_pruned(tmp_path, stand_in):
+    new_mirror(tmp_path).mirror(coach_meta({
+        'A' : stand_in.url('/a.jpg'), 'B' : stand_in.url('/b.png'),
+    }))
+    stand_in.requests = []
+    mirror = new_mirror(tmp_path)
+    s = mirror.mirror(coach_meta({
+        'A' : stand_in.url('/c.jpg'), 'B' : stand_in.url('/b.png'),
+    }))
+    assert stand_in.requests == ['/c.jpg']
+    assert (s['fetched'], s['unchanged']) == (1, 1)
+    assert mirror.local_path('A').read_bytes() == stand_in.pages['/c.jpg'][0]
+    assert len(stored_objects(tmp_path)) == 2
+
+def test_failures_are_kept_until_the_url_changes(tmp_path, stand_in):
+    urls = {'X' : stand_in.url('/block.jpg'), 'M' : stand_in.url('/missing.jpg')}
+    s = new_mirror(tmp_path).mirror(coach_meta(urls))
+    assert s['failed'] == 2
+    assert stored_objects(tmp_path) == []
+    stand_in.requests = []
+    s = new_mirror(tmp_path).mirror(coach_meta(urls))
+    assert stand_in.requests == []
+    urls['M'] = stand_in.url('/a.jpg')
+    s = new_mirror(tmp_path).mirror(coach_meta(urls))
+    assert stand_in.requests == ['/a.jpg']
+    assert s['fetched'] == 1
+
+def test_throttling_stops_the_run(tmp_path, stand_in):
+    mirror = new_mirror(tmp_path)
+    s = mirror.mirror(coach_meta({
+        'T' : stand_in.url('/throttled.jpg'), 'A' : stand_in.url('/a.jpg'),
+    }))
+    assert s['failed'] == 1
+    assert stand_in.requests == ['/throttled.jpg']
+    assert mirror.local_path('A') is None
+
+def test_thumbnails_fit_each_size(tmp_path, stand_in):
+    pytest.importorskip('PIL')
+    mirror = new_mirror(tmp_path)
+    mirror.mirror(coach_meta({'A' : stand_in.url('/a.jpg'), 'B' : stand_in.url('/b.png')}))
+    for size in [64, 128, 256]:
+        with mirror_module.Image.open(mirror.local_path('A', size)) as img:
+            assert max(img.size) == min(size, 300)
+            assert img.size[0] / img.size[1] == pytest.approx(200 / 300, abs=0.02)
+        ## small images are not upscaled ##
+        with mirror_module.Image.open(mirror.local_path('B', size)) as img:
+            assert img.size == (50, 40)
+
+def test_thumbnails_are_filled_in_without_refetching(tmp_path, stand_in, monkeypatch):
+    pytest.importorskip('PIL')
+    urls = {'A' : stand_in.url('/a.jpg')}
+    with monkeypatch.context() as m:
+        m.setattr(mirror_module, 'Image', None)
+        mirror = new_mirror(tmp_path)
+        mirror.mirror(coach_meta(urls))
+        assert mirror.local_path('A') is not None
+        assert mirror.local_path('A', 64) is None
+    stand_in.requests = []
+    mirror = new_mirror(tmp_path)
+    mirror.mirror(coach_meta(urls))
+    assert stand_in.requests == []
+    assert mirror.local_path('A', 64).is_file()
@@ -0,0 +1,114 @@
+import sys
+import random
+import pytest
+
+from ..coaches.HtmlCache import HtmlCache
+from ..coaches.fetchers import FetchBackend, CachingBackend
+
+cache_module = sys.modules[HtmlCache.__module__]
+
+class Clock:
+    '''
+    Stands in for time in the cache module, advancing a second per call
+    '''
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+def page(name, size=2000):
+    ## random enough not to compress away ##
+    rng = random.Random(name)
+    return ''.join('{0}{1}'.format(name, rng.randrange(9973)) for i in range(size // 5))
+
+def test_size_eviction_drops_least_recently_fetched(tmp_path, clock):
+    cache = HtmlCache(tmp_path)
+    for url in ['a', 'b', 'c']:
+        cache.put(url, page(url))
+    size = cache.get('a')['size']
+    cache.max_bytes = int(size * 3.5)
+    ## a is revalidated, so b is now the oldest ##
+    cache.touch('a')
+    b_object = cache.object_path(cache.get('b')['hash'])
+    cache.put('d', page('d'))
+    assert sorted(cache.index) == ['a', 'c', 'd']
+    assert not b_object.exists()
+    ## a url sharing an object does not count twice ##
+    cache.put('e', page('d'))
+    assert sorted(cache.index) == ['a', 'c', 'd', 'e']
+    cache.put('f', page('f'))
+    assert sorted(cache.index) == ['a', 'd', 'e', 'f']
+    assert cache.read('c') is None and cache.read('e') == page('d')
+
+def test_age_eviction(tmp_path, clock):
+    cache = HtmlCache(tmp_path, max_age=5)
+    cache.put('a', page('a'))
+    clock.now += 10
+    cache.put('b', page('b'))
+    assert list(cache.index) == ['b']
+
+def test_index_is_written_in_batches(tmp_path, clock):
+    cache = HtmlCache(tmp_path, flush_every=3)
+    cache.put('a', page('a'))
+    cache.put('b', page('b'))
+    assert HtmlCache(tmp_path).index == {}
+    cache.put('c', page('c'))
+    assert sorted(HtmlCache(tmp_path).index) == ['a', 'b', 'c']
+    cache.put('d', page('d'))
+    cache.flush()
+    reopened = HtmlCache(tmp_path)
+    assert sorted(reopened.index) == ['a', 'b', 'c', 'd']
+    assert reopened.read('d') == page('d')
+
+class Server(FetchBackend):
+    '''
+    Conditional backend that answers a matching etag with a 304
+    '''
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def fetch_conditional(self, url, etag=None, last_modified=None):
+        self.requests.append((url, etag))
+        html = self.pages[url]
+        tag = '"{0}"'.format(len(html))
+        if etag == tag:
+            return 304, None, etag, last_modified
+        return 200, html, tag, None
+
+    def get_page_html(self, url):
+        return self.fetch_conditional(url)[1]
+
+def test_stale_pages_are_revalidated(tmp_path, clock):
+    server = Server({'a' : page('a')})
+    cache = HtmlCache(tmp_path)
+    fetcher = CachingBackend(server, cache, ttl=5)
+    assert fetcher.get_page_html('a') == page('a')
+    ## fresh, served without a request ##
+    assert fetcher.get_page_html('a') == page('a')
+    assert len(server.requests) == 1
+    ## stale, revalidated with the stored etag and kept ##
+    clock.now += 10
+    fetched_at = cache.get('a')['fetched_at']
+    assert fetcher.get_page_html('a') == page('a')
+    assert server.requests[-1] == ('a', '"{0}"'.format(len(page('a'))))
+    assert cache.get('a')['fetched_at'] > fetched_at
+    ## changed upstream, replaced ##
+    clock.now += 10
+    server.pages['a'] = page('a', 3000)
+    assert fetcher.get_page_html('a') == page('a', 3000)
+    ## a 304 for a body that is gone is refetched unconditionally ##
+    clock.now += 10
+    cache.object_path(cache.get('a')['hash']).unlink()
+    assert fetcher.get_page_html('a') == page('a', 3000)
+    assert server.requests[-1] == ('a', None)
+    fetcher.stop()
+    assert HtmlCache(tmp_path).get('a')['hash'] == cache.get('a')['hash']
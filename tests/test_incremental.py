@@ -0,0 +1,104 @@
+## packages ##
+import pandas as pd
+import pathlib
+
+from ..stats.StatCompiler import StatCompiler
+from ..benchmarks import synthetic
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+def make_games():
+    return synthetic.games(seasons=range(2015, 2025))
+
+def compile_to(output_dir, games, incremental=False, coach_meta=None, deltas=None):
+    '''
+    Runs the compiler on synthetic inputs, writing to output_dir instead of
+    the package
+    '''
+    compiler = StatCompiler(
+        incremental=incremental, games=games, logos=synthetic.logos(),
+        coach_meta=synthetic.coach_meta(games) if coach_meta is None else coach_meta,
+        pre_fastr_deltas=synthetic.deltas(games) if deltas is None else deltas,
+        aliases={}
+    )
+    (output_dir / 'stats').mkdir(exist_ok=True)
+    compiler.package_loc = output_dir
+    compiler.run()
+    return compiler
+
+def read_rows(output_dir):
+    '''
+    coaches.csv as written, one string per coach
+    '''
+    with open(output_dir / 'coaches.csv') as f:
+        lines = f.read().splitlines()[1:]
+    return {line.split(',')[0] : line for line in lines}
+
+def assert_same_as_full(output_dir, games, coach_meta=None):
+    (output_dir / 'full').mkdir()
+    compile_to(output_dir / 'full', games, coach_meta=coach_meta)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(output_dir / 'coaches.csv').sort_values('coach').reset_index(drop=True),
+        pd.read_csv(output_dir / 'full' / 'coaches.csv').sort_values('coach').reset_index(drop=True)
+    )
+
+def test_incremental_without_changes_rewrites_nothing(tmp_path):
+    games = make_games()
+    compile_to(tmp_path, games)
+    before = (tmp_path / 'coaches.csv').read_bytes()
+    compile_to(tmp_path, games, incremental=True)
+    assert (tmp_path / 'coaches.csv').read_bytes() == before
+
+def test_incremental_keeps_untouched_rows(tmp_path):
+    games = make_games()
+    compile_to(tmp_path, games)
+    before = read_rows(tmp_path)
+    ## correct a score in the last week ##
+    changed = games.copy()
+    i = changed.index[-1]
+    changed.loc[i, 'home_score'] += 3
+    changed.loc[i, 'result'] += 3
+    compile_to(tmp_path, changed, incremental=True)
+    after = read_rows(tmp_path)
+    ## every coach with a game in the changed season is recomputed ##
+    season = changed.loc[i, 'season']
+    affected = set(changed.loc[changed['season'] == season, 'home_coach']) | set(
+        changed.loc[changed['season'] == season, 'away_coach']
+    )
+    assert set(after) == set(before)
+    untouched = [coach for coach in before if coach not in affected]
+    assert len(untouched) > 0
+    assert all(after[coach] == before[coach] for coach in untouched)
+    ## and matches a full compile ##
+    assert_same_as_full(tmp_path, changed)
+
+def refreshed_meta(games):
+    '''
+    coach_meta after a refresh moved every headshot and changed one tree
+    '''
+    meta = synthetic.coach_meta(games)
+    meta['pfr_coach_image_url'] = 'https://example.com/new/' + meta['pfr_coach_id'] + '.jpg'
+    meta.loc[0, 'pfr_coach_tree_hired_by'] = meta.loc[1, 'pfr_coach_id']
+    return meta
+
+def test_incremental_adds_refreshed_meta_without_new_games(tmp_path):
+    games = make_games()
+    compile_to(tmp_path, games)
+    meta = refreshed_meta(games)
+    compile_to(tmp_path, games, incremental=True, coach_meta=meta)
+    out = pd.read_csv(tmp_path / 'coaches.csv')
+    matched = out[~pd.isnull(out['pfr_coach_id'])]
+    assert len(matched) > 0
+    assert matched['pfr_coach_image_url'].str.startswith('https://example.com/new/').all()
+    assert_same_as_full(tmp_path, games, coach_meta=meta)
+
+def test_incremental_adds_refreshed_meta_with_new_games(tmp_path):
+    games = make_games()
+    deltas = synthetic.deltas(games)
+    compile_to(
+        tmp_path, games[games['season'] < games['season'].max()],
+        coach_meta=synthetic.coach_meta(games), deltas=deltas
+    )
+    meta = refreshed_meta(games)
+    compile_to(tmp_path, games, incremental=True, coach_meta=meta, deltas=deltas)
+    assert_same_as_full(tmp_path, games, coach_meta=meta)
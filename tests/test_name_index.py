@@ -0,0 +1,60 @@
+import pandas as pd
+import pathlib
+
+from ..coaches.NameIndex import NameIndex, normalize_name
+
+package_loc = pathlib.Path(__file__).parent.parent.resolve()
+
+def coach_meta():
+    return pd.read_csv('{0}/coaches/coach_meta.csv'.format(package_loc), index_col=0)
+
+## seasons each Jim Mora coached, Sr. in New Orleans and Indianapolis,
+## Jr. in Atlanta and Seattle ##
+MORA_SEASONS = {
+    'MoraJi0' : list(range(1986, 1997)) + list(range(1998, 2002)),
+    'MoraJi1' : [2004, 2005, 2006, 2009],
+}
+
+def test_shared_name_resolves_by_season():
+    meta = coach_meta()
+    ## both are in coach_meta under the same name ##
+    moras = meta[meta['pfr_coach_name'] == 'Jim Mora']['pfr_coach_id'].tolist()
+    assert sorted(moras) == ['MoraJi0', 'MoraJi1']
+    index = NameIndex(meta)
+    for pfr_id, seasons in MORA_SEASONS.items():
+        for season in seasons:
+            assert index.resolve('Jim Mora', season) == pfr_id, season
+    ## without a season, the first alias, as coaches.csv has always used ##
+    assert index.resolve('Jim Mora') == 'MoraJi0'
+    assert list(index.resolve_all(['Jim Mora', None])) == ['MoraJi0', None]
+    assert index.ambiguous == {}
+
+def test_shared_name_without_alias_is_reported():
+    index = NameIndex(coach_meta(), aliases={})
+    assert index.resolve('Jim Mora', 2005) == 'MoraJi0'
+    assert index.ambiguous == {'Jim Mora' : ['MoraJi0', 'MoraJi1']}
+    ## a season outside every aliased range falls back the same way ##
+    index = NameIndex(coach_meta())
+    assert index.resolve('Jim Mora', 2003) == 'MoraJi0'
+    assert 'Jim Mora' in index.ambiguous
+
+def test_unmatched_names():
+    meta = pd.DataFrame({
+        'pfr_coach_id' : ['SmitJo0', 'SmitJo1', 'ObriBi0'],
+        'pfr_coach_name' : ['Joe Smith', 'Jon Smith', "Bill O'Brien"],
+    })
+    index = NameIndex(meta, aliases={})
+    ## punctuation and suffixes do not matter ##
+    assert normalize_name("Bill O'Brien Jr.") == 'bill obrien'
+    assert index.resolve('Bill OBrien') == 'ObriBi0'
+    ## a close misspelling is matched and listed for review ##
+    assert index.resolve('Bil OBrien') == 'ObriBi0'
+    assert index.fuzzy == {'Bil OBrien' : 'bill obrien'}
+    ## nothing close enough, or a tie between two coaches, is left null ##
+    assert index.resolve('Nobody Known') is None
+    assert index.resolve('Jo Smith') is None
+    assert index.unmatched == {'Nobody Known', 'Jo Smith'}
+    assert index.summary() == {'resolved' : 2, 'ambiguous' : 0, 'fuzzy' : 1, 'unmatched' : 2}
+    ## and pinned with an alias ##
+    index.add_alias('Jo Smith', 'SmitJo1')
+    assert index.resolve('Jo Smith') == 'SmitJo1'
@@ -0,0 +1,133 @@
+import numpy
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
+
+from ..coaches.parsers import parse_coach_page
+from ..coaches.utils import id_from_url
+from ..benchmarks import synthetic
+
+## the soup based parsing Coach.scrape_coach did before parsers.py ##
+def employment_table_helper(parsed_bs4, key):
+    return_array = []
+    try:
+        section = str(parsed_bs4.find('div', {'id' : 'all_{0}'.format(key)}))
+        new_parsed = BeautifulSoup(section.split('<!--')[1].split('-->')[0], 'html.parser')
+        table = new_parsed.findAll(
+            'table', {'id' : key}
+        )
+        if len(table) > 0:
+            coaches = table[0].findAll(
+                'th', {'data-stat' : 'coach_name'}
+            )
+            if len(coaches) > 0:
+                for c in coaches:
+                    anchor = c.findAll('a', href=True)
+                    if len(anchor) > 0:
+                        coach_id = id_from_url(
+                            anchor[0]['href']
+                        )
+                        if coach_id not in return_array:
+                            return_array.append(coach_id)
+    except Exception as e:
+        pass
+    return return_array
+
+def parse_soup(page_html):
+    img_url = numpy.nan
+    soup = BeautifulSoup(page_html, "html.parser")
+    image_block = soup.findAll('div', {'id' : 'meta'})
+    if len(image_block) > 0:
+        img = image_block[0].findAll('img')
+        if len(img) > 0:
+            img_url = img[0]['src']
+    return (
+        img_url,
+        employment_table_helper(soup, 'worked_for'),
+        employment_table_helper(soup, 'employed')
+    )
+
+def page(body):
+    return '<html><head><title>x</title></head><body>{0}</body></html>'.format(body)
+
+def table(key, ids, commented=True):
+    rows = ''.join(
+        '<tr><th data-stat="coach_name"><a href="/coaches/{0}.htm">{0}</a></th></tr>'.format(i)
+        for i in ids
+    )
+    inner = '<table id="{0}"><tbody>{1}</tbody></table>'.format(key, rows)
+    return '<div id="all_{0}"><h2>{0}</h2>{1}</div>'.format(
+        key, '<!--\n{0}\n-->'.format(inner) if commented else inner
+    )
+
+META = '<div id="meta"><div><img src="real.jpg"></div><h1>Coach</h1></div>'
+TABLES = table('worked_for', ['AaaAa0', 'BbbBb0', 'AaaAa0']) + table('employed', ['CccCc0'])
+
+EDGE_PAGES = {
+    ## another attribute ending in id must not be taken for the id ##
+    'data_id_decoy' : page('<div data-id="meta"><img src="x.jpg"></div>' + META + TABLES),
+    'data_id_decoy_tables' : page(
+        '<div data-id="all_worked_for"><!--<table id="worked_for"><tr><th data-stat="coach_name">'
+        '<a href="/coaches/XxxXx0.htm">x</a></th></tr></table>--></div>' + META + TABLES
+    ),
+    ## '</div>' in a script or style body does not close the block ##
+    'script_close_div' : page(
+        '<div id="meta"><script>document.write("</div>");</script>'
+        '<img src="real.jpg"></div>' + TABLES
+    ),
+    'style_close_div' : page(
+        '<div id="meta"><style>/* </div> */</style><div><img src="real.jpg"></div></div>' + TABLES
+    ),
+    'script_div_before' : page(
+        '<script>var s = \'<div id="meta"><img src="x.jpg"></div>\';</script>' + META + TABLES
+    ),
+    ## divs in comments are not tags ##
+    'comment_div' : page('<!-- <div id="meta"><img src="x.jpg"></div> -->' + META + TABLES),
+    'comment_close_div' : page(
+        '<div id="meta"><!-- </div> --><img src="real.jpg"></div>' + TABLES
+    ),
+    ## attribute forms ##
+    'single_quotes' : page("<div id='meta'><img src='real.jpg'></div>" + TABLES),
+    'bare_id' : page('<div class=x id=meta><img src=real.jpg></div>' + TABLES),
+    'upper_case' : page('<DIV ID="meta"><IMG SRC="real.jpg"></DIV>' + TABLES),
+    'id_prefix' : page('<div id="meta2"><img src="x.jpg"></div>' + META + TABLES),
+    'quoted_gt' : page('<div title="a > b" id="meta"><img src="real.jpg"></div>' + TABLES),
+    'id_in_value' : page('<div title="id=meta"><img src="x.jpg"></div>' + META + TABLES),
+    'divider_tag' : page('<div-x id="meta"><img src="x.jpg"></div-x>' + META + TABLES),
+    'repeated_id' : page('<div id="meta" id="x"><img src="x.jpg"></div>' + META + TABLES),
+    'self_closed' : page('<div id="meta"/><img src="after.jpg">' + TABLES),
+    ## nesting and structure ##
+    'nested' : page(
+        '<div id="meta"><div><div></div></div><p><img src="real.jpg"></p></div>'
+        '<div><img src="after.jpg"></div>' + TABLES
+    ),
+    'image_after_meta' : page('<div id="meta"><h1>x</h1></div><img src="after.jpg">' + TABLES),
+    'no_meta' : page(TABLES),
+    'no_tables' : page(META),
+    'uncommented_tables' : page(
+        META + table('worked_for', ['AaaAa0'], False) + table('employed', ['CccCc0'], False)
+    ),
+    'unclosed_meta' : page('<div id="meta"><img src="real.jpg">'),
+    'empty' : '',
+}
+
+def same(a, b):
+    img_a, img_b = a[0], b[0]
+    if pd.isnull(img_a) or pd.isnull(img_b):
+        return pd.isnull(img_a) and pd.isnull(img_b) and a[1:] == b[1:]
+    return a == b
+
+@pytest.mark.parametrize('name', sorted(EDGE_PAGES))
+def test_matches_soup_parser_on_edge_cases(name):
+    page_html = EDGE_PAGES[name]
+    assert same(parse_coach_page(page_html), parse_soup(page_html))
+
+def test_decoys_are_skipped():
+    assert parse_coach_page(EDGE_PAGES['data_id_decoy'])[0] == 'real.jpg'
+    assert parse_coach_page(EDGE_PAGES['script_close_div'])[0] == 'real.jpg'
+    assert parse_coach_page(EDGE_PAGES['data_id_decoy_tables'])[1] == ['AaaAa0', 'BbbBb0']
+
+def test_matches_soup_parser_on_fixture_pages():
+    pages = synthetic.coach_pages(8)
+    for url, page_html in pages.items():
+        assert same(parse_coach_page(page_html), parse_soup(page_html)), url
@@ -0,0 +1,83 @@
+import time
+import threading
+import pytest
+
+from ..coaches.utils import AdaptiveRateLimiter, CircuitOpenError
+
+def open_limiter(cooldown=0.05):
+    limiter = AdaptiveRateLimiter(
+        min_interval=0, jitter=0, max_rate=60000, max_interval=0.01, max_failures=2,
+        cooldown=cooldown
+    )
+    limiter.failure()
+    limiter.failure()
+    assert limiter.is_open()
+    return limiter
+
+def test_circuit_stays_open_during_cooldown():
+    limiter = open_limiter(cooldown=60)
+    with pytest.raises(CircuitOpenError):
+        limiter.wait()
+
+def test_probe_success_closes_circuit():
+    limiter = open_limiter()
+    time.sleep(0.06)
+    ## one probe is let through, others are refused while it is out ##
+    limiter.wait()
+    with pytest.raises(CircuitOpenError):
+        limiter.wait()
+    limiter.success()
+    assert not limiter.is_open()
+    limiter.wait()
+    limiter.wait()
+
+def test_probe_failure_reopens_for_another_cooldown():
+    limiter = open_limiter()
+    time.sleep(0.06)
+    limiter.wait()
+    limiter.throttled()
+    assert limiter.is_open()
+    with pytest.raises(CircuitOpenError):
+        limiter.wait()
+    time.sleep(0.06)
+    limiter.wait()
+    limiter.success()
+    assert not limiter.is_open()
+
+def test_long_retry_after_holds_the_probe():
+    limiter = AdaptiveRateLimiter(
+        min_interval=0, jitter=0, max_interval=0.01, cooldown=0.01
+    )
+    limiter.throttled(retry_after=0.2)
+    assert limiter.is_open()
+    time.sleep(0.05)
+    with pytest.raises(CircuitOpenError):
+        limiter.wait()
+
+def report_from_other_thread(report):
+    thread = threading.Thread(target=report)
+    thread.start()
+    thread.join()
+
+def test_in_flight_success_does_not_close_circuit():
+    limiter = open_limiter()
+    ## a request started before the circuit opened comes back healthy ##
+    report_from_other_thread(limiter.success)
+    assert limiter.is_open()
+    time.sleep(0.06)
+    limiter.wait()
+    ## and while the probe is out ##
+    report_from_other_thread(limiter.success)
+    assert limiter.is_open()
+    with pytest.raises(CircuitOpenError):
+        limiter.wait()
+    limiter.success()
+    assert not limiter.is_open()
+
+def test_in_flight_failure_leaves_probe_to_decide():
+    limiter = open_limiter()
+    time.sleep(0.06)
+    limiter.wait()
+    report_from_other_thread(limiter.failure)
+    limiter.success()
+    assert not limiter.is_open()
@@ -0,0 +1,40 @@
+## packages ##
+import pandas as pd
+import numpy
+
+from ..coaches.RefreshScheduler import RefreshScheduler, DEFAULT_BUDGET
+
+def coach_meta(n=200):
+    ## two coaches named Jim Mora, every coach due ##
+    names = ['Jim Mora', 'Jim Mora'] + ['Coach {0}'.format(i) for i in range(n - 2)]
+    return pd.DataFrame({
+        'pfr_coach_id' : ['MoraJi0', 'MoraJi1'] + ['Coach{0}'.format(i) for i in range(n - 2)],
+        'pfr_coach_name' : names,
+        'pfr_coach_image_url' : 'https://example.com/a.jpg',
+        'pfr_coach_tree_hired_by' : 'Coach0',
+        'pfr_coach_tree_hired' : numpy.nan,
+        'pfr_coach_last_checked' : '2024-01-01',
+    })
+
+def test_active_coaches_are_matched_on_id():
+    stats = pd.DataFrame({
+        'coach' : ['Jim Mora', 'Coach 3'],
+        'is_active' : [1, 0],
+        'pfr_coach_id' : ['MoraJi1', 'Coach3'],
+    })
+    scheduler = RefreshScheduler(coach_meta(), coach_stats=stats, today='2024-06-01')
+    assert scheduler.active_ids == {'MoraJi1'}
+    assert scheduler.plan.loc[scheduler.plan['is_active'], 'pfr_coach_id'].tolist() == ['MoraJi1']
+
+def test_output_without_ids_is_matched_by_name_index():
+    stats = pd.DataFrame({'coach' : ['Coach 3', 'Coach 4'], 'is_active' : [1, 0]})
+    scheduler = RefreshScheduler(coach_meta(), coach_stats=stats, today='2024-06-01')
+    assert scheduler.active_ids == {'Coach3'}
+
+def test_default_budget_caps_a_run():
+    stats = pd.DataFrame({'coach' : [], 'is_active' : [], 'pfr_coach_id' : []})
+    scheduler = RefreshScheduler(coach_meta(), coach_stats=stats, today='2026-01-01')
+    assert scheduler.summary()['due'] == 200
+    assert len(scheduler.work_list()) == DEFAULT_BUDGET
+    unlimited = RefreshScheduler(coach_meta(), coach_stats=stats, budget=None, today='2026-01-01')
+    assert len(unlimited.work_list()) == 200
@@ -0,0 +1,66 @@
+import tracemalloc
+
+from ..updater.RunReport import RunReport, peak_rss_mb, current_rss_mb
+from ..coaches.utils import counters
+
+def stages(report):
+    return {s['stage'] : s for s in report.stages}
+
+def test_stage_memory_is_per_stage():
+    with RunReport(trace_memory=True) as report:
+        ## enough to raise the process peak even after earlier tests ##
+        mb = 64
+        if peak_rss_mb() is not None and current_rss_mb() is not None:
+            mb += int(max(0, peak_rss_mb() - current_rss_mb()))
+        with report.stage('heavy'):
+            data = bytearray(mb * 1024 * 1024)
+            data[::4096] = b'x' * len(data[::4096])
+            del data
+        with report.stage('light'):
+            data = bytearray(1024 * 1024)
+            del data
+    heavy, light = stages(report)['heavy'], stages(report)['light']
+    assert heavy['traced_peak_mb'] >= 64
+    assert light['traced_peak_mb'] < 8
+    ## the light stage does not inherit the heavy stage's high water mark ##
+    if peak_rss_mb() is not None:
+        assert heavy['peak_rss_growth_mb'] > light['peak_rss_growth_mb']
+        assert light['peak_rss_growth_mb'] < 8
+    for record in [heavy, light]:
+        assert 'peak_rss_mb' not in record
+
+def test_nested_stage_peaks_carry_up():
+    with RunReport(trace_memory=True) as report:
+        with report.stage('outer'):
+            with report.stage('inner'):
+                data = bytearray(32 * 1024 * 1024)
+                del data
+            with report.stage('after'):
+                pass
+    by_stage = stages(report)
+    assert by_stage['outer']['traced_peak_mb'] >= 32
+    assert by_stage['outer/inner']['traced_peak_mb'] >= 32
+    assert by_stage['outer/after']['traced_peak_mb'] < 8
+    assert report.to_dict()['peak_rss_mb'] == peak_rss_mb()
+
+def test_close_stops_tracing_it_started():
+    assert not tracemalloc.is_tracing()
+    with RunReport(trace_memory=True) as report:
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+    ## tracing started elsewhere is left running ##
+    tracemalloc.start()
+    try:
+        RunReport(trace_memory=True).close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+def test_counters_are_deltas_since_the_report_started():
+    counters.add('requests', 5)
+    with RunReport() as report:
+        with report.stage('fetch'):
+            counters.add('requests', 2)
+        counters.add('cache_hits')
+    assert report.stages[0]['counters'] == {'requests' : 2}
+    assert report.to_dict()['counters'] == {'requests' : 2, 'cache_hits' : 1}
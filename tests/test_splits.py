@@ -0,0 +1,92 @@
+import numpy
+import pandas as pd
+
+from ..stats.splits import compute_splits
+
+METRICS = ['games', 'wins', 'win_pct', 'ats_pct', 'ats_roi', 'avg_pf']
+nan = numpy.nan
+
+def make_fields():
+    '''
+    Game fields for a coach who leaves a team and comes back (three stints)
+    and a coach without any ats results or risk, shuffled
+    '''
+    rows = [
+        ## coach, season, week, team, stint, result, pf, ats_result, ats_return, ats_risked ##
+        ('A', 2020, 1, 'NE', 0, 7, 24, 1, 1, 1.1),
+        ('A', 2020, 2, 'NE', 0, -3, 17, 0, -1.1, 1.1),
+        ('A', 2020, 3, 'NE', 0, 0, 20, nan, 0, 1.1),
+        ('A', 2021, 1, 'NYJ', 1, 10, 30, 1, 1, 1.1),
+        ('A', 2021, 2, 'NYJ', 1, -14, 10, nan, 0, 1.1),
+        ('A', 2022, 1, 'NE', 2, 3, 23, 0, -1.1, 1.1),
+        ('A', 2022, 2, 'NE', 2, 6, 27, 1, 1, 1.1),
+        ('B', 2021, 1, 'MIA', 0, -7, 13, nan, nan, nan),
+        ('B', 2021, 2, 'MIA', 0, 2, 21, nan, nan, nan),
+    ]
+    fields = pd.DataFrame(rows, columns=[
+        'coach', 'season', 'week', 'team', 'stint', 'result', 'pf',
+        'ats_result', 'ats_return', 'ats_risked'
+    ])
+    fields['win'] = (fields['result'] > 0).astype('float64')
+    return fields.sample(frac=1, random_state=0).reset_index(drop=True)
+
+def expected(games):
+    '''
+    {metric : (value, n)} of a group of games, the plain way
+    '''
+    ats = games['ats_result'].dropna()
+    risked = games['ats_risked'].fillna(0).sum()
+    return {
+        'games' : (len(games), len(games)),
+        'wins' : (games['win'].sum(), len(games)),
+        'win_pct' : (games['win'].mean(), len(games)),
+        'ats_pct' : (ats.mean() if len(ats) > 0 else nan, len(ats)),
+        'ats_roi' : (games['ats_return'].fillna(0).sum() / risked if risked > 0 else nan, risked),
+        'avg_pf' : (games['pf'].mean(), len(games)),
+    }
+
+def assert_group(out, split, coach, key, games):
+    rows = out[
+        (out['split'] == split) & (out['coach'] == coach) & (out['key'] == key) &
+        (out['season_start'] == games['season'].iloc[0])
+    ].set_index('metric')
+    assert sorted(rows.index) == sorted(METRICS), (split, coach, key)
+    assert (rows['season_end'] == games['season'].iloc[-1]).all()
+    for metric, (value, n) in expected(games).items():
+        numpy.testing.assert_allclose(
+            [rows.loc[metric, 'value'], rows.loc[metric, 'n']], [value, n],
+            err_msg='{0} {1} {2} {3}'.format(split, coach, key, metric)
+        )
+
+def test_splits_match_groupby():
+    fields = make_fields()
+    out = compute_splits(fields, windows=[3, 10], metrics=METRICS)
+    games = fields.sort_values(['coach', 'season', 'week'])
+    for coach, g in games.groupby('coach'):
+        assert_group(out, 'career', coach, 'career', g)
+    for (coach, season), g in games.groupby(['coach', 'season']):
+        assert_group(out, 'season', coach, str(season), g)
+    ## a team the coach comes back to is a new stint ##
+    for (coach, stint), g in games.groupby(['coach', 'stint']):
+        assert_group(out, 'team', coach, g['team'].iloc[0], g)
+    stints = out[(out['split'] == 'team') & (out['coach'] == 'A') & (out['metric'] == 'games')]
+    assert stints[['key', 'season_start', 'value']].values.tolist() == [
+        ['NE', 2020, 3], ['NYJ', 2021, 2], ['NE', 2022, 2]
+    ]
+    ## trailing windows are clipped at the start of the coach's games ##
+    for window in [3, 10]:
+        for coach, g in games.groupby('coach'):
+            for i in range(len(g)):
+                key = '{0}-{1}'.format(g['season'].iloc[i], g['week'].iloc[i])
+                assert_group(
+                    out, 'last_{0}'.format(window), coach, key,
+                    g.iloc[max(0, i - window + 1):i + 1]
+                )
+    assert len(out[out['split'] == 'last_10']) == len(fields) * len(METRICS)
+
+def test_empty_ratios_are_null():
+    out = compute_splits(make_fields(), metrics=METRICS)
+    b = out[(out['coach'] == 'B') & (out['split'] == 'career')].set_index('metric')
+    assert pd.isnull(b.loc['ats_pct', 'value']) and b.loc['ats_pct', 'n'] == 0
+    assert pd.isnull(b.loc['ats_roi', 'value']) and b.loc['ats_roi', 'n'] == 0
+    assert not numpy.isinf(out['value']).any()
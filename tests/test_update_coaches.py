@@ -0,0 +1,63 @@
+import numpy
+import time
+import threading
+import pytest
+
+from ..coaches.update_coaches import refresh_record, refresh_records_concurrently
+from ..coaches.fetchers import FetchBackend, ThrottledError
+from ..benchmarks import synthetic
+
+class Pages(FetchBackend):
+    '''
+    Serves synthetic pages, throttling the ids in throttled
+    '''
+    def __init__(self, throttled=(), delay=0):
+        self.throttled = set(throttled)
+        self.delay = delay
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def get_page_html(self, url):
+        pfr_id = url.split('/')[-1].split('.')[0]
+        time.sleep(self.delay)
+        with self.lock:
+            self.fetched.append(pfr_id)
+        if pfr_id in self.throttled:
+            raise ThrottledError(url)
+        return synthetic.coach_page(pfr_id, ['AaaAa0'], [], filler=0)
+
+    def requires_network(self, url):
+        return False
+
+def record(pfr_id):
+    return {
+        'pfr_coach_id' : pfr_id, 'pfr_coach_name' : pfr_id,
+        'pfr_coach_image_url' : numpy.nan, 'pfr_coach_tree_hired_by' : numpy.nan,
+        'pfr_coach_tree_hired' : numpy.nan, 'pfr_coach_last_checked' : '2020-01-01',
+    }
+
+def test_only_finished_fetches_are_refreshed():
+    refreshed = []
+    fetcher = Pages(throttled=['BbbBb0'])
+    ok = refresh_record(record('AaaAa0'), fetcher, None, True, refreshed.append, True)
+    throttled = refresh_record(record('BbbBb0'), fetcher, None, True, refreshed.append, True)
+    assert [r['pfr_coach_id'] for r in refreshed] == ['AaaAa0']
+    assert ok['pfr_coach_last_checked'] != '2020-01-01'
+    assert ok['pfr_coach_tree_hired_by'] == 'AaaAa0'
+    ## left unchecked so it stays due ##
+    assert throttled == record('BbbBb0')
+
+def failed_checkpoint(record):
+    raise OSError('No space left on device')
+
+def test_failed_checkpoint_stops_the_refresh():
+    with pytest.raises(OSError):
+        refresh_record(record('AaaAa0'), Pages(), None, True, failed_checkpoint, True)
+    ## coaches that have not started are dropped ##
+    fetcher = Pages(delay=0.01)
+    records = [record('Aaa{0:03d}'.format(i)) for i in range(50)]
+    with pytest.raises(OSError):
+        refresh_records_concurrently(
+            records, 2, None, lambda: fetcher, True, failed_checkpoint, [True] * len(records)
+        )
+    assert len(fetcher.fetched) < 10
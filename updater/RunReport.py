@@ -0,0 +1,214 @@
+import contextlib
+import datetime
+import json
+import time
+import os
+import pathlib
+import cProfile
+import pstats
+import io
+import tracemalloc
+try:
+    import resource
+except ImportError:
+    ## not available on windows ##
+    resource = None
+
+from ..coaches.utils import counters
+
+def peak_rss_mb():
+    '''
+    Peak resident set size of the process so far
+    '''
+    if resource is None:
+        return None
+    ## linux reports kb, macos reports bytes ##
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+def current_rss_mb():
+    '''
+    Current resident set size, where /proc is available
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except:
+        return None
+
+def counter_deltas(start):
+    '''
+    Scraping counters that changed since the start snapshot, by how much
+    '''
+    return {
+        k : v - start.get(k, 0) for k, v in counters.snapshot().items()
+        if v != start.get(k, 0)
+    }
+
+class RunReport:
+    '''
+    Structured per stage instrumentation for an updater run. Each stage
+    records wall and cpu time, rows in / out (set by the stage), and the
+    change in the scraping counters (requests, cache hits, bytes fetched,
+    pacing sleeps, parse time, etc). For memory, each stage records the RSS
+    at its end (rss_mb), how much RSS changed over it (rss_delta_mb), and
+    how much it raised the process' peak RSS (peak_rss_growth_mb, 0 when the
+    stage stayed under an earlier stage's peak). The process peak itself is
+    only reported for the whole run.
+
+    Stages can be nested and are named by their path (ie
+    compile_stats/aggregate). With trace_memory=True, the peak traced python
+    allocation of each stage is recorded with tracemalloc. With profile=True,
+    top level stages are run under cProfile (or pass a list of stage paths to
+    choose), writing .prof files to profile_dir when one is given and the top
+    functions by cumulative time to the report
+
+    Close the report (or use it as a context manager) to stop tracemalloc
+    if the report started it. Run level counters are the change since the
+    report was created
+    '''
+
+    def __init__(self, profile=False, trace_memory=False, profile_dir=None):
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.started_at = datetime.datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self._stack = []
+        self._profiling = False
+        self.counters_start = counters.snapshot()
+        ## only stop tracing on close if this report started it ##
+        self._started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def close(self):
+        '''
+        Stop tracemalloc if this report started it
+        '''
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def should_profile(self, path):
+        if self._profiling or not self.profile:
+            return False
+        if self.profile is True:
+            return len(self._stack) == 1
+        return path in self.profile
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Instrument a block. Yields the stage's record so the block can set
+        rows_in and rows_out
+        '''
+        path = '/'.join([s['name'] for s in self._stack] + [name])
+        record = {
+            'name' : name,
+            'stage' : path,
+            'rows_in' : None,
+            'rows_out' : None,
+        }
+        if self.trace_memory:
+            ## resetting the peak below would lose the parent's peak so far ##
+            if len(self._stack) > 0:
+                self._stack[-1]['_peak'] = max(
+                    self._stack[-1]['_peak'], tracemalloc.get_traced_memory()[1]
+                )
+            record['_peak'] = 0
+            tracemalloc.reset_peak()
+        self._stack.append(record)
+        counters_start = counters.snapshot()
+        rss_start = current_rss_mb()
+        peak_start = peak_rss_mb()
+        profiler = None
+        if self.should_profile(path):
+            profiler = cProfile.Profile()
+            self._profiling = True
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            record['rss_mb'] = current_rss_mb()
+            record['rss_delta_mb'] = (
+                None if rss_start is None or record['rss_mb'] is None else
+                record['rss_mb'] - rss_start
+            )
+            peak_end = peak_rss_mb()
+            record['peak_rss_growth_mb'] = (
+                None if peak_start is None else peak_end - peak_start
+            )
+            ## counter deltas over the stage ##
+            record['counters'] = counter_deltas(counters_start)
+            if self.trace_memory:
+                ## children reset the peak, so theirs is carried up ##
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_peak'))
+                record['traced_peak_mb'] = peak / (1024 * 1024)
+                tracemalloc.reset_peak()
+            if profiler is not None:
+                record['profile'] = self.profile_summary(profiler, path)
+            self._stack.pop()
+            if self.trace_memory and len(self._stack) > 0:
+                self._stack[-1]['_peak'] = max(
+                    self._stack[-1]['_peak'], peak
+                )
+            self.stages.append(record)
+
+    def profile_summary(self, profiler, path, top=15):
+        '''
+        Dump the profile if there is a profile dir and return the top
+        functions by cumulative time
+        '''
+        summary = {'file' : None, 'top' : []}
+        if self.profile_dir is not None:
+            pathlib.Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+            summary['file'] = '{0}/{1}.prof'.format(
+                self.profile_dir, path.replace('/', '__')
+            )
+            profiler.dump_stats(summary['file'])
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative')
+        for func in stats.fcn_list[:top]:
+            cc, nc, tt, ct, callers = stats.stats[func]
+            summary['top'].append({
+                'function' : '{0}:{1}({2})'.format(*func),
+                'calls' : nc,
+                'total_seconds' : tt,
+                'cumulative_seconds' : ct,
+            })
+        return summary
+
+    def to_dict(self):
+        return {
+            'started_at' : self.started_at.isoformat(),
+            'wall_seconds' : time.perf_counter() - self.start,
+            'peak_rss_mb' : peak_rss_mb(),
+            'counters' : counter_deltas(self.counters_start),
+            'stages' : self.stages,
+        }
+
+    def save(self, path):
+        '''
+        Write the report as json
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4, default=str)
@@ -1 +1,6 @@
-from .updater import run
\ No newline at end of file
+from ..lazy import lazy_package
+
+lazy_package(__name__, {
+    'run' : ('.updater', 'run'),
+    'RunReport' : ('.RunReport', 'RunReport'),
+})
\ No newline at end of file
@@ -1,10 +1,51 @@
-from ..coaches import update_coach_meta
+from ..coaches import update_coach_meta, HeadshotMirror
+from ..coaches.RefreshScheduler import DEFAULT_BUDGET
 from ..stats import StatCompiler
+from ..store import read_coach_meta
+from .RunReport import RunReport
 
-def run():
+def run(
+    incremental=False, columnar=None, report_path=None,
+    profile=False, trace_memory=False, profile_dir=None, source='dcm',
+    headshots=False, budget=DEFAULT_BUDGET, sla_days=365, active_sla_days=90
+):
     '''
-    Updates the package by scraping coaching and then compiling stats
+    Updates the package by scraping coaching and then compiling stats.
+    With incremental=True, only coaches touched by new games are recompiled.
+    columnar ('parquet' or 'arrow') also writes typed copies of the outputs.
+    source is where games come from ('dcm', 'snapshot' or 'auto', see
+    StatCompiler). With headshots=True, coach images are also mirrored
+    locally with thumbnails (see HeadshotMirror)
+
+    budget caps the coaches whose pfr pages are refreshed per run, picked
+    by how far past sla_days (active_sla_days for active coaches) they are,
+    with None for no limit (see update_coach_meta)
+
+    Every stage is instrumented in a RunReport, which is written as json to
+    report_path when one is given and returned. profile and trace_memory
+    turn on cProfile and tracemalloc per stage (see RunReport)
     '''
-    ## this is an awful implimentation with no consistency ##
-    update_coach_meta()
-    s = StatCompiler()
\ No newline at end of file
+    with RunReport(
+        profile=profile, trace_memory=trace_memory, profile_dir=profile_dir
+    ) as report:
+        ## this is an awful implimentation with no consistency ##
+        with report.stage('update_coach_meta'):
+            update_coach_meta(
+                columnar=columnar, report=report, budget=budget,
+                sla_days=sla_days, active_sla_days=active_sla_days
+            )
+        with report.stage('compile_stats'):
+            StatCompiler(
+                incremental=incremental, columnar=columnar, report=report,
+                source=source
+            ).run()
+        if headshots:
+            with report.stage('mirror_headshots'):
+                mirror = HeadshotMirror()
+                try:
+                    mirror.mirror(read_coach_meta())
+                finally:
+                    mirror.stop()
+        if report_path is not None:
+            report.save(report_path)
+    return report
\ No newline at end of file